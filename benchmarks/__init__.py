@@ -0,0 +1,9 @@
+"""
+Пакет с бенчмарками и локальными заглушками внешних сервисов
+"""
+import os
+
+# Бенчмарки работают только с локальными заглушками: подставляем фиктивные
+# ключи до импорта config, чтобы валидация не требовала настоящего .env
+os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK-TOKEN")
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark-key")
@@ -0,0 +1,119 @@
+"""
+Бенчмарк: локальный каталог игр (импорт, поиск FTS5/BM25, проверка по названиям).
+
+Запуск:
+    python -m benchmarks.bench_catalog --games 100000
+
+Генерирует синтетический дамп в формате JSON Lines (названия, жанры,
+платформы и описания из словаря RAWG-подобных терминов), собирает из
+него каталог импортёром и измеряет задержку поиска по типичным запросам
+пользователей и поиска по точным названиям (режим enrich).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import List
+
+from database.catalog import GameCatalog
+from database.import_catalog import build_catalog
+
+GENRES = ["Action", "Adventure", "RPG", "Strategy", "Shooter", "Puzzle", "Racing", "Sports",
+          "Simulation", "Indie", "Platformer", "Fighting", "Casual", "Arcade"]
+PLATFORMS = ["PC", "PlayStation 5", "PlayStation 4", "Xbox One", "Xbox Series S/X",
+             "Nintendo Switch", "iOS", "Android", "macOS", "Linux"]
+WORDS = ["dragon", "space", "zombie", "samurai", "pirate", "medieval", "cyberpunk", "open world",
+         "survival", "horror", "stealth", "sandbox", "co-op", "turn-based", "fantasy", "war",
+         "city", "island", "ancient", "robot", "magic", "detective", "racing", "football"]
+FILLER = ("the player explores a vast land full of secrets and battles enemies while "
+          "building an army crafting gear and uncovering the story of").split()
+
+QUERIES = [
+    "RPG с открытым миром и драконами",
+    "стратегия про космос",
+    "хоррор про зомби на выживание",
+    "гонки на телефоне",
+    "кооперативный шутер",
+    "игра про самураев",
+    "пошаговая стратегия в средневековье",
+    "киберпанк стелс экшен",
+]
+
+
+def make_dump(path: str, count: int) -> List[str]:
+    """Синтетический дамп; возвращает названия игр для проверки по названию"""
+    rnd = random.Random(42)
+    names = []
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            topic = rnd.sample(WORDS, 3)
+            name = f"{topic[0].title()} {rnd.choice(['Legends', 'Chronicles', 'Tactics', 'Rising', 'Saga'])} {i}"
+            names.append(name)
+            record = {
+                "name": name,
+                "genres": [{"name": g} for g in rnd.sample(GENRES, rnd.randint(1, 3))],
+                "platforms": [{"platform": {"name": p}} for p in rnd.sample(PLATFORMS, rnd.randint(1, 4))],
+                "released": f"{rnd.randint(1995, 2025)}-0{rnd.randint(1, 9)}-1{rnd.randint(0, 9)}",
+                "rating": round(rnd.uniform(1, 5), 2),
+                "ratings_count": rnd.randint(0, 5000),
+                "description_raw": " ".join(rnd.sample(FILLER, 12) + topic + rnd.sample(FILLER, 8)) + ".",
+            }
+            f.write(json.dumps(record) + "\n")
+    return names
+
+
+def _report(title: str, latencies: List[float]):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{title:<28} p50={statistics.median(ordered) * 1000:7.2f}ms  p99={p99 * 1000:7.2f}ms")
+
+
+async def main(games: int, rounds: int):
+    directory = tempfile.mkdtemp(prefix="bench-catalog-")
+    dump = os.path.join(directory, "games.jsonl")
+    output = os.path.join(directory, "games_catalog.db")
+    names = make_dump(dump, games)
+    
+    started = time.perf_counter()
+    imported = build_catalog([dump], output)
+    print(f"импорт: {imported} игр за {time.perf_counter() - started:.1f}s, "
+          f"файл {os.path.getsize(output) / 1e6:.1f} МБ")
+    
+    catalog = GameCatalog(output)
+    await catalog.connect()
+    latencies: List[float] = []
+    answered = 0
+    for _ in range(rounds):
+        for query in QUERIES:
+            started = time.perf_counter()
+            found = await catalog.search(query, limit=5)
+            latencies.append(time.perf_counter() - started)
+            answered += len(found) >= 3
+    _report("поиск (BM25, 5 лучших)", latencies)
+    print(f"{'':<28} запросов с ответом из каталога: {answered / len(latencies):.0%}")
+    for query in QUERIES[:3]:
+        found = await catalog.search(query, limit=3)
+        print(f"{'':<28} {query!r}: {[game.name for game, _ in found]}")
+    
+    rnd = random.Random(7)
+    latencies = []
+    for _ in range(rounds * len(QUERIES)):
+        batch = rnd.sample(names, 4) + ["Unknown Game"]
+        started = time.perf_counter()
+        known = await catalog.lookup(batch)
+        latencies.append(time.perf_counter() - started)
+        assert len(known) == 4
+    _report("проверка 5 названий", latencies)
+    await catalog.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.games, args.rounds))
@@ -0,0 +1,101 @@
+"""
+Бенчмарк: подробный JSON-ответ против компактного (позиционные массивы).
+
+Сравниваются количество токенов запроса и ответа, время генерации
+(заглушка выдаёт один токен за --token-delay секунд) и время разбора:
+старый путь (жадный re.search + json.loads в словари) против
+однопроходного decode_games в объекты GameInfo.
+
+Выигрыш компактного формата - в токенах и задержке генерации (сотни
+миллисекунд). Разбор с проверкой типов и созданием GameInfo медленнее
+голого json.loads в словари на единицы микросекунд; сам JSON (raw_decode
+без регулярного выражения) декодируется быстрее - см. строку «только JSON».
+
+Запуск:
+    python -m benchmarks.bench_compact_schema --token-delay 0.005
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+import timeit
+
+from benchmarks.fakes import SAMPLE_GAMES, FakeOpenRouter
+from services.ai_service import AIService
+from services.parsing import decode_games
+
+
+def legacy_parse(content: str):
+    """Разбор ответа так, как это делалось до компактного режима"""
+    json_match = re.search(r'\[.*\]', content, re.DOTALL)
+    return json.loads(json_match.group(0)) if json_match else None
+
+
+async def measure(compact: bool, structured: bool, token_delay: float, parse_iterations: int):
+    games = (SAMPLE_GAMES * 2)[:5]
+    server = FakeOpenRouter(games=games, token_delay=token_delay)
+    service = AIService()
+    service.compact_output = compact
+    service.structured_output = structured
+    service.api_url = await server.start()
+    
+    payload = service._build_payload("RPG с открытым миром и драконами")
+    content = server.completion_content(payload)
+    usage = server.usage(payload, content)
+    
+    started = time.perf_counter()
+    result = await service.get_game_recommendations_with_details("RPG с открытым миром и драконами")
+    latency = time.perf_counter() - started
+    assert result and len(result) == len(games)
+    
+    parse = legacy_parse if not compact else decode_games
+    parse_us = timeit.timeit(lambda: parse(content), number=parse_iterations) / parse_iterations * 1e6
+    
+    await service.close()
+    await server.stop()
+    return usage, latency, parse_us
+
+
+async def main(token_delay: float, parse_iterations: int):
+    # Для подробного ответа считаем и новый декодер, чтобы отделить выигрыш формата
+    variants = [
+        ("подробный + regex", False, False),
+        ("компактный", True, False),
+        ("компактный + schema", True, True),
+    ]
+    print(f"{'режим':<22}{'prompt':>8}{'completion':>12}{'latency, ms':>13}{'parse, µs':>11}")
+    for title, compact, structured in variants:
+        usage, latency, parse_us = await measure(compact, structured, token_delay, parse_iterations)
+        print(
+            f"{title:<22}{usage['prompt_tokens']:>8}{usage['completion_tokens']:>12}"
+            f"{latency * 1000:>13.1f}{parse_us:>11.1f}"
+        )
+    
+    # Тот же подробный ответ через однопроходный декодер
+    server = FakeOpenRouter(games=(SAMPLE_GAMES * 2)[:5])
+    service = AIService()
+    service.compact_output = False
+    content = server.completion_content(service._build_payload("x"))
+    parse_us = timeit.timeit(lambda: decode_games(content), number=parse_iterations) / parse_iterations * 1e6
+    print(f"{'подробный + decode':<22}{'':>8}{'':>12}{'':>13}{parse_us:>11.1f}")
+    
+    # Доля разбора без создания объектов: regex + json.loads против raw_decode
+    service.compact_output = True
+    content = server.completion_content(service._build_payload("x"))
+    start = content.index("[")
+    decoder = json.JSONDecoder()
+    for title, parse in (
+        ("только JSON: regex", lambda: legacy_parse(content)),
+        ("только JSON: raw", lambda: decoder.raw_decode(content, start)),
+    ):
+        parse_us = timeit.timeit(parse, number=parse_iterations) / parse_iterations * 1e6
+        print(f"{title:<22}{'':>8}{'':>12}{'':>13}{parse_us:>11.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--parse-iterations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.token_delay, args.parse_iterations))
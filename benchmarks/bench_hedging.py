@@ -0,0 +1,87 @@
+"""
+Бенчмарк: хеджирование запросов к нейросети по нескольким моделям.
+
+Запуск:
+    python -m benchmarks.bench_hedging --requests 1000 --tail-rate 0.05
+
+Заглушка OpenRouter отвечает за latency±jitter, но с вероятностью
+tail_rate «зависает» на tail_latency секунд - как бесплатные модели
+в часы пик. Сравниваются p50/p99 без хеджирования и с ним, а также
+доля запросов, для которых пришлось отправить резервный. Первые
+AI_HEDGE_MIN_SAMPLES запросов идут с начальной задержкой хеджа, поэтому
+запросов должно быть заметно больше.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from benchmarks.fakes import FakeOpenRouter
+from services.ai_service import AIService
+from services.scheduler import FairScheduler
+
+MODELS = ["primary/model:free", "backup/model:free"]
+
+
+async def _run(service: AIService, total: int, concurrency: int, stream: bool) -> List[float]:
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            # Уникальные запросы: без кэша и объединения одинаковых
+            if stream:
+                games = [g async for g in service.stream_game_recommendations(f"запрос номер {i}")]
+            else:
+                games = await service.get_game_recommendations_with_details(f"запрос номер {i}")
+            assert games, "заглушка вернула пустой ответ"
+            latencies.append(time.perf_counter() - started)
+    
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies
+
+
+def _report(title: str, latencies: List[float], upstream: int, total: int):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{title:<24} p50={statistics.median(ordered) * 1000:7.1f}ms  p99={p99 * 1000:7.1f}ms  "
+        f"max={ordered[-1] * 1000:7.1f}ms  upstream/request={upstream / total:5.2f}"
+    )
+
+
+async def main(total: int, concurrency: int, latency: float, jitter: float,
+               tail_rate: float, tail_latency: float, stream: bool):
+    for hedging in (False, True):
+        server = FakeOpenRouter(latency=latency, jitter=jitter,
+                                tail_rate=tail_rate, tail_latency=tail_latency)
+        url = await server.start()
+        service = AIService(scheduler=FairScheduler(max_concurrency=concurrency))
+        service.api_url = url
+        service.model, service.backup_models = MODELS[0], MODELS[1:]
+        service.hedging = hedging
+        await service.start()
+        
+        latencies = await _run(service, total, concurrency, stream)
+        _report("hedging" if hedging else "single model", latencies, server.requests, total)
+        policy = service.stream_hedge if stream else service.hedge
+        if hedging:
+            print(f"{'':<24} {policy.stats()}")
+        await service.close()
+        await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--tail-rate", type=float, default=0.05)
+    parser.add_argument("--tail-latency", type=float, default=2.0)
+    parser.add_argument("--stream", action="store_true", help="потоковый режим (хедж по первой игре)")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency, args.jitter,
+                     args.tail_rate, args.tail_latency, args.stream))
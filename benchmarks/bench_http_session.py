@@ -0,0 +1,96 @@
+"""
+Бенчмарк: новая aiohttp-сессия на каждый запрос против общей сессии AIService.
+
+Запуск:
+    python -m benchmarks.bench_http_session --requests 200 --concurrency 10
+
+Сервер-заглушка OpenRouter поднимается локально по HTTPS с самоподписанным
+сертификатом (если доступен openssl), поэтому в замер попадает TLS-handshake.
+Оба варианта отправляют на сервер одинаковое число запросов (requests).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+import aiohttp
+
+from benchmarks.fakes import FakeOpenRouter, make_tls_contexts
+from services.ai_service import AIService
+
+
+async def _run_batches(worker, total: int, concurrency: int) -> List[float]:
+    """Выполнение total запросов с заданным параллелизмом; возвращает задержки"""
+    latencies: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await worker()
+            latencies.append(time.perf_counter() - started)
+    
+    await asyncio.gather(*(one() for _ in range(total)))
+    return latencies
+
+
+def _report(title: str, latencies: List[float], elapsed: float, server: FakeOpenRouter):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{title:<28} total={elapsed:7.3f}s  "
+        f"p50={statistics.median(ordered) * 1000:7.2f}ms  "
+        f"p99={p99 * 1000:7.2f}ms  requests={server.requests}  connections={server.connections}"
+    )
+
+
+async def main(total: int, concurrency: int):
+    contexts = make_tls_contexts()
+    server_ctx, client_ctx = contexts if contexts else (None, None)
+    if contexts is None:
+        print("openssl недоступен - замер по HTTP без TLS")
+    
+    # Старый путь: сессия создаётся и закрывается на каждый запрос
+    server = FakeOpenRouter()
+    url = await server.start(ssl_context=server_ctx)
+    
+    async def per_request_session():
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json={}, ssl=client_ctx if client_ctx else True) as response:
+                await response.json()
+    
+    started = time.perf_counter()
+    latencies = await _run_batches(per_request_session, total, concurrency)
+    _report("session per request", latencies, time.perf_counter() - started, server)
+    await server.stop()
+    
+    # Новый путь: долгоживущая сессия AIService с пулом соединений
+    server = FakeOpenRouter()
+    url = await server.start(ssl_context=server_ctx)
+    service = AIService()
+    service.api_url = url
+    service.ssl_context = client_ctx
+    await service.start()
+    
+    # Запросы различаются, иначе одинаковые запросы совместит single-flight
+    # и до сервера дойдёт лишь часть из них: сравниваются только соединения
+    counter = iter(range(total + 1))
+    
+    async def shared_session():
+        games = await service.get_game_recommendations_with_details(f"RPG с открытым миром {next(counter)}")
+        assert games, "заглушка вернула пустой ответ"
+    
+    started = time.perf_counter()
+    latencies = await _run_batches(shared_session, total, concurrency)
+    _report("shared pooled session", latencies, time.perf_counter() - started, server)
+    await service.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
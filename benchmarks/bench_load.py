@@ -0,0 +1,282 @@
+"""
+Нагрузочный тест: тысячи пользователей через настоящий Dispatcher и обработчики.
+
+Запуск:
+    python -m benchmarks.bench_load --users 2000 --concurrency 200
+    python -m benchmarks.bench_load --users 500 --max-p99 2 --max-error-rate 0 --json result.json
+
+Поднимает заглушки Telegram Bot API и OpenRouter (benchmarks/fakes.py) с
+настраиваемыми задержками (базовая + случайная добавка + доля «хвостовых»
+ответов) и долей ошибок, запускает бота из bot.py (create_dispatcher,
+on_startup, long polling) с базами в отдельном каталоге и проводит каждого
+пользователя по сценарию /start → /search → запрос → /history, дожидаясь
+завершения обработки каждого шага. Сообщает пропускную способность,
+p50/p95/p99 задержки по шагам (от появления обновления в getUpdates до
+выхода из обработчика), рост памяти процесса и размер файлов БД.
+
+Заглушки работают в том же процессе и цикле событий, что и бот, поэтому
+пропускная способность - оценка снизу. Пороги --max-p99, --min-throughput
+и --max-error-rate превращают тест в проверку: при нарушении код выхода 1.
+Настройки бота берутся из окружения (.env), как в рабочем запуске; без
+--throttle ограничение частоты отключается, иначе общий лимит бота
+отклонил бы большую часть синтетической нагрузки.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiogram.types import Update
+
+import config
+from benchmarks.bench_similarity import make_queries
+from benchmarks.fakes import FakeOpenRouter, FakeTelegram, make_message_update
+from bot import create_bot, create_dispatcher
+from services.ai_service import ai_service
+from services.metrics import ai_stage_seconds, db_query_seconds
+
+STEPS = ("start", "search", "query", "history")
+
+
+def current_rss_mb() -> float:
+    """Текущий размер резидентной памяти процесса (Linux, /proc/self/statm)"""
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))] if ordered else 0.0
+
+
+class UpdateRecorder:
+    """
+    Outer-middleware обновлений: момент завершения обработки каждого обновления.
+
+    Виртуальный пользователь ждёт завершения своего шага, а задержка
+    считается от постановки обновления в очередь getUpdates.
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, asyncio.Future] = {}
+        self.errors: Dict[str, int] = {}
+
+    def expect(self, update_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._pending[update_id] = future
+        return future
+
+    def forget(self, update_id: int):
+        self._pending.pop(update_id, None)
+
+    async def __call__(self, handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+                       event: Update, data: Dict[str, Any]) -> Any:
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            name = type(e).__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+            raise
+        finally:
+            future = self._pending.pop(event.update_id, None)
+            if future is not None and not future.done():
+                future.set_result(time.perf_counter())
+
+
+class LoadTest:
+    """Виртуальные пользователи, проходящие сценарий по шагам"""
+
+    def __init__(self, telegram: FakeTelegram, recorder: UpdateRecorder, queries: List[str],
+                 step_timeout: float, think_time: float):
+        self.telegram = telegram
+        self.recorder = recorder
+        self.queries = queries
+        self.step_timeout = step_timeout
+        self.think_time = think_time
+        self.latencies: Dict[str, List[float]] = {step: [] for step in STEPS}
+        self.timeouts: Dict[str, int] = {step: 0 for step in STEPS}
+        self.completed_users = 0
+        self._update_id = 0
+        self._rnd = random.Random(42)
+
+    async def _step(self, step: str, user_id: int, text: str):
+        self._update_id += 1
+        update_id = self._update_id
+        finished = self.recorder.expect(update_id)
+        pushed = time.perf_counter()
+        self.telegram.push_update(make_message_update(update_id, user_id, text))
+        try:
+            self.latencies[step].append(await asyncio.wait_for(finished, self.step_timeout) - pushed)
+        except asyncio.TimeoutError:
+            self.recorder.forget(update_id)
+            self.timeouts[step] += 1
+
+    async def run_user(self, user_id: int, semaphore: asyncio.Semaphore):
+        query = self._rnd.choice(self.queries)
+        async with semaphore:
+            for step, text in zip(STEPS, ("/start", "/search", query, "/history")):
+                await self._step(step, user_id, text)
+                if self.think_time:
+                    await asyncio.sleep(self._rnd.expovariate(1 / self.think_time))
+            self.completed_users += 1
+
+
+def db_files_size(directory: str) -> Dict[str, int]:
+    """Размеры файлов SQLite (вместе с -wal и -shm) в каталоге запуска"""
+    return {
+        os.path.basename(path): os.path.getsize(path)
+        for path in sorted(glob.glob(os.path.join(directory, "*.db*")))
+    }
+
+
+def report_histograms(title: str, histogram, top: int):
+    rows = []
+    for labels, series in histogram.items():
+        if series.count:
+            rows.append((series.quantile(0.99), labels, series))
+    if not rows:
+        return
+    print(title)
+    for p99, labels, series in sorted(rows, reverse=True)[:top]:
+        print(f"  {'/'.join(labels):<44} n={series.count:<7} "
+              f"p50={series.quantile(0.5) * 1000:8.1f}ms  p99={p99 * 1000:8.1f}ms")
+
+
+async def main(args: argparse.Namespace) -> int:
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="gamebot-load-"))
+    json_path = os.path.abspath(args.json) if args.json else None
+    os.makedirs(workdir, exist_ok=True)
+    # Пути баз в настройках относительные: файлы теста создаются в workdir
+    os.chdir(workdir)
+
+    telegram = FakeTelegram(latency=args.tg_latency, jitter=args.tg_jitter,
+                            tail_rate=args.tg_tail_rate, tail_latency=args.tg_tail_latency,
+                            error_rate=args.tg_error_rate, record_sent=False)
+    openrouter = FakeOpenRouter(latency=args.ai_latency, jitter=args.ai_jitter,
+                                tail_rate=args.ai_tail_rate, tail_latency=args.ai_tail_latency,
+                                error_rate=args.ai_error_rate, token_delay=args.ai_token_delay)
+    config.TELEGRAM_API_URL = await telegram.start()
+    ai_service.api_url = await openrouter.start()
+    config.THROTTLE_ENABLED = args.throttle
+
+    dp = create_dispatcher()
+    recorder = UpdateRecorder()
+    dp.update.outer_middleware(recorder)
+    bot = create_bot()
+
+    rss_before = current_rss_mb()
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+    # on_startup (БД, миграции, сессии) завершён, когда бот начинает опрос
+    while not telegram.calls.get("getUpdates"):
+        if polling.done():
+            await polling
+            return 1
+        await asyncio.sleep(0.05)
+    rss_started = current_rss_mb()
+
+    test = LoadTest(telegram, recorder, make_queries(args.distinct_queries),
+                    args.step_timeout, args.think_time)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    started = time.perf_counter()
+    await asyncio.gather(*(test.run_user(100_000 + i, semaphore) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+    rss_after = current_rss_mb()
+
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+    await telegram.stop()
+    await openrouter.stop()
+    files = db_files_size(workdir)
+
+    handled = sum(len(values) for values in test.latencies.values())
+    timeouts = sum(test.timeouts.values())
+    errors = sum(recorder.errors.values())
+    total = args.users * len(STEPS)
+    throughput = handled / elapsed if elapsed else 0.0
+    error_rate = (timeouts + errors) / total if total else 0.0
+
+    print(f"пользователей {args.users} (одновременно до {args.concurrency}), "
+          f"шагов {handled}/{total} за {elapsed:.1f}s: {throughput:.0f} обновлений/с, "
+          f"{test.completed_users / elapsed:.1f} сценариев/с")
+    results: Dict[str, Any] = {"users": args.users, "elapsed": elapsed, "throughput": throughput,
+                               "error_rate": error_rate, "steps": {}}
+    for step in STEPS:
+        ordered = sorted(test.latencies[step])
+        p50, p95, p99 = (percentile(ordered, q) for q in (0.5, 0.95, 0.99))
+        results["steps"][step] = {"count": len(ordered), "timeouts": test.timeouts[step],
+                                  "p50": p50, "p95": p95, "p99": p99}
+        print(f"  {step:<8} n={len(ordered):<7} p50={p50 * 1000:8.1f}ms  p95={p95 * 1000:8.1f}ms  "
+              f"p99={p99 * 1000:8.1f}ms  таймаутов {test.timeouts[step]}")
+    print(f"ошибки обработчиков: {recorder.errors or 'нет'}, таймаутов шагов: {timeouts}")
+    print(f"Telegram: вызовов {sum(telegram.calls.values())} {dict(sorted(telegram.calls.items()))}, "
+          f"внесённых ошибок {telegram.errors}")
+    print(f"OpenRouter: запросов {openrouter.requests}, внесённых ошибок {openrouter.errors}")
+    # ru_maxrss в Linux - в килобайтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"память: до запуска {rss_before:.0f} МБ, после on_startup {rss_started:.0f} МБ, "
+          f"после теста {rss_after:.0f} МБ (рост {rss_after - rss_started:+.0f} МБ, пик {peak:.0f} МБ)")
+    print(f"БД в {workdir}: " + ", ".join(f"{name} {size / 1024:.0f} КБ" for name, size in files.items()))
+    results.update(rss_growth_mb=rss_after - rss_started, db_bytes=sum(files.values()))
+
+    report_histograms("методы БД (p99 по корзинам, худшие):", db_query_seconds, 6)
+    report_histograms("этапы запроса к модели:", ai_stage_seconds, 8)
+
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    failures = []
+    worst_p99 = max(step["p99"] for step in results["steps"].values())
+    if args.max_p99 is not None and worst_p99 > args.max_p99:
+        failures.append(f"p99 {worst_p99:.3f}s больше {args.max_p99}s")
+    if args.min_throughput is not None and throughput < args.min_throughput:
+        failures.append(f"пропускная способность {throughput:.0f}/с меньше {args.min_throughput}/с")
+    if args.max_error_rate is not None and error_rate > args.max_error_rate:
+        failures.append(f"доля ошибок {error_rate:.2%} больше {args.max_error_rate:.2%}")
+    for failure in failures:
+        print(f"ПРОВАЛ: {failure}")
+    return 1 if failures else 0
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200, help="одновременно активных пользователей")
+    parser.add_argument("--distinct-queries", type=int, default=500,
+                        help="различных поисковых запросов (меньше - больше попаданий в кэш)")
+    parser.add_argument("--think-time", type=float, default=0.0, help="средняя пауза между шагами, сек")
+    parser.add_argument("--step-timeout", type=float, default=60.0)
+    parser.add_argument("--throttle", action="store_true", help="не отключать ограничение частоты")
+    parser.add_argument("--workdir", help="каталог для файлов БД (по умолчанию временный)")
+    parser.add_argument("--tg-latency", type=float, default=0.005)
+    parser.add_argument("--tg-jitter", type=float, default=0.01)
+    parser.add_argument("--tg-tail-rate", type=float, default=0.0)
+    parser.add_argument("--tg-tail-latency", type=float, default=0.5)
+    parser.add_argument("--tg-error-rate", type=float, default=0.0)
+    parser.add_argument("--ai-latency", type=float, default=0.3)
+    parser.add_argument("--ai-jitter", type=float, default=0.4)
+    parser.add_argument("--ai-tail-rate", type=float, default=0.01)
+    parser.add_argument("--ai-tail-latency", type=float, default=3.0)
+    parser.add_argument("--ai-error-rate", type=float, default=0.0)
+    parser.add_argument("--ai-token-delay", type=float, default=0.0)
+    parser.add_argument("--max-p99", type=float, help="порог p99 любого шага, сек")
+    parser.add_argument("--min-throughput", type=float, help="порог обновлений в секунду")
+    parser.add_argument("--max-error-rate", type=float, help="порог доли ошибок и таймаутов")
+    parser.add_argument("--json", help="файл для результатов")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    # bot.py настраивает журнал на INFO: оставляем только предупреждения и ошибки
+    logging.getLogger().setLevel(logging.WARNING)
+    sys.exit(asyncio.run(main(arguments)))
@@ -0,0 +1,81 @@
+"""
+Бенчмарк: накладные расходы метрик на горячем пути и стоимость сбора.
+
+Запуск:
+    python -m benchmarks.bench_metrics --rounds 200000
+
+Измеряет запись в гистограмму, корутину с обёрткой timed против той же
+корутины без неё, время формирования ответа /metrics для заданного
+количества рядов и точность оценки p50/p99 по корзинам гистограммы
+(как её считает histogram_quantile в Prometheus) против точных значений.
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Callable
+
+from services.metrics import Histogram, MetricsRegistry, timed
+
+
+def _measure(title: str, func: Callable[[], object], rounds: int) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    per_call = (time.perf_counter() - started) / rounds
+    print(f"{title:<40} {per_call * 1e9:8.0f} нс")
+    return per_call
+
+
+async def _measure_async(title: str, func, rounds: int) -> float:
+    await func()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        await func()
+    per_call = (time.perf_counter() - started) / rounds
+    print(f"{title:<40} {per_call * 1e9:8.0f} нс")
+    return per_call
+
+
+async def main(rounds: int, series: int):
+    registry = MetricsRegistry()
+    histogram = registry.histogram("bench_seconds", "Бенчмарк", ("method",))
+    ready = histogram.labels("ready")
+
+    print("запись:")
+    _measure("  observe в заранее полученный ряд", lambda: ready.observe(0.003), rounds)
+    _measure("  observe с поиском ряда по меткам", lambda: histogram.observe(0.003, "ready"), rounds)
+
+    async def query():
+        return None
+
+    wrapped = timed(histogram, errors=registry.counter("bench_errors_total", "Ошибки", ("method",)))(query)
+    before = await _measure_async("  корутина без обёртки", query, rounds)
+    after = await _measure_async("  корутина с timed", wrapped, rounds)
+    print(f"{'':<40} +{(after - before) * 1e9:.0f} нс на вызов")
+
+    print(f"сбор ({series} рядов гистограммы):")
+    for i in range(series):
+        histogram.observe(0.01, f"method_{i}")
+    started = time.perf_counter()
+    text = registry.render()
+    print(f"  render: {(time.perf_counter() - started) * 1000:.1f} мс, {len(text) / 1024:.0f} КБ")
+
+    print("точность квантилей (логнормальные задержки, медиана 40 мс):")
+    rnd = random.Random(1)
+    values = sorted(rnd.lognormvariate(-3.2, 0.8) for _ in range(20000))
+    latency = Histogram("latency_seconds", "Задержка").labels()
+    for value in values:
+        latency.observe(value)
+    for q in (0.5, 0.99):
+        exact = values[int(len(values) * q)]
+        print(f"  p{int(q * 100)}: точно {exact * 1000:.1f} мс, по корзинам {latency.quantile(q) * 1000:.1f} мс")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200000)
+    parser.add_argument("--series", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.series))
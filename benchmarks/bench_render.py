@@ -0,0 +1,99 @@
+"""
+Бенчмарк: стоимость подготовки ответа на одно обновление.
+
+Запуск:
+    python -m benchmarks.bench_render --rounds 20000
+
+Сравнивает прежний способ (текст рекомендаций через += и новая
+клавиатура на каждое нажатие) с utils.views: один join с экранированием
+и разбиением по лимиту Telegram, клавиатуры и статические экраны,
+собранные при импорте.
+"""
+import argparse
+import time
+from typing import Callable, List
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from benchmarks.fakes import SAMPLE_GAMES
+from database.models import GameInfo
+from keyboards.inline import get_back_keyboard, get_main_menu_keyboard
+from services.parsing import game_from_raw
+from utils.views import render_recommendations
+
+
+def legacy_format_recommendations(games_info: List[GameInfo]) -> str:
+    """Прежнее форматирование из handlers/search.py (без экранирования и лимита)"""
+    result_text = "🎮 <b>Рекомендации для вас:</b>\n\n"
+    for i, game in enumerate(games_info, 1):
+        result_text += f"<b>{i}. {game.name}</b>\n"
+        if game.rating:
+            stars = "⭐" * int(game.rating)
+            result_text += f"🎮 Рейтинг: {game.rating}/5 {stars}\n"
+        if game.released:
+            result_text += f"📅 Год выпуска: {game.released}\n"
+        if game.genres:
+            result_text += f"🎯 Жанры: {game.genres}\n"
+        if game.platforms:
+            result_text += f"💻 Платформы: {game.platforms}\n"
+        if game.description:
+            result_text += f"\n📝 <i>{game.description}</i>\n"
+        result_text += "\n" + "─" * 30 + "\n\n"
+    return result_text
+
+
+def legacy_back_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_menu")]
+    ])
+
+
+def legacy_main_menu_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔍 Поиск игр", callback_data="search")],
+        [InlineKeyboardButton(text="📚 История запросов", callback_data="history")],
+        [InlineKeyboardButton(text="❓ Помощь", callback_data="help")],
+        [InlineKeyboardButton(text="ℹ️ О проекте", callback_data="info")]
+    ])
+
+
+def _measure(title: str, func: Callable[[], object], rounds: int) -> float:
+    func()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    per_call = (time.perf_counter() - started) / rounds
+    print(f"{title:<40} {per_call * 1e6:8.1f} мкс")
+    return per_call
+
+
+def main(rounds: int):
+    games = [game_from_raw(raw) for raw in SAMPLE_GAMES]
+    # Ответ с «<» и «&» в описании: прежний вариант отправил бы сломанную разметку
+    games.append(GameInfo(name="Rock & Roll <Racing>", rating=4.1, released="1993",
+                          genres="Racing", platforms="PC, SNES",
+                          description="Гонки с оружием: A < B & C"))
+
+    print(f"рекомендации ({len(games)} игр):")
+    before = _measure("  += без экранирования", lambda: legacy_format_recommendations(games), rounds)
+    after = _measure("  join + escape_html + разбиение", lambda: render_recommendations(games), rounds)
+    print(f"{'':<40} {after / before:.2f}x от прежнего")
+
+    long_games = [GameInfo(name=f"Game {i}", description="Очень длинное описание. " * 60)
+                  for i in range(10)]
+    pages = render_recommendations(long_games)
+    _measure(f"  длинный ответ ({len(pages)} сообщения)", lambda: render_recommendations(long_games), rounds)
+
+    print("клавиатуры:")
+    before = _measure("  главное меню: новая на каждое нажатие", legacy_main_menu_keyboard, rounds)
+    after = _measure("  главное меню: собрана при импорте", get_main_menu_keyboard, rounds)
+    print(f"{'':<40} экономия {(before - after) * 1e6:.1f} мкс на ответ")
+    _measure("  «назад»: новая на каждое нажатие", legacy_back_keyboard, rounds)
+    _measure("  «назад»: собрана при импорте", get_back_keyboard, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20000)
+    args = parser.parse_args()
+    main(args.rounds)
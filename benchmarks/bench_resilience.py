@@ -0,0 +1,133 @@
+"""
+Бенчмарк: повторы запросов и выключатель при сбоях OpenRouter.
+
+Запуск:
+    python -m benchmarks.bench_resilience --requests 300 --error-rate 0.3
+
+Три сценария на локальной заглушке:
+
+1. Кратковременные сбои: доля error_rate ответов - 503 с Retry-After.
+   Сравнивается доля успешных запросов без повторов и с ними.
+2. Отказ: все ответы - 503 после задержки latency (перегруженный
+   провайдер). Без выключателя каждый запрос ждёт все попытки; с ним
+   после AI_BREAKER_THRESHOLD ошибок запросы отклоняются сразу и не
+   нагружают провайдера.
+3. Восстановление: провайдер снова отвечает, и через recovery секунд
+   пробный запрос замыкает выключатель.
+4. Лимит запросов: доля error_rate ответов - 429 с Retry-After.
+   Выключатель не размыкается, запросы ждут указанное сервером время.
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import List, Tuple
+
+from benchmarks.fakes import FakeOpenRouter
+from services.ai_service import AIService
+from services.resilience import CircuitBreaker, RetryPolicy
+from services.scheduler import FairScheduler
+
+MODEL = "primary/model:free"
+
+
+async def _run(service: AIService, total: int, concurrency: int, prefix: str) -> Tuple[int, List[float]]:
+    latencies: List[float] = []
+    succeeded = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        nonlocal succeeded
+        async with semaphore:
+            started = time.perf_counter()
+            # Уникальные запросы: без кэша и объединения одинаковых
+            games = await service.get_game_recommendations_with_details(f"{prefix} {i}")
+            latencies.append(time.perf_counter() - started)
+            if games:
+                succeeded += 1
+
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return succeeded, latencies
+
+
+def _report(title: str, succeeded: int, latencies: List[float], upstream: int, total: int):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{title:<24} ok={succeeded / total:6.1%}  p50={statistics.median(ordered) * 1000:7.1f}ms  "
+        f"p99={p99 * 1000:7.1f}ms  upstream/request={upstream / total:5.2f}"
+    )
+
+
+async def _service(url: str, concurrency: int, attempts: int, threshold: int, recovery: float) -> AIService:
+    service = AIService(scheduler=FairScheduler(max_concurrency=concurrency))
+    service.api_url = url
+    service.model, service.backup_models = MODEL, []
+    service.hedging = False
+    service.retry = RetryPolicy(attempts=attempts, base_delay=0.05, max_delay=0.5)
+    service._breakers[MODEL] = CircuitBreaker(MODEL, failure_threshold=threshold, recovery_timeout=recovery)
+    await service.start()
+    return service
+
+
+async def main(total: int, concurrency: int, latency: float, error_rate: float, recovery: float):
+    print(f"1. кратковременные сбои: {error_rate:.0%} ответов 503, Retry-After: 0.1")
+    for attempts in (1, 3):
+        server = FakeOpenRouter(latency=latency, error_rate=error_rate, error_status=503, retry_after=0.1)
+        url = await server.start()
+        service = await _service(url, concurrency, attempts, threshold=0, recovery=recovery)
+        succeeded, latencies = await _run(service, total, concurrency, "сбой")
+        _report(f"attempts={attempts}", succeeded, latencies, server.requests, total)
+        await service.close()
+        await server.stop()
+
+    print(f"\n2. отказ: все ответы 503 через {latency * 10:.2f}s")
+    for threshold in (0, 5):
+        server = FakeOpenRouter(latency=latency * 10, error_rate=1.0, error_status=503)
+        url = await server.start()
+        service = await _service(url, concurrency, 3, threshold=threshold, recovery=recovery)
+        succeeded, latencies = await _run(service, total, concurrency, "отказ")
+        _report("no breaker" if not threshold else f"breaker threshold={threshold}",
+                succeeded, latencies, server.requests, total)
+        if threshold:
+            print(f"{'':<24} {service.resilience_stats()}")
+
+            print(f"\n3. восстановление: провайдер отвечает, пауза {recovery:.1f}s до пробного запроса")
+            server.error_rate = 0.0
+            server.latency = latency
+            rejected, _ = await _run(service, concurrency, concurrency, "до паузы")
+            print(f"{'до паузы':<24} ok={rejected / concurrency:6.1%}")
+            await asyncio.sleep(recovery)
+            # Первый запрос после паузы - пробный: пока он идёт, остальные отклоняются
+            probe, _ = await _run(service, 1, 1, "проба")
+            print(f"{'пробный запрос':<24} ok={probe:6.1%}")
+            before = server.requests
+            succeeded, latencies = await _run(service, total, concurrency, "после паузы")
+            _report("после пробы", succeeded, latencies, server.requests - before, total)
+            print(f"{'':<24} {service.resilience_stats()}")
+        await service.close()
+        await server.stop()
+
+    print(f"\n4. лимит запросов: {error_rate:.0%} ответов 429, Retry-After: 0.2")
+    server = FakeOpenRouter(latency=latency, error_rate=error_rate, error_status=429, retry_after=0.2)
+    url = await server.start()
+    service = await _service(url, concurrency, 3, threshold=5, recovery=recovery)
+    succeeded, latencies = await _run(service, total, concurrency, "лимит")
+    _report("breaker threshold=5", succeeded, latencies, server.requests, total)
+    print(f"{'':<24} {service.resilience_stats()}")
+    await service.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.3)
+    parser.add_argument("--recovery", type=float, default=1.0)
+    args = parser.parse_args()
+    # Каждый отклонённый запрос пишет предупреждение - в бенчмарке это шум
+    logging.basicConfig(level=logging.CRITICAL)
+    asyncio.run(main(args.requests, args.concurrency, args.latency, args.error_rate, args.recovery))
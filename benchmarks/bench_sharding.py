@@ -0,0 +1,69 @@
+"""
+Бенчмарк: запись истории в один файл SQLite против нескольких шардов.
+
+Запуск:
+    python -m benchmarks.bench_sharding --users 200 --queries 20 --shards 4
+
+Каждый пользователь - отдельная корутина, пишущая свои запросы без
+write-behind, то есть каждая вставка - отдельная транзакция. На одном
+файле все они встают в очередь за единственным писателем SQLite, на
+шардах очередей столько же, сколько файлов.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import List
+
+from database.db import Database, ShardedDatabase
+
+
+async def _drive(database, users: int, queries: int) -> List[float]:
+    """Параллельная запись queries запросов от каждого из users пользователей"""
+    latencies: List[float] = []
+    
+    async def user(user_id: int):
+        for i in range(queries):
+            started = time.perf_counter()
+            await database.add_search_query(user_id, f"запрос {i} пользователя {user_id}")
+            latencies.append(time.perf_counter() - started)
+    
+    await asyncio.gather(*(user(1000 + u) for u in range(users)))
+    return latencies
+
+
+def _report(title: str, latencies: List[float], elapsed: float):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{title:<16} total={elapsed:7.3f}s  rows/s={len(ordered) / elapsed:9.0f}  "
+        f"p50={statistics.median(ordered) * 1000:7.2f}ms  p99={p99 * 1000:7.2f}ms"
+    )
+
+
+async def _measure(title: str, database, users: int, queries: int):
+    await database.connect()
+    await database.init_db()
+    started = time.perf_counter()
+    latencies = await _drive(database, users, queries)
+    elapsed = time.perf_counter() - started
+    await database.close()
+    _report(title, latencies, elapsed)
+
+
+async def main(users: int, queries: int, shards: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await _measure("single file", Database(path), users, queries)
+        await _measure(f"{shards} shards", ShardedDatabase(os.path.join(tmp, "sharded.db"), shards), users, queries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--shards", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.users, args.queries, args.shards))
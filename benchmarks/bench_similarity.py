@@ -0,0 +1,116 @@
+"""
+Бенчмарк: индекс похожих запросов (заполнение, поиск, память, качество).
+
+Запуск:
+    python -m benchmarks.bench_similarity --entries 100000
+
+Заполняет индекс синтетическими запросами пользователей (жанр + тема +
+платформа в разных формулировках), измеряет время добавления, задержку
+поиска ближайшего запроса и занятую память, затем проверяет на парах
+перефразированных запросов, что похожие находятся, а запросы с другим
+жанром - нет.
+"""
+import argparse
+import random
+import statistics
+import resource
+import time
+from typing import List
+
+from database.models import GameInfo
+from services.similarity import SimilarityIndex
+
+GENRES = ["шутер", "стратегия", "RPG", "хоррор", "гонки", "симулятор", "головоломка",
+          "платформер", "файтинг", "стелс экшен", "приключение", "пошаговая стратегия"]
+TOPICS = ["про зомби", "про космос", "про вторую мировую", "с драконами", "про самураев",
+          "про пиратов", "в средневековье", "в киберпанке", "с открытым миром", "про ниндзя",
+          "про роботов", "на выживание", "про детектива", "в фэнтези мире"]
+EXTRAS = ["", "", "на телефон", "на пк", "для двоих", "кооперативный", "с хорошим сюжетом",
+          "инди", "на вечер", "как ведьмак", "без доната", "2023 года"]
+PREFIXES = ["", "", "хочу", "посоветуй", "подбери", "ищу"]
+
+# (сохранённый запрос, перефразированный запрос, должен ли найтись)
+PARAPHRASES = [
+    ("шутер про вторую мировую", "FPS во Второй мировой войне", True),
+    ("шутер про вторую мировую", "шутер о второй мировой войне", True),
+    ("RPG с открытым миром и драконами", "РПГ с открытым миром и драконом", True),
+    ("хоррор про зомби", "хочу игру про зомби хоррор", True),
+    ("игра про самураев", "игры про самураев", True),
+    ("шутер про вторую мировую", "стратегия во Второй мировой", False),
+    ("хоррор про зомби", "гонки про зомби", False),
+    ("игра про самураев", "игра про пиратов", False),
+]
+
+
+def make_queries(count: int) -> List[str]:
+    rnd = random.Random(42)
+    queries = set()
+    while len(queries) < count:
+        parts = [rnd.choice(PREFIXES), rnd.choice(GENRES), rnd.choice(TOPICS), rnd.choice(EXTRAS)]
+        # Номер делает запросы уникальными, как названия игр-ориентиров у пользователей
+        queries.add(" ".join(p for p in parts if p) + f" {rnd.randint(1, count)}")
+    return list(queries)
+
+
+def _report(title: str, latencies: List[float]):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{title:<28} p50={statistics.median(ordered) * 1000:7.2f}ms  p99={p99 * 1000:7.2f}ms")
+
+
+def main(entries: int, dim: int, lookups: int):
+    queries = make_queries(entries)
+    games = [GameInfo(name="Game")]
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    index = SimilarityIndex(dim=dim, max_entries=entries, ttl=0)
+    started = time.perf_counter()
+    for query in queries:
+        index.add(query, games)
+    elapsed = time.perf_counter() - started
+    # ru_maxrss в Linux - в килобайтах
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024
+    stats = index.stats()
+    print(f"заполнение: {len(index)} запросов за {elapsed:.1f}s "
+          f"({elapsed / len(index) * 1e6:.0f} мкс на запрос)")
+    print(f"память: матрица {stats['memory_mb']} МБ, рост RSS процесса {rss_growth:.0f} МБ")
+
+    rnd = random.Random(7)
+    latencies: List[float] = []
+    for _ in range(lookups):
+        query = rnd.choice(queries)
+        started = time.perf_counter()
+        index.get(query)
+        latencies.append(time.perf_counter() - started)
+    _report(f"поиск ({len(index)} запросов)", latencies)
+
+    # Добавление сверх max_entries вытесняет давно не использованные записи
+    extra = 1000
+    started = time.perf_counter()
+    for i in range(extra):
+        index.add(f"{rnd.choice(GENRES)} {rnd.choice(TOPICS)} новый {i}", games)
+    per_query = (time.perf_counter() - started) / extra
+    print(f"{'добавление с вытеснением':<28} {per_query * 1000:.2f}ms на запрос, "
+          f"вытеснено {index.evictions}")
+
+    quality = SimilarityIndex(dim=dim, max_entries=100, ttl=0)
+    for stored in {stored for stored, _, _ in PARAPHRASES}:
+        quality.add(stored, games)
+    correct = 0
+    for stored, paraphrase, expected in PARAPHRASES:
+        match = quality.get(paraphrase)
+        found = match is not None and match[0] == stored
+        correct += found == expected
+        score = dict(quality.search(paraphrase, k=len(PARAPHRASES))).get(stored, 0.0)
+        print(f"{'':<28} {paraphrase!r} ~ {stored!r}: {score:.2f} "
+              f"{'ответ из индекса' if found else 'запрос к нейросети'}")
+    print(f"{'':<28} верных решений: {correct}/{len(PARAPHRASES)} (порог {quality.threshold})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    main(args.entries, args.dim, args.lookups)
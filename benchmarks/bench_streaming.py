@@ -0,0 +1,53 @@
+"""
+Бенчмарк: время до первой игры в потоковом и обычном режимах AIService.
+
+Запуск:
+    python -m benchmarks.bench_streaming --token-delay 0.01 --runs 5
+
+Заглушка OpenRouter «генерирует» ответ со скоростью один токен
+за --token-delay секунд, как настоящая модель.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import FakeOpenRouter
+from services.ai_service import AIService
+
+
+async def main(token_delay: float, runs: int):
+    server = FakeOpenRouter(token_delay=token_delay)
+    service = AIService()
+    service.api_url = await server.start()
+    await service.start()
+    
+    full, first, stream_total = [], [], []
+    for i in range(runs):
+        started = time.perf_counter()
+        games = await service.get_game_recommendations_with_details(f"запрос без потока {i}")
+        assert games
+        full.append(time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        first_at = None
+        async for _ in service.stream_game_recommendations(f"запрос с потоком {i}"):
+            if first_at is None:
+                first_at = time.perf_counter() - started
+        first.append(first_at)
+        stream_total.append(time.perf_counter() - started)
+    
+    print(f"без потока, первая игра:  {statistics.median(full) * 1000:8.1f} ms")
+    print(f"с потоком, первая игра:   {statistics.median(first) * 1000:8.1f} ms")
+    print(f"с потоком, весь ответ:    {statistics.median(stream_total) * 1000:8.1f} ms")
+    
+    await service.close()
+    await server.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.token_delay, args.runs))
@@ -0,0 +1,164 @@
+"""
+Бенчмарк: доставка обновлений через long polling против вебхука.
+
+Запуск:
+    python -m benchmarks.bench_webhook --updates 1000 --rate 500 --work 0.05
+
+Обновления поступают с постоянной частотой rate в секунду. При polling
+они кладутся в очередь заглушки Telegram и забираются getUpdates, при
+вебхуке отправляются POST-запросами на встроенный aiohttp-сервер бота
+(create_webhook_app из bot.py). Обработчик имитирует работу задержкой
+work и отвечает сообщением; замеряется время от появления обновления до
+входа в обработчик и общая пропускная способность.
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from typing import Dict, List
+
+import aiohttp
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message, Update
+from aiohttp import web
+
+import config
+from benchmarks.fakes import FakeTelegram, make_message_update
+from bot import create_webhook_app
+
+SECRET = "bench-secret"
+
+
+class Probe:
+    """Обработчик-замерщик: фиксирует задержку до входа в обработчик"""
+    
+    def __init__(self, total: int, work: float):
+        self.total = total
+        self.work = work
+        self.created: Dict[int, float] = {}
+        self.latencies: List[float] = []
+        self.completed = 0
+        self.done = asyncio.Event()
+        self.finished_at = 0.0
+    
+    def router(self) -> Router:
+        router = Router()
+        
+        @router.message()
+        async def handle(message: Message, event_update: Update):
+            self.latencies.append(time.perf_counter() - self.created[event_update.update_id])
+            if self.work:
+                await asyncio.sleep(self.work)
+            await message.answer("ok")
+            self.completed += 1
+            if self.completed == self.total:
+                self.finished_at = time.perf_counter()
+                self.done.set()
+        
+        return router
+
+
+def _make_bot(telegram: FakeTelegram) -> Bot:
+    session = AiohttpSession(api=TelegramAPIServer.from_base(telegram.base_url))
+    return Bot(token="123456:BENCH", session=session)
+
+
+async def _feed(total: int, rate: float, deliver, probe: Probe) -> float:
+    """Подача обновлений с частотой rate; возвращает момент первого обновления"""
+    started = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        delay = started + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        update = make_message_update(i + 1, 10_000 + i % 500, f"запрос {i}")
+        probe.created[i + 1] = time.perf_counter()
+        tasks.append(asyncio.ensure_future(deliver(update)))
+    await asyncio.gather(*tasks)
+    return started
+
+
+def _report(title: str, probe: Probe, started: float):
+    ordered = sorted(probe.latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    elapsed = probe.finished_at - started
+    print(
+        f"{title:<8} handled={len(ordered)}  total={elapsed:7.3f}s  upd/s={len(ordered) / elapsed:8.0f}  "
+        f"p50={statistics.median(ordered) * 1000:7.2f}ms  p99={p99 * 1000:7.2f}ms"
+    )
+
+
+async def bench_polling(total: int, rate: float, work: float):
+    telegram = FakeTelegram()
+    await telegram.start()
+    bot = _make_bot(telegram)
+    probe = Probe(total, work)
+    dp = Dispatcher()
+    dp.include_router(probe.router())
+    
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+    
+    async def deliver(update):
+        telegram.push_update(update)
+    
+    started = await _feed(total, rate, deliver, probe)
+    await asyncio.wait_for(probe.done.wait(), timeout=120)
+    _report("polling", probe, started)
+    
+    await dp.stop_polling()
+    await polling
+    await telegram.stop()
+
+
+async def bench_webhook(total: int, rate: float, work: float):
+    telegram = FakeTelegram()
+    await telegram.start()
+    bot = _make_bot(telegram)
+    probe = Probe(total, work)
+    dp = Dispatcher()
+    dp.include_router(probe.router())
+    
+    runner = web.AppRunner(create_webhook_app(dp, bot, SECRET), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+    url = f"http://127.0.0.1:{port}{config.WEBHOOK_PATH}"
+    
+    # Как и Telegram, держим ограниченное число соединений к вебхуку
+    connector = aiohttp.TCPConnector(limit=config.WEBHOOK_MAX_CONNECTIONS)
+    async with aiohttp.ClientSession(connector=connector) as client:
+        async with client.post(url, json=make_message_update(0, 1, "x"),
+                               headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"}) as response:
+            assert response.status == 401, "запрос с неверным секретом должен отклоняться"
+        
+        async def deliver(update):
+            async with client.post(url, json=update,
+                                   headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}) as response:
+                assert response.status == 200
+        
+        started = await _feed(total, rate, deliver, probe)
+        await asyncio.wait_for(probe.done.wait(), timeout=120)
+    _report("webhook", probe, started)
+    
+    await runner.cleanup()
+    await telegram.stop()
+
+
+async def main(total: int, rate: float, work: float):
+    await bench_polling(total, rate, work)
+    await bench_webhook(total, rate, work)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=500, help="обновлений в секунду")
+    parser.add_argument("--work", type=float, default=0.05, help="время работы обработчика, сек")
+    args = parser.parse_args()
+    # Построчный лог каждого обновления исказил бы замер
+    logging.getLogger("aiogram.event").setLevel(logging.WARNING)
+    asyncio.run(main(args.updates, args.rate, args.work))
@@ -0,0 +1,88 @@
+"""
+Бенчмарк: пропускная способность кластера в зависимости от числа процессов.
+
+Запуск:
+    python -m benchmarks.bench_workers --updates 2000 --workers 1 2 4
+
+Обновления пересылаются процессам-обработчикам через ClusterFront (как
+в cluster.py), ответы уходят в заглушку Telegram. Обработчик выполняет
+CPU-работу, типичную для поиска: разбор ответа модели, валидацию моделей
+aiogram и форматирование HTML. Прирост виден только при наличии
+свободных ядер: на одноядерной машине все варианты упираются в одно ядро.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from aiogram import Dispatcher, Router
+from aiogram.types import Message
+
+from benchmarks.fakes import SAMPLE_GAMES, FakeTelegram, make_message_update
+
+# Ответ модели, который обработчик разбирает на каждое обновление
+_CONTENT = json.dumps(SAMPLE_GAMES * 3, ensure_ascii=False)
+
+
+def create_probe_dispatcher(maintenance: bool = True) -> Dispatcher:
+    """Фабрика Dispatcher для процессов-обработчиков бенчмарка"""
+    from services.parsing import decode_games
+    from utils.views import render_recommendations
+    
+    router = Router()
+    
+    @router.message()
+    async def handle(message: Message):
+        games = decode_games(_CONTENT)
+        await message.answer(render_recommendations(games)[0])
+    
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def _measure(workers: int, total: int, users: int, telegram: FakeTelegram):
+    from cluster import ClusterFront, WorkerPool
+    
+    pool = WorkerPool(workers, factory="benchmarks.bench_workers:create_probe_dispatcher")
+    await pool.start()
+    front = ClusterFront(pool.socket_paths)
+    await front.start()
+    
+    telegram.sent.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        front.dispatch(make_message_update(i + 1, 10_000 + i % users, f"запрос {i}"))
+        for i in range(total)
+    ))
+    while len(telegram.sent) < total:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    
+    await front.close()
+    await pool.stop()
+    print(f"workers={workers:<3} total={elapsed:7.3f}s  upd/s={total / elapsed:8.0f}  "
+          f"per worker={front.forwarded}")
+
+
+async def main(total: int, users: int, worker_counts):
+    telegram = FakeTelegram()
+    await telegram.start()
+    # Процессы-обработчики создают Bot через config и отправляют ответы в заглушку
+    os.environ["TELEGRAM_API_URL"] = telegram.base_url
+    print(f"CPU: {os.cpu_count()}")
+    for workers in worker_counts:
+        await _measure(workers, total, users, telegram)
+    await telegram.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(args.updates, args.users, args.workers))
@@ -0,0 +1,427 @@
+"""
+Локальные заглушки внешних API для бенчмарков.
+
+Запускаются на 127.0.0.1 и не требуют доступа в интернет.
+"""
+import asyncio
+import json
+import os
+import random
+import shutil
+import ssl
+import subprocess
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web
+
+from services.ai_service import COMPACT_SYSTEM_PROMPT
+from services.parsing import COMPACT_FIELDS
+
+
+# Пример ответа модели в «старом» подробном формате
+SAMPLE_GAMES: List[Dict[str, Any]] = [
+    {
+        "name": "The Witcher 3: Wild Hunt",
+        "genres": "RPG, Приключения, Открытый мир",
+        "platforms": "PC, PlayStation, Xbox, Nintendo Switch",
+        "released": "2015",
+        "rating": 4.8,
+        "description": "Эпическая ролевая игра с открытым миром о ведьмаке Геральте из Ривии.",
+    },
+    {
+        "name": "Skyrim",
+        "genres": "RPG, Открытый мир",
+        "platforms": "PC, PlayStation, Xbox, Nintendo Switch",
+        "released": "2011",
+        "rating": 4.6,
+        "description": "Ролевая игра в суровом северном мире, полном драконов и древней магии.",
+    },
+    {
+        "name": "Ghost of Tsushima",
+        "genres": "Экшен, Приключения, Открытый мир",
+        "platforms": "PlayStation, PC",
+        "released": "2020",
+        "rating": 4.7,
+        "description": "Приключение самурая Дзина Сакаи во время монгольского вторжения на остров Цусима.",
+    },
+]
+
+
+def make_self_signed_cert(directory: str) -> Optional[Tuple[str, str]]:
+    """
+    Генерация самоподписанного сертификата для 127.0.0.1 через openssl
+
+    Returns:
+        Пара (certfile, keyfile) или None, если openssl недоступен
+    """
+    if shutil.which("openssl") is None:
+        return None
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    result = subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", keyfile, "-out", certfile, "-days", "1",
+            "-subj", "/CN=127.0.0.1",
+            "-addext", "subjectAltName=IP:127.0.0.1",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    if result.returncode != 0:
+        return None
+    return certfile, keyfile
+
+
+def make_tls_contexts() -> Optional[Tuple[ssl.SSLContext, ssl.SSLContext]]:
+    """
+    Пара SSL-контекстов (серверный, клиентский) с самоподписанным сертификатом
+
+    Returns:
+        (server_ctx, client_ctx) или None, если сертификат создать не удалось
+    """
+    directory = tempfile.mkdtemp(prefix="bench-tls-")
+    pair = make_self_signed_cert(directory)
+    if pair is None:
+        return None
+    certfile, keyfile = pair
+    server_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server_ctx.load_cert_chain(certfile, keyfile)
+    client_ctx = ssl.create_default_context(cafile=certfile)
+    return server_ctx, client_ctx
+
+
+class FakeOpenRouter:
+    """Заглушка эндпоинта OpenRouter /chat/completions"""
+    
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500,
+                 games: Optional[List[Dict[str, Any]]] = None,
+                 token_delay: float = 0.0, chars_per_token: int = 4,
+                 tail_rate: float = 0.0, tail_latency: float = 0.0,
+                 retry_after: Optional[float] = None):
+        """
+        Args:
+            latency: Задержка перед ответом (до первого байта), сек
+            jitter: Случайная добавка к задержке, сек
+            error_rate: Доля ответов с ошибкой
+            error_status: HTTP-статус ошибочного ответа
+            games: Игры, которые «рекомендует» модель
+            token_delay: Время генерации одного токена, сек
+            chars_per_token: Сколько символов ответа считать одним токеном
+            tail_rate: Доля «хвостовых» ответов с задержкой tail_latency
+            tail_latency: Задержка хвостового ответа, сек
+            retry_after: Значение заголовка Retry-After в ошибочных ответах
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.games = games if games is not None else SAMPLE_GAMES
+        self.token_delay = token_delay
+        self.chars_per_token = chars_per_token
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.retry_after = retry_after
+        self.requests = 0
+        self.requests_by_model: Dict[str, int] = {}
+        self.errors = 0
+        self._peers: Set[Any] = set()
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+    
+    @property
+    def connections(self) -> int:
+        """Количество различных TCP-соединений (≈ количество handshake)"""
+        return len(self._peers)
+    
+    def completion_content(self, payload: Dict[str, Any]) -> str:
+        """
+        Текст ответа модели в формате, который запросил клиент:
+        объект {"games": ...} для response_format, позиционные массивы
+        для компактного промпта и массив объектов для подробного
+        """
+        messages = payload.get("messages") or [{}]
+        compact = "response_format" in payload or messages[0].get("content") == COMPACT_SYSTEM_PROMPT
+        if not compact:
+            return json.dumps(self.games, ensure_ascii=False, indent=2)
+        rows = [[game.get(field) for field in COMPACT_FIELDS] for game in self.games]
+        if "response_format" in payload:
+            return json.dumps({"games": rows}, ensure_ascii=False)
+        return json.dumps(rows, ensure_ascii=False)
+    
+    def usage(self, payload: Dict[str, Any], content: str) -> Dict[str, Any]:
+        """
+        Блок usage, как его возвращает OpenRouter (токены считаются по символам);
+        при usage: {include: true} - со стоимостью запроса
+        """
+        prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages") or [])
+        prompt_tokens = prompt_chars // max(1, self.chars_per_token)
+        completion_tokens = len(self._tokens(content))
+        usage: Dict[str, Any] = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        if (payload.get("usage") or {}).get("include"):
+            usage["cost"] = round((prompt_tokens + 4 * completion_tokens) * 1e-7, 8)
+        return usage
+    
+    async def _delay(self):
+        delay = self.latency + random.uniform(0, self.jitter) if self.jitter else self.latency
+        if self.tail_rate and random.random() < self.tail_rate:
+            delay = self.tail_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    def _tokens(self, content: str) -> List[str]:
+        step = max(1, self.chars_per_token)
+        return [content[i:i + step] for i in range(0, len(content), step)]
+    
+    async def _stream(self, request: web.Request, content: str,
+                      usage: Optional[Dict[str, Any]] = None) -> web.StreamResponse:
+        """Ответ в формате SSE, как при stream: true (usage - последним чанком)"""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        try:
+            await response.prepare(request)
+            await response.write(b": OPENROUTER PROCESSING\n\n")
+            for token in self._tokens(content):
+                if self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            if usage is not None:
+                await response.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+            await response.write(b"data: [DONE]\n\n")
+            await response.write_eof()
+        except ConnectionResetError:
+            # Клиент прекратил чтение потока
+            pass
+        return response
+    
+    async def handle_completion(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        if request.transport is not None:
+            self._peers.add(request.transport.get_extra_info("peername"))
+        payload = await request.json() if request.can_read_body else {}
+        model = payload.get("model", "")
+        self.requests_by_model[model] = self.requests_by_model.get(model, 0) + 1
+        await self._delay()
+        
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else None
+            return web.json_response({"error": {"message": "injected"}}, status=self.error_status, headers=headers)
+        
+        content = self.completion_content(payload)
+        if payload.get("stream"):
+            # Как и OpenRouter, в потоке usage присылается только по запросу
+            usage = self.usage(payload, content) if (payload.get("usage") or {}).get("include") else None
+            return await self._stream(request, content, usage)
+        if self.token_delay:
+            # Без потока клиент ждёт, пока сгенерируется весь ответ
+            await asyncio.sleep(self.token_delay * len(self._tokens(content)))
+        
+        return web.json_response({
+            "id": f"gen-{self.requests}",
+            "choices": [{"message": {"role": "assistant", "content": content}}],
+            "usage": self.usage(payload, content),
+        })
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0,
+                    ssl_context: Optional[ssl.SSLContext] = None) -> str:
+        """Запуск сервера; возвращает URL эндпоинта chat/completions"""
+        app = web.Application()
+        app.router.add_post("/api/v1/chat/completions", self.handle_completion)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port, ssl_context=ssl_context)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        scheme = "https" if ssl_context is not None else "http"
+        self.url = f"{scheme}://{host}:{bound_port}/api/v1/chat/completions"
+        return self.url
+    
+    async def stop(self):
+        """Остановка сервера"""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def make_message_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    """Обновление Telegram с текстовым сообщением в личном чате"""
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+            "from": user,
+            "text": text,
+        },
+    }
+
+
+def make_callback_update(update_id: int, user_id: int, data: str, message_id: int = 1) -> Dict[str, Any]:
+    """Обновление Telegram с нажатием inline-кнопки"""
+    user = {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(user_id),
+            "data": data,
+            "message": {
+                "message_id": message_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private", "first_name": user["first_name"]},
+                "text": "...",
+            },
+        },
+    }
+
+
+class FakeTelegram:
+    """
+    Заглушка Telegram Bot API: long polling getUpdates и методы отправки.
+    
+    Все отправленные ботом сообщения сохраняются в sent вместе со временем
+    получения, чтобы бенчмарки могли измерять задержку ответа.
+    """
+    
+    BOT_USER = {"id": 1, "is_bot": True, "first_name": "GameBot", "username": "game_bot"}
+    
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0,
+                 tail_rate: float = 0.0, tail_latency: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 500,
+                 retry_after: Optional[int] = None, record_sent: bool = True):
+        """
+        Args:
+            latency: Задержка ответа на каждый вызов метода API, сек
+            jitter: Случайная добавка к задержке, сек
+            tail_rate: Доля «хвостовых» ответов с задержкой tail_latency
+            tail_latency: Задержка хвостового ответа, сек
+            error_rate: Доля ошибочных ответов на методы отправки (кроме getUpdates)
+            error_status: Код ошибки (500, 429 и т.п.)
+            retry_after: parameters.retry_after в ошибочном ответе (для 429)
+            record_sent: Сохранять ли отправленные сообщения в sent (при долгом
+                нагрузочном тесте - только счётчики calls)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.errors = 0
+        self.record_sent = record_sent
+        self.calls: Dict[str, int] = {}
+        self.sent: List[Tuple[float, str, Dict[str, Any]]] = []
+        self.webhook: Dict[str, Any] = {}
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._message_ids = 1000
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+    
+    async def _delay(self):
+        delay = self.latency + random.uniform(0, self.jitter) if self.jitter else self.latency
+        if self.tail_rate and random.random() < self.tail_rate:
+            delay = self.tail_latency
+        if delay > 0:
+            await asyncio.sleep(delay)
+    
+    def push_update(self, update: Dict[str, Any]):
+        """Постановка обновления в очередь getUpdates"""
+        self._updates.append(update)
+        self._new_updates.set()
+    
+    def _message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        self._message_ids += 1
+        chat_id = int(params.get("chat_id") or 0)
+        return {
+            "message_id": int(params.get("message_id") or self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": self.BOT_USER,
+            "text": params.get("text", ""),
+        }
+    
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        if offset:
+            # Подтверждённые клиентом обновления больше не отдаются
+            self._updates = [u for u in self._updates if u["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return self._updates[:limit]
+    
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        try:
+            if request.content_type == "application/json":
+                params = await request.json()
+            else:
+                params = dict(await request.post())
+        except ConnectionResetError:
+            # Клиент оборвал запрос (например, остановка polling)
+            return web.Response(status=499)
+        if method != "getUpdates":
+            await self._delay()
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors += 1
+                error: Dict[str, Any] = {"ok": False, "error_code": self.error_status,
+                                         "description": "injected error"}
+                if self.retry_after is not None:
+                    error["parameters"] = {"retry_after": self.retry_after}
+                return web.json_response(error, status=self.error_status)
+        
+        if method == "getUpdates":
+            result: Any = await self._get_updates(params)
+        elif method == "getMe":
+            result = self.BOT_USER
+        elif method in ("sendMessage", "editMessageText"):
+            if self.record_sent:
+                self.sent.append((time.perf_counter(), method, params))
+            result = self._message(params)
+        elif method == "setWebhook":
+            self.webhook = params
+            result = True
+        elif method == "getWebhookInfo":
+            result = {"url": self.webhook.get("url", ""), "has_custom_certificate": False,
+                      "pending_update_count": 0}
+        else:
+            # deleteWebhook, answerCallbackQuery, sendChatAction, deleteMessage и т.п.
+            result = True
+        return web.json_response({"ok": True, "result": result})
+    
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запуск сервера; возвращает базовый URL для TelegramAPIServer.from_base"""
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle_method)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]  # type: ignore[union-attr]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+    
+    async def stop(self):
+        """Остановка сервера"""
+        self._new_updates.set()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
@@ -3,14 +3,28 @@
 """
 import asyncio
 import logging
+import secrets
+from typing import Optional
+from aiohttp import web
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
 import config
+from database.catalog import catalog
 from database.db import db
-from handlers import start, help, info, history, search
+from database.fsm_storage import SQLiteStorage
+from database.maintenance import history_maintenance
+from services.ai_service import ai_service
+from services.telemetry import telemetry
+from handlers import start, help, info, history, search, admin
+from middlewares.metrics import MetricsMiddleware
+from middlewares.throttling import ThrottlingMiddleware
+from services.metrics import metrics_server
 
 
 # Настройка логирования
@@ -21,44 +35,146 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def on_startup():
+async def on_startup(dispatcher: Dispatcher, maintenance: bool = True,
+                     cluster_worker: Optional[int] = None):
     """Действия при запуске бота"""
     logger.info("Инициализация базы данных...")
+    if config.DB_PERSISTENT_CONNECTION:
+        await db.connect()
     await db.init_db()
+    if config.HISTORY_WRITE_BEHIND:
+        await db.start_write_behind()
+    # В кластере фоновое обслуживание БД выполняет только один процесс
+    if maintenance:
+        history_maintenance.start()
+    if isinstance(dispatcher.storage, SQLiteStorage):
+        await dispatcher.storage.start()
     logger.info("База данных инициализирована!")
+    if config.CATALOG_MODE != "off":
+        await catalog.connect()
+    if ai_service.similarity is not None:
+        await ai_service.similarity.warm_up(db)
+    await telemetry.start()
+    await ai_service.start()
+    # Обработчики кластера отдают метрики через unix-сокет, порт слушает приёмник
+    if config.METRICS_ENABLED and cluster_worker is None:
+        await metrics_server.start()
     logger.info("Бот запущен и готов к работе!")
 
 
-async def on_shutdown():
+async def on_shutdown(dispatcher: Dispatcher):
     """Действия при остановке бота"""
+    await metrics_server.stop()
+    await ai_service.close()
+    await telemetry.close()
+    await catalog.close()
+    await history_maintenance.stop()
+    await db.stop_write_behind()
+    await db.close()
     logger.info("Бот остановлен.")
 
 
-async def main():
-    """Главная функция запуска бота"""
-    bot = Bot(
+def create_bot() -> Bot:
+    """Создание экземпляра бота (при TELEGRAM_API_URL - через свой Bot API сервер)"""
+    session = None
+    if config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    return Bot(
         token=config.BOT_TOKEN,
+        session=session,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
+
+
+def create_dispatcher(maintenance: bool = True) -> Dispatcher:
+    """
+    Создание Dispatcher с хранилищем состояний и всеми обработчиками
+    
+    Args:
+        maintenance: Запускать ли фоновое обслуживание БД в этом процессе
+    """
+    storage = SQLiteStorage() if config.FSM_STORAGE == "sqlite" else MemoryStorage()
+    dp = Dispatcher(storage=storage, maintenance=maintenance)
     
-    dp = Dispatcher(storage=MemoryStorage())
+    if config.THROTTLE_ENABLED:
+        throttling = ThrottlingMiddleware()
+        dp.message.outer_middleware(throttling)
+        dp.callback_query.outer_middleware(throttling)
     
-    # Регистрация обработчиков
-    for router_module in [start, search, history, help, info]:
+    if config.METRICS_ENABLED:
+        # Inner-middleware: задержка записывается по выбранному обработчику
+        metrics_middleware = MetricsMiddleware()
+        dp.message.middleware(metrics_middleware)
+        dp.callback_query.middleware(metrics_middleware)
+    
+    # Регистрация обработчиков: роутеры команд - раньше поиска, иначе в состоянии
+    # ожидания запроса команда (/stats, /history...) ушла бы в нейросеть как текст запроса
+    for router_module in [start, admin, history, help, info, search]:
         dp.include_router(router_module.router)
     
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
-    
-    await bot.delete_webhook(drop_pending_updates=True)
+    return dp
+
+
+async def main():
+    """Главная функция запуска бота"""
+    bot = create_bot()
+    dp = create_dispatcher()
     
     try:
         logger.info("Запуск бота...")
-        await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
+        if config.RUN_MODE == "webhook":
+            await run_webhook(dp, bot)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
         await bot.session.close()
 
 
+def create_webhook_app(dp: Dispatcher, bot: Bot, secret_token: str) -> web.Application:
+    """
+    aiohttp-приложение, принимающее обновления от Telegram.
+    
+    Запросы без правильного секрета отклоняются с 401. Обновление
+    передаётся в Dispatcher фоновой задачей, а Telegram сразу получает
+    200, поэтому долгий поиск не задерживает доставку следующих обновлений.
+    """
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=secret_token,
+        handle_in_background=True,
+    ).register(app, path=config.WEBHOOK_PATH)
+    # Запуск и остановка приложения вызывают on_startup/on_shutdown бота
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot):
+    """Запуск встроенного веб-сервера и регистрация вебхука в Telegram"""
+    secret_token = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    runner = web.AppRunner(create_webhook_app(dp, bot, secret_token), access_log=None)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+        await site.start()
+        await bot.set_webhook(
+            url=f"{config.WEBHOOK_URL}{config.WEBHOOK_PATH}",
+            secret_token=secret_token,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+            drop_pending_updates=True,
+        )
+        logger.info(f"Вебхук слушает {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+        # Работаем до отмены задачи (Ctrl+C / SIGTERM)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
 if __name__ == "__main__":
     try:
         asyncio.run(main())
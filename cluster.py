@@ -0,0 +1,434 @@
+"""
+Многопроцессный запуск бота: приёмник обновлений и пул процессов-обработчиков
+
+Запуск:
+    python cluster.py
+
+Процесс-приёмник получает обновления (long polling или вебхук, как в
+RUN_MODE) и, не разбирая их моделями aiogram, пересылает в один из WORKERS
+процессов через unix-сокет. Процесс выбирается по хэшу user_id, поэтому
+все обновления пользователя обрабатывает один и тот же процесс: его
+состояние FSM и кэши истории не расходятся между процессами, а сами
+обновления пользователя обрабатываются строго по очереди.
+"""
+import asyncio
+import importlib
+import logging
+import multiprocessing
+import os
+import secrets
+import shutil
+import signal
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+import aiohttp
+from aiohttp import web
+from aiogram import Dispatcher
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+
+import config
+from services.metrics import CONTENT_TYPE, MetricsRegistry, MetricsServer, merge_expositions, metrics
+from utils.hashing import user_bucket
+
+logger = logging.getLogger(__name__)
+
+# Фабрика Dispatcher по умолчанию (модуль:функция)
+DEFAULT_FACTORY = "bot:create_dispatcher"
+
+
+def update_user_id(update: Dict[str, Any]) -> Optional[int]:
+    """ID пользователя (или чата), к которому относится обновление Telegram"""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        user = value.get("from") or value.get("user")
+        if user:
+            return user.get("id")
+        chat = value.get("chat")
+        if chat:
+            return chat.get("id")
+    return None
+
+
+class KeyedSerializer:
+    """
+    Последовательное выполнение корутин с одинаковым ключом.
+
+    Корутины разных ключей выполняются параллельно, с одинаковым -
+    в порядке добавления.
+    """
+
+    def __init__(self):
+        self._tails: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tails)
+
+    def submit(self, key: Hashable, coro: Awaitable) -> asyncio.Task:
+        """Постановка корутины в очередь ключа"""
+        task = asyncio.create_task(self._run(self._tails.get(key), coro))
+        self._tails[key] = task
+        task.add_done_callback(lambda t: self._forget(key, t))
+        return task
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._tails.get(key) is task:
+            del self._tails[key]
+
+    @staticmethod
+    async def _run(previous: Optional[asyncio.Task], coro: Awaitable) -> Any:
+        if previous is not None:
+            # Ошибка предыдущей задачи не должна останавливать очередь
+            await asyncio.wait([previous])
+        return await coro
+
+    async def drain(self):
+        """Ожидание завершения всех поставленных корутин"""
+        while self._tails:
+            await asyncio.wait(list(self._tails.values()))
+
+
+def load_factory(path: str) -> Callable[..., Dispatcher]:
+    """Импорт фабрики Dispatcher по строке вида "модуль:функция" """
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+# Процесс-обработчик
+
+async def _serve_worker(index: int, socket_path: str, factory_path: str, ready) -> None:
+    """Приём обновлений из unix-сокета и передача их в Dispatcher"""
+    from bot import create_bot
+
+    bot = create_bot()
+    dp = load_factory(factory_path)(maintenance=index == 0)
+    # Номер процесса в кластере (on_startup не запускает свой сервер метрик)
+    dp["cluster_worker"] = index
+    serializer = KeyedSerializer()
+
+    async def feed(update: Dict[str, Any]):
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception:
+            # Исключение уже записано в лог aiogram
+            pass
+
+    async def handle(request: web.Request) -> web.Response:
+        update = await request.json()
+        serializer.submit(update_user_id(update) or update.get("update_id"), feed(update))
+        return web.Response()
+
+    async def handle_metrics(request: web.Request) -> web.Response:
+        response = web.Response(body=metrics.render().encode("utf-8"))
+        response.headers["Content-Type"] = CONTENT_TYPE
+        return response
+
+    app = web.Application()
+    app.router.add_post("/update", handle)
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+    try:
+        await runner.setup()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        await web.UnixSite(runner, socket_path).start()
+        ready.set()
+        logger.info(f"Обработчик {index} (pid {os.getpid()}) слушает {socket_path}")
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        # Доделываем уже принятые обновления перед остановкой
+        await serializer.drain()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+        await bot.session.close()
+
+
+def _worker_main(index: int, socket_path: str, factory_path: str, ready) -> None:
+    """Точка входа процесса-обработчика"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s - worker-{index} - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(_serve_worker(index, socket_path, factory_path, ready))
+
+
+class WorkerPool:
+    """Процессы-обработчики и их перезапуск при аварийном завершении"""
+
+    def __init__(self, count: int = None, factory: str = DEFAULT_FACTORY, socket_dir: str = None):
+        """
+        Args:
+            count: Количество процессов (по умолчанию WORKERS или число ядер)
+            factory: Фабрика Dispatcher, вызываемая в каждом процессе
+            socket_dir: Каталог для unix-сокетов
+        """
+        self.count = count or config.WORKERS or os.cpu_count() or 1
+        self.factory = factory
+        self.socket_dir = socket_dir or config.CLUSTER_SOCKET_DIR
+        # Временный каталог создаётся пулом и удаляется при остановке
+        self._temp_dir = not self.socket_dir
+        if self._temp_dir:
+            self.socket_dir = tempfile.mkdtemp(prefix="gamebot-")
+        self.socket_paths = [os.path.join(self.socket_dir, f"worker-{i}.sock") for i in range(self.count)]
+        self._ctx = multiprocessing.get_context("spawn")
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * self.count
+        self._supervisor: Optional[asyncio.Task] = None
+        self.restarts = 0
+
+    async def _spawn(self, index: int):
+        ready = self._ctx.Event()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(index, self.socket_paths[index], self.factory, ready),
+            name=f"worker-{index}",
+        )
+        process.start()
+        self._processes[index] = process
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, ready.wait, 120):
+            raise RuntimeError(f"Обработчик {index} не запустился")
+
+    async def start(self):
+        """Запуск всех процессов и ожидание их готовности"""
+        os.makedirs(self.socket_dir, exist_ok=True)
+        await asyncio.gather(*(self._spawn(i) for i in range(self.count)))
+        self._supervisor = asyncio.create_task(self._supervise())
+        logger.info(f"Запущено обработчиков: {self.count}")
+
+    async def _supervise(self):
+        """Перезапуск упавших процессов"""
+        while True:
+            await asyncio.sleep(1)
+            for index, process in enumerate(self._processes):
+                if process is not None and not process.is_alive():
+                    logger.error(f"Обработчик {index} завершился с кодом {process.exitcode}, перезапуск")
+                    self.restarts += 1
+                    try:
+                        await self._spawn(index)
+                    except Exception as e:
+                        logger.error(f"Не удалось перезапустить обработчик {index}: {e}")
+
+    async def stop(self, timeout: float = 30):
+        """Мягкая остановка: SIGTERM, ожидание, затем SIGKILL"""
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+            self._supervisor = None
+
+        processes = [p for p in self._processes if p is not None]
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        loop = asyncio.get_running_loop()
+        for process in processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"Обработчик {process.name} не остановился, принудительное завершение")
+                process.kill()
+                await loop.run_in_executor(None, process.join)
+        self._processes = [None] * self.count
+        if self._temp_dir:
+            shutil.rmtree(self.socket_dir, ignore_errors=True)
+
+
+# Процесс-приёмник
+
+class ClusterFront:
+    """Пересылка обновлений Telegram в процессы-обработчики"""
+
+    def __init__(self, socket_paths: List[str]):
+        self.socket_paths = socket_paths
+        self._sessions: List[aiohttp.ClientSession] = []
+        self._serializer = KeyedSerializer()
+        self.forwarded = [0] * len(socket_paths)
+
+    async def start(self):
+        self._sessions = [
+            aiohttp.ClientSession(connector=aiohttp.UnixConnector(path=path))
+            for path in self.socket_paths
+        ]
+
+    async def close(self):
+        await self._serializer.drain()
+        for session in self._sessions:
+            await session.close()
+        self._sessions = []
+
+    def worker_for(self, update: Dict[str, Any]) -> int:
+        """Номер обработчика для обновления (по хэшу user_id)"""
+        key = update_user_id(update)
+        if key is None:
+            key = update.get("update_id", 0)
+        return user_bucket(key, len(self.socket_paths))
+
+    async def dispatch(self, update: Dict[str, Any]):
+        """
+        Передача обновления обработчику.
+
+        Пересылки одного пользователя выполняются по очереди, поэтому
+        обработчик получает его обновления в исходном порядке.
+        Исключение означает, что обновление не доставлено.
+        """
+        index = self.worker_for(update)
+        key = update_user_id(update)
+        if key is None:
+            await self._forward(index, update)
+        else:
+            await self._serializer.submit(key, self._forward(index, update))
+
+    async def _forward(self, index: int, update: Dict[str, Any]):
+        async with self._sessions[index].post("http://worker/update", json=update) as response:
+            response.raise_for_status()
+        self.forwarded[index] += 1
+
+    async def _worker_metrics(self, index: int) -> str:
+        timeout = aiohttp.ClientTimeout(total=5)
+        async with self._sessions[index].get("http://worker/metrics", timeout=timeout) as response:
+            response.raise_for_status()
+            return await response.text()
+
+    async def collect_metrics(self) -> str:
+        """Метрики всех обработчиков с меткой worker (недоступные пропускаются)"""
+        results = await asyncio.gather(
+            *(self._worker_metrics(i) for i in range(len(self._sessions))), return_exceptions=True
+        )
+        parts: Dict[str, str] = {}
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Не удалось получить метрики обработчика {index}: {result}")
+            else:
+                parts[str(index)] = result
+        return merge_expositions(parts, "worker")
+
+    async def poll(self, api: TelegramAPIServer, token: str, allowed_updates: List[str], timeout: int = 30):
+        """
+        Long polling getUpdates без разбора обновлений моделями aiogram.
+
+        offset сдвигается только после успешной пересылки, поэтому при
+        недоступности обработчика обновление будет получено повторно.
+        """
+        offset = 0
+        url = api.api_url(token, "getUpdates")
+        client_timeout = aiohttp.ClientTimeout(total=timeout + 10)
+        async with aiohttp.ClientSession(timeout=client_timeout) as session:
+            while True:
+                try:
+                    async with session.post(url, json={
+                        "offset": offset,
+                        "timeout": timeout,
+                        "allowed_updates": allowed_updates,
+                    }) as response:
+                        payload = await response.json()
+                    if not payload.get("ok"):
+                        raise RuntimeError(payload.get("description", "getUpdates failed"))
+                    for update in payload["result"]:
+                        await self.dispatch(update)
+                        offset = update["update_id"] + 1
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.error(f"Ошибка получения или пересылки обновлений: {e}")
+                    await asyncio.sleep(1)
+
+    def webhook_app(self, secret_token: str) -> web.Application:
+        """aiohttp-приложение вебхука: проверка секрета и пересылка обработчику"""
+        async def handle(request: web.Request) -> web.Response:
+            token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not secrets.compare_digest(token, secret_token):
+                return web.Response(status=401, text="Unauthorized")
+            try:
+                await self.dispatch(await request.json())
+            except Exception as e:
+                # Telegram повторит доставку обновления
+                logger.error(f"Не удалось переслать обновление: {e}")
+                return web.Response(status=503)
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(config.WEBHOOK_PATH, handle)
+        return app
+
+
+async def run_cluster(workers: int = None, factory: str = DEFAULT_FACTORY):
+    """Запуск пула обработчиков и приёма обновлений"""
+    from bot import create_bot
+
+    # Типы обновлений определяются по обработчикам так же, как в процессах
+    allowed_updates = load_factory(factory)(maintenance=False).resolve_used_update_types()
+    pool = WorkerPool(workers, factory)
+    if pool.count > 1:
+        # Очередь к нейросети, ограничение частоты и кэш в памяти - в каждом процессе свои
+        logger.warning(
+            f"Лимиты действуют на каждый из {pool.count} обработчиков: всего до "
+            f"{config.AI_MAX_CONCURRENCY * pool.count} одновременных запросов к нейросети, "
+            f"поиск до {config.THROTTLE_SEARCH_GLOBAL_RATE * pool.count:g}/с"
+        )
+    await pool.start()
+    front = ClusterFront(pool.socket_paths)
+    await front.start()
+    bot = create_bot()
+
+    front_metrics = MetricsRegistry()
+    front_metrics.callback(
+        "bot_cluster_forwarded_total", "Обновления, переданные обработчику",
+        lambda: {(str(i),): count for i, count in enumerate(front.forwarded)}, ("worker",), kind="counter"
+    )
+    front_metrics.callback("bot_cluster_worker_restarts_total", "Перезапуски упавших обработчиков",
+                           lambda: pool.restarts, kind="counter")
+
+    async def render_metrics() -> str:
+        return await front.collect_metrics() + front_metrics.render()
+
+    metrics_server = MetricsServer(render_metrics)
+    try:
+        if config.METRICS_ENABLED:
+            await metrics_server.start()
+        if config.RUN_MODE == "webhook":
+            secret_token = config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+            runner = web.AppRunner(front.webhook_app(secret_token), access_log=None)
+            await runner.setup()
+            try:
+                await web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT).start()
+                await bot.set_webhook(
+                    url=f"{config.WEBHOOK_URL}{config.WEBHOOK_PATH}",
+                    secret_token=secret_token,
+                    allowed_updates=allowed_updates,
+                    max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+                    drop_pending_updates=True,
+                )
+                logger.info(f"Вебхук кластера слушает {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}")
+                await asyncio.Event().wait()
+            finally:
+                await runner.cleanup()
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            api = TelegramAPIServer.from_base(config.TELEGRAM_API_URL) if config.TELEGRAM_API_URL else PRODUCTION
+            logger.info("Кластер получает обновления через long polling")
+            await front.poll(api, config.BOT_TOKEN, allowed_updates)
+    finally:
+        await metrics_server.stop()
+        await bot.session.close()
+        await front.close()
+        await pool.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - front - %(name)s - %(levelname)s - %(message)s'
+    )
+    try:
+        asyncio.run(run_cluster())
+    except KeyboardInterrupt:
+        logger.info("Кластер остановлен пользователем (Ctrl+C)")
@@ -2,7 +2,7 @@
 Конфигурационный модуль для загрузки переменных окружения
 """
 import os
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Загрузка переменных из .env файла
@@ -15,13 +15,201 @@ class Config:
     # Telegram Bot
     BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
     
+    # Свой сервер Bot API (например, локальный telegram-bot-api); пусто - api.telegram.org
+    TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "").rstrip("/")
+    
+    # Telegram ID администраторов через запятую (доступ к /stats)
+    ADMIN_IDS: List[int] = [
+        int(i) for i in os.getenv("ADMIN_IDS", "").replace(" ", "").split(",") if i
+    ]
+    
+    # Режим получения обновлений: "polling" или "webhook"
+    RUN_MODE: str = os.getenv("RUN_MODE", "polling").lower()
+    # Публичный HTTPS-адрес, на который Telegram отправляет обновления (без пути)
+    WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "").rstrip("/")
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    # Секрет заголовка X-Telegram-Bot-Api-Secret-Token (пусто - случайный при каждом запуске)
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+    # Адрес встроенного aiohttp-сервера (за reverse proxy с TLS)
+    WEBHOOK_HOST: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", "8080"))
+    # Сколько одновременных соединений Telegram открывает к вебхуку (1-100)
+    WEBHOOK_MAX_CONNECTIONS: int = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    
+    # Кластер (python cluster.py): число процессов-обработчиков (0 - по числу ядер)
+    # и каталог для их unix-сокетов (пусто - временный каталог).
+    # Каждый обработчик держит свои очередь к нейросети, корзины ограничения
+    # частоты и кэш в памяти: лимиты THROTTLE_*_GLOBAL_*, AI_MAX_CONCURRENCY и
+    # AI_QUEUE_MAX действуют на процесс (в сумме - в WORKERS раз больше), а кэш
+    # в памяти у каждого процесса свой (общий - только кэш в SQLite)
+    WORKERS: int = int(os.getenv("WORKERS", "0"))
+    CLUSTER_SOCKET_DIR: str = os.getenv("CLUSTER_SOCKET_DIR", "")
+    
     # OpenRouter API
     OPENROUTER_API_KEY: str = os.getenv("OPENROUTER_API_KEY", "")
     OPENROUTER_API_URL: str = "https://openrouter.ai/api/v1/chat/completions"
     OPENROUTER_MODEL: str = os.getenv("OPENROUTER_MODEL", "amazon/nova-2-lite-v1:free")
+    # Модели для хеджирования через запятую: первая - основная (по умолчанию OPENROUTER_MODEL)
+    OPENROUTER_MODELS: List[str] = [
+        m.strip() for m in os.getenv("OPENROUTER_MODELS", "").split(",") if m.strip()
+    ] or [OPENROUTER_MODEL]
+    # Хеджирование: если основная модель не ответила за квантиль AI_HEDGE_QUANTILE своих
+    # задержек (не меньше AI_HEDGE_MIN_DELAY сек), запрос дублируется следующей модели.
+    # Пока замеров меньше AI_HEDGE_MIN_SAMPLES, задержка - AI_HEDGE_INITIAL_DELAY сек
+    AI_HEDGING: bool = os.getenv("AI_HEDGING", "0").lower() in ("1", "true", "yes")
+    AI_HEDGE_QUANTILE: float = float(os.getenv("AI_HEDGE_QUANTILE", "0.9"))
+    AI_HEDGE_MIN_DELAY: float = float(os.getenv("AI_HEDGE_MIN_DELAY", "1"))
+    AI_HEDGE_INITIAL_DELAY: float = float(os.getenv("AI_HEDGE_INITIAL_DELAY", "8"))
+    AI_HEDGE_MIN_SAMPLES: int = int(os.getenv("AI_HEDGE_MIN_SAMPLES", "20"))
+    
+    # Потоковый режим ответов нейросети (игры показываются по мере генерации)
+    AI_STREAMING: bool = os.getenv("AI_STREAMING", "1").lower() in ("1", "true", "yes")
+    # Минимальный интервал между редактированиями сообщения с результатами (сек)
+    STREAM_EDIT_INTERVAL: float = float(os.getenv("STREAM_EDIT_INTERVAL", "1.5"))
+    
+    # Компактный формат ответа нейросети (позиционные массивы вместо объектов)
+    AI_COMPACT_OUTPUT: bool = os.getenv("AI_COMPACT_OUTPUT", "1").lower() in ("1", "true", "yes")
+    # Structured outputs (response_format с JSON Schema), если модель их поддерживает
+    AI_STRUCTURED_OUTPUT: bool = os.getenv("AI_STRUCTURED_OUTPUT", "0").lower() in ("1", "true", "yes")
+    # Лимит токенов ответа в компактном режиме
+    AI_MAX_TOKENS: int = int(os.getenv("AI_MAX_TOKENS", "1000"))
+    
+    # Ограничение частоты действий пользователей (token bucket): скорость (токенов/сек) и всплеск.
+    # Поисковые запросы (обращение к нейросети) - на пользователя и на весь процесс
+    # (в кластере GLOBAL-лимиты у каждого обработчика свои, см. WORKERS)
+    THROTTLE_ENABLED: bool = os.getenv("THROTTLE_ENABLED", "1").lower() in ("1", "true", "yes")
+    THROTTLE_SEARCH_USER_RATE: float = float(os.getenv("THROTTLE_SEARCH_USER_RATE", "0.1"))
+    THROTTLE_SEARCH_USER_BURST: float = float(os.getenv("THROTTLE_SEARCH_USER_BURST", "3"))
+    THROTTLE_SEARCH_GLOBAL_RATE: float = float(os.getenv("THROTTLE_SEARCH_GLOBAL_RATE", "5"))
+    THROTTLE_SEARCH_GLOBAL_BURST: float = float(os.getenv("THROTTLE_SEARCH_GLOBAL_BURST", "20"))
+    # Остальные сообщения и кнопки меню
+    THROTTLE_CHEAP_USER_RATE: float = float(os.getenv("THROTTLE_CHEAP_USER_RATE", "2"))
+    THROTTLE_CHEAP_USER_BURST: float = float(os.getenv("THROTTLE_CHEAP_USER_BURST", "5"))
+    THROTTLE_CHEAP_GLOBAL_RATE: float = float(os.getenv("THROTTLE_CHEAP_GLOBAL_RATE", "30"))
+    THROTTLE_CHEAP_GLOBAL_BURST: float = float(os.getenv("THROTTLE_CHEAP_GLOBAL_BURST", "60"))
+    # Максимум одновременно хранимых корзин пользователей
+    THROTTLE_MAX_USERS: int = int(os.getenv("THROTTLE_MAX_USERS", "100000"))
+    
+    # Очередь запросов к нейросети: одновременных запросов в процессе (у пользователя - один),
+    # максимум ожидающих в процессе и от одного пользователя, максимальное ожидание
+    # (сек, 0 - без ограничения). В кластере - на каждый обработчик, см. WORKERS
+    AI_MAX_CONCURRENCY: int = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+    AI_QUEUE_MAX: int = int(os.getenv("AI_QUEUE_MAX", "200"))
+    AI_QUEUE_PER_USER: int = int(os.getenv("AI_QUEUE_PER_USER", "1"))
+    AI_QUEUE_TIMEOUT: float = float(os.getenv("AI_QUEUE_TIMEOUT", "60"))
+    
+    # Повторы запросов к OpenRouter при сетевых ошибках, 408/429/5xx: число попыток,
+    # базовая и максимальная задержка (сек) и общий срок всех попыток (сек)
+    AI_RETRY_ATTEMPTS: int = int(os.getenv("AI_RETRY_ATTEMPTS", "3"))
+    AI_RETRY_BASE_DELAY: float = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))
+    AI_RETRY_MAX_DELAY: float = float(os.getenv("AI_RETRY_MAX_DELAY", "8"))
+    AI_RETRY_DEADLINE: float = float(os.getenv("AI_RETRY_DEADLINE", "30"))
+    # Выключатель: ошибок подряд до размыкания (0 - отключён) и пауза до пробного запроса (сек)
+    AI_BREAKER_THRESHOLD: int = int(os.getenv("AI_BREAKER_THRESHOLD", "5"))
+    AI_BREAKER_RECOVERY: float = float(os.getenv("AI_BREAKER_RECOVERY", "30"))
+    
+    # Телеметрия запросов к нейросети: окно квантилей (запросов на модель),
+    # запись в ai_usage пачкой по TELEMETRY_FLUSH_SIZE строк или раз в
+    # TELEMETRY_FLUSH_INTERVAL сек и срок хранения строк (дней, 0 - бессрочно).
+    # Пока запись не удаётся, в памяти держится не больше TELEMETRY_PENDING_MAX
+    # строк (0 - без ограничения), самые старые сверх предела теряются
+    TELEMETRY_ENABLED: bool = os.getenv("TELEMETRY_ENABLED", "1").lower() in ("1", "true", "yes")
+    TELEMETRY_WINDOW: int = int(os.getenv("TELEMETRY_WINDOW", "1000"))
+    TELEMETRY_FLUSH_SIZE: int = int(os.getenv("TELEMETRY_FLUSH_SIZE", "100"))
+    TELEMETRY_FLUSH_INTERVAL: float = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "10"))
+    TELEMETRY_RETENTION_DAYS: int = int(os.getenv("TELEMETRY_RETENTION_DAYS", "30"))
+    TELEMETRY_PENDING_MAX: int = int(os.getenv("TELEMETRY_PENDING_MAX", "10000"))
+    # Учёт стоимости OpenRouter (usage: {include: true}): стоимость запроса и токены
+    # в потоковом режиме; по документации OpenRouter добавляет задержку к концу ответа
+    AI_USAGE_ACCOUNTING: bool = os.getenv("AI_USAGE_ACCOUNTING", "0").lower() in ("1", "true", "yes")
+    
+    # Метрики в формате Prometheus (задержки обработчиков, нейросети и БД):
+    # адрес и путь встроенного HTTP-сервера для сбора (в кластере - у приёмника)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", "9100"))
+    METRICS_PATH: str = os.getenv("METRICS_PATH", "/metrics")
+    
+    # HTTP-клиент (пул соединений к OpenRouter)
+    # Общий лимит соединений и лимит на один хост
+    HTTP_POOL_LIMIT: int = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+    HTTP_POOL_LIMIT_PER_HOST: int = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))
+    # Время жизни простаивающего keep-alive соединения (сек)
+    HTTP_KEEPALIVE_TIMEOUT: float = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))
+    # Время кэширования DNS-ответов (сек)
+    HTTP_DNS_CACHE_TTL: int = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
     
     # Database
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "bot_database.db")
+    # Количество шардов истории (файлы <DATABASE_PATH>.shardN.db); 1 - один файл
+    DB_SHARDS: int = int(os.getenv("DB_SHARDS", "1"))
+    # Постоянное соединение с БД вместо открытия соединения на каждый запрос
+    DB_PERSISTENT_CONNECTION: bool = os.getenv("DB_PERSISTENT_CONNECTION", "1").lower() in ("1", "true", "yes")
+    # Размер кэша страниц SQLite (КБ), размер mmap (байт) и ожидание блокировки (мс)
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+    DB_BUSY_TIMEOUT_MS: int = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+    # Количество подготовленных выражений, кэшируемых соединением
+    DB_CACHED_STATEMENTS: int = int(os.getenv("DB_CACHED_STATEMENTS", "256"))
+    
+    # Отложенная (write-behind) запись истории запросов
+    HISTORY_WRITE_BEHIND: bool = os.getenv("HISTORY_WRITE_BEHIND", "1").lower() in ("1", "true", "yes")
+    # Запись пачки при накоплении стольких строк...
+    HISTORY_FLUSH_SIZE: int = int(os.getenv("HISTORY_FLUSH_SIZE", "100"))
+    # ...или по истечении этого интервала (сек)
+    HISTORY_FLUSH_INTERVAL: float = float(os.getenv("HISTORY_FLUSH_INTERVAL", "2"))
+    # Предел очереди в памяти, если запись в БД не удаётся (0 - без ограничения):
+    # при переполнении теряются самые старые строки
+    HISTORY_PENDING_MAX: int = int(os.getenv("HISTORY_PENDING_MAX", "10000"))
+    # Количество запросов на одной странице истории
+    HISTORY_PAGE_SIZE: int = int(os.getenv("HISTORY_PAGE_SIZE", "15"))
+    # Кэш чтения истории: количество пользователей и время жизни записи (сек)
+    HISTORY_CACHE_SIZE: int = int(os.getenv("HISTORY_CACHE_SIZE", "10000"))
+    HISTORY_CACHE_TTL: float = float(os.getenv("HISTORY_CACHE_TTL", "600"))
+    
+    # Ограничение истории: строк на пользователя и возраст в днях (0 - без ограничения)
+    HISTORY_MAX_ROWS_PER_USER: int = int(os.getenv("HISTORY_MAX_ROWS_PER_USER", "1000"))
+    HISTORY_MAX_AGE_DAYS: int = int(os.getenv("HISTORY_MAX_AGE_DAYS", "365"))
+    # Фоновое обслуживание БД: период (сек, 0 - отключено), размер пачки удаления,
+    # пауза между пачками (сек) и страниц за один incremental_vacuum (0 - все)
+    MAINTENANCE_INTERVAL: float = float(os.getenv("MAINTENANCE_INTERVAL", "3600"))
+    MAINTENANCE_BATCH_SIZE: int = int(os.getenv("MAINTENANCE_BATCH_SIZE", "500"))
+    MAINTENANCE_BATCH_PAUSE: float = float(os.getenv("MAINTENANCE_BATCH_PAUSE", "0.05"))
+    MAINTENANCE_VACUUM_PAGES: int = int(os.getenv("MAINTENANCE_VACUUM_PAGES", "0"))
+    
+    # Хранилище состояний FSM: "sqlite" (переживает перезапуск) или "memory"
+    FSM_STORAGE: str = os.getenv("FSM_STORAGE", "sqlite").lower()
+    FSM_STORAGE_PATH: str = os.getenv("FSM_STORAGE_PATH", "fsm_storage.db")
+    # Горячий кэш состояний в памяти (записей) и время жизни неактивного состояния (сек, 0 - бессрочно)
+    FSM_CACHE_SIZE: int = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+    FSM_STATE_TTL: float = float(os.getenv("FSM_STATE_TTL", "86400"))
+    # Запись изменений пачкой по FSM_FLUSH_SIZE ключей или раз в FSM_FLUSH_INTERVAL секунд
+    FSM_FLUSH_SIZE: int = int(os.getenv("FSM_FLUSH_SIZE", "100"))
+    FSM_FLUSH_INTERVAL: float = float(os.getenv("FSM_FLUSH_INTERVAL", "1"))
+    
+    # Локальный каталог игр (python -m database.import_catalog): off - не используется,
+    # enrich - проверка и дополнение ответов нейросети, answer - ещё и ответ из каталога
+    # без нейросети, если по запросу нашлось не меньше CATALOG_MIN_RESULTS игр
+    CATALOG_MODE: str = os.getenv("CATALOG_MODE", "off").lower()
+    CATALOG_PATH: str = os.getenv("CATALOG_PATH", "games_catalog.db")
+    CATALOG_MIN_RESULTS: int = int(os.getenv("CATALOG_MIN_RESULTS", "3"))
+    # Сколько игр показывать в ответе из каталога
+    CATALOG_RESULTS: int = int(os.getenv("CATALOG_RESULTS", "5"))
+    
+    # Повторное использование ответов на похожие (перефразированные) запросы:
+    # порог косинусной близости, размерность векторов и максимум запросов в индексе
+    # (память: SIMILARITY_MAX_ENTRIES * SIMILARITY_DIM * 4 байта). Нужен numpy.
+    # Записи живут CACHE_TTL_SECONDS; при выключенном кэше индекс тоже выключен
+    SIMILARITY_ENABLED: bool = os.getenv("SIMILARITY_ENABLED", "0").lower() in ("1", "true", "yes")
+    SIMILARITY_THRESHOLD: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.8"))
+    SIMILARITY_DIM: int = int(os.getenv("SIMILARITY_DIM", "512"))
+    SIMILARITY_MAX_ENTRIES: int = int(os.getenv("SIMILARITY_MAX_ENTRIES", "20000"))
+    
+    # Кэш рекомендаций (память + SQLite)
+    # Время жизни записи в секундах (0 - кэш отключён)
+    CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", "21600"))
+    # Максимальное количество записей в памяти процесса (в кластере - у каждого обработчика)
+    CACHE_MAX_SIZE: int = int(os.getenv("CACHE_MAX_SIZE", "1000"))
     
     # Timezone
     # Используется сдвиг относительно UTC (в часах) для отображения времени
@@ -39,6 +227,9 @@ class Config:
             "OPENROUTER_API_KEY": cls.OPENROUTER_API_KEY,
         }
         
+        if cls.RUN_MODE == "webhook":
+            required_vars["WEBHOOK_URL"] = cls.WEBHOOK_URL
+        
         missing = [name for name, value in required_vars.items() if not value]
         if missing:
             raise ValueError(
@@ -54,19 +245,203 @@ Config.validate()
 __all__ = [
     'Config',
     'BOT_TOKEN',
+    'TELEGRAM_API_URL',
+    'ADMIN_IDS',
+    'RUN_MODE',
+    'WEBHOOK_URL',
+    'WEBHOOK_PATH',
+    'WEBHOOK_SECRET',
+    'WEBHOOK_HOST',
+    'WEBHOOK_PORT',
+    'WEBHOOK_MAX_CONNECTIONS',
+    'WORKERS',
+    'CLUSTER_SOCKET_DIR',
     'OPENROUTER_API_KEY',
     'OPENROUTER_API_URL',
     'OPENROUTER_MODEL',
+    'OPENROUTER_MODELS',
+    'AI_HEDGING',
+    'AI_HEDGE_QUANTILE',
+    'AI_HEDGE_MIN_DELAY',
+    'AI_HEDGE_INITIAL_DELAY',
+    'AI_HEDGE_MIN_SAMPLES',
+    'AI_STREAMING',
+    'STREAM_EDIT_INTERVAL',
+    'AI_COMPACT_OUTPUT',
+    'AI_STRUCTURED_OUTPUT',
+    'AI_MAX_TOKENS',
+    'THROTTLE_ENABLED',
+    'THROTTLE_SEARCH_USER_RATE',
+    'THROTTLE_SEARCH_USER_BURST',
+    'THROTTLE_SEARCH_GLOBAL_RATE',
+    'THROTTLE_SEARCH_GLOBAL_BURST',
+    'THROTTLE_CHEAP_USER_RATE',
+    'THROTTLE_CHEAP_USER_BURST',
+    'THROTTLE_CHEAP_GLOBAL_RATE',
+    'THROTTLE_CHEAP_GLOBAL_BURST',
+    'THROTTLE_MAX_USERS',
+    'AI_MAX_CONCURRENCY',
+    'AI_QUEUE_MAX',
+    'AI_QUEUE_PER_USER',
+    'AI_QUEUE_TIMEOUT',
+    'AI_RETRY_ATTEMPTS',
+    'AI_RETRY_BASE_DELAY',
+    'AI_RETRY_MAX_DELAY',
+    'AI_RETRY_DEADLINE',
+    'AI_BREAKER_THRESHOLD',
+    'AI_BREAKER_RECOVERY',
+    'TELEMETRY_ENABLED',
+    'TELEMETRY_WINDOW',
+    'TELEMETRY_FLUSH_SIZE',
+    'TELEMETRY_FLUSH_INTERVAL',
+    'TELEMETRY_RETENTION_DAYS',
+    'TELEMETRY_PENDING_MAX',
+    'AI_USAGE_ACCOUNTING',
+    'METRICS_ENABLED',
+    'METRICS_HOST',
+    'METRICS_PORT',
+    'METRICS_PATH',
+    'HTTP_POOL_LIMIT',
+    'HTTP_POOL_LIMIT_PER_HOST',
+    'HTTP_KEEPALIVE_TIMEOUT',
+    'HTTP_DNS_CACHE_TTL',
     'DATABASE_PATH',
+    'DB_SHARDS',
+    'DB_PERSISTENT_CONNECTION',
+    'DB_CACHE_SIZE_KB',
+    'DB_MMAP_SIZE',
+    'DB_BUSY_TIMEOUT_MS',
+    'DB_CACHED_STATEMENTS',
+    'HISTORY_WRITE_BEHIND',
+    'HISTORY_FLUSH_SIZE',
+    'HISTORY_FLUSH_INTERVAL',
+    'HISTORY_PENDING_MAX',
+    'HISTORY_PAGE_SIZE',
+    'HISTORY_CACHE_SIZE',
+    'HISTORY_CACHE_TTL',
+    'HISTORY_MAX_ROWS_PER_USER',
+    'HISTORY_MAX_AGE_DAYS',
+    'MAINTENANCE_INTERVAL',
+    'MAINTENANCE_BATCH_SIZE',
+    'MAINTENANCE_BATCH_PAUSE',
+    'MAINTENANCE_VACUUM_PAGES',
+    'FSM_STORAGE',
+    'FSM_STORAGE_PATH',
+    'FSM_CACHE_SIZE',
+    'FSM_STATE_TTL',
+    'FSM_FLUSH_SIZE',
+    'FSM_FLUSH_INTERVAL',
+    'CATALOG_MODE',
+    'CATALOG_PATH',
+    'CATALOG_MIN_RESULTS',
+    'CATALOG_RESULTS',
+    'SIMILARITY_ENABLED',
+    'SIMILARITY_THRESHOLD',
+    'SIMILARITY_DIM',
+    'SIMILARITY_MAX_ENTRIES',
+    'CACHE_TTL_SECONDS',
+    'CACHE_MAX_SIZE',
     'TIMEZONE_OFFSET_HOURS',
     'TIMEZONE_NAME',
 ]
 
 # Для совместимости - экспортируем как модульные переменные
 BOT_TOKEN = Config.BOT_TOKEN
+TELEGRAM_API_URL = Config.TELEGRAM_API_URL
+ADMIN_IDS = Config.ADMIN_IDS
+RUN_MODE = Config.RUN_MODE
+WEBHOOK_URL = Config.WEBHOOK_URL
+WEBHOOK_PATH = Config.WEBHOOK_PATH
+WEBHOOK_SECRET = Config.WEBHOOK_SECRET
+WEBHOOK_HOST = Config.WEBHOOK_HOST
+WEBHOOK_PORT = Config.WEBHOOK_PORT
+WEBHOOK_MAX_CONNECTIONS = Config.WEBHOOK_MAX_CONNECTIONS
+WORKERS = Config.WORKERS
+CLUSTER_SOCKET_DIR = Config.CLUSTER_SOCKET_DIR
 OPENROUTER_API_KEY = Config.OPENROUTER_API_KEY
 OPENROUTER_API_URL = Config.OPENROUTER_API_URL
 OPENROUTER_MODEL = Config.OPENROUTER_MODEL
+OPENROUTER_MODELS = Config.OPENROUTER_MODELS
+AI_HEDGING = Config.AI_HEDGING
+AI_HEDGE_QUANTILE = Config.AI_HEDGE_QUANTILE
+AI_HEDGE_MIN_DELAY = Config.AI_HEDGE_MIN_DELAY
+AI_HEDGE_INITIAL_DELAY = Config.AI_HEDGE_INITIAL_DELAY
+AI_HEDGE_MIN_SAMPLES = Config.AI_HEDGE_MIN_SAMPLES
+AI_STREAMING = Config.AI_STREAMING
+STREAM_EDIT_INTERVAL = Config.STREAM_EDIT_INTERVAL
+AI_COMPACT_OUTPUT = Config.AI_COMPACT_OUTPUT
+AI_STRUCTURED_OUTPUT = Config.AI_STRUCTURED_OUTPUT
+AI_MAX_TOKENS = Config.AI_MAX_TOKENS
+THROTTLE_ENABLED = Config.THROTTLE_ENABLED
+THROTTLE_SEARCH_USER_RATE = Config.THROTTLE_SEARCH_USER_RATE
+THROTTLE_SEARCH_USER_BURST = Config.THROTTLE_SEARCH_USER_BURST
+THROTTLE_SEARCH_GLOBAL_RATE = Config.THROTTLE_SEARCH_GLOBAL_RATE
+THROTTLE_SEARCH_GLOBAL_BURST = Config.THROTTLE_SEARCH_GLOBAL_BURST
+THROTTLE_CHEAP_USER_RATE = Config.THROTTLE_CHEAP_USER_RATE
+THROTTLE_CHEAP_USER_BURST = Config.THROTTLE_CHEAP_USER_BURST
+THROTTLE_CHEAP_GLOBAL_RATE = Config.THROTTLE_CHEAP_GLOBAL_RATE
+THROTTLE_CHEAP_GLOBAL_BURST = Config.THROTTLE_CHEAP_GLOBAL_BURST
+THROTTLE_MAX_USERS = Config.THROTTLE_MAX_USERS
+AI_MAX_CONCURRENCY = Config.AI_MAX_CONCURRENCY
+AI_QUEUE_MAX = Config.AI_QUEUE_MAX
+AI_QUEUE_PER_USER = Config.AI_QUEUE_PER_USER
+AI_QUEUE_TIMEOUT = Config.AI_QUEUE_TIMEOUT
+AI_RETRY_ATTEMPTS = Config.AI_RETRY_ATTEMPTS
+AI_RETRY_BASE_DELAY = Config.AI_RETRY_BASE_DELAY
+AI_RETRY_MAX_DELAY = Config.AI_RETRY_MAX_DELAY
+AI_RETRY_DEADLINE = Config.AI_RETRY_DEADLINE
+AI_BREAKER_THRESHOLD = Config.AI_BREAKER_THRESHOLD
+AI_BREAKER_RECOVERY = Config.AI_BREAKER_RECOVERY
+TELEMETRY_ENABLED = Config.TELEMETRY_ENABLED
+TELEMETRY_WINDOW = Config.TELEMETRY_WINDOW
+TELEMETRY_FLUSH_SIZE = Config.TELEMETRY_FLUSH_SIZE
+TELEMETRY_FLUSH_INTERVAL = Config.TELEMETRY_FLUSH_INTERVAL
+TELEMETRY_RETENTION_DAYS = Config.TELEMETRY_RETENTION_DAYS
+TELEMETRY_PENDING_MAX = Config.TELEMETRY_PENDING_MAX
+AI_USAGE_ACCOUNTING = Config.AI_USAGE_ACCOUNTING
+METRICS_ENABLED = Config.METRICS_ENABLED
+METRICS_HOST = Config.METRICS_HOST
+METRICS_PORT = Config.METRICS_PORT
+METRICS_PATH = Config.METRICS_PATH
+HTTP_POOL_LIMIT = Config.HTTP_POOL_LIMIT
+HTTP_POOL_LIMIT_PER_HOST = Config.HTTP_POOL_LIMIT_PER_HOST
+HTTP_KEEPALIVE_TIMEOUT = Config.HTTP_KEEPALIVE_TIMEOUT
+HTTP_DNS_CACHE_TTL = Config.HTTP_DNS_CACHE_TTL
 DATABASE_PATH = Config.DATABASE_PATH
+DB_SHARDS = Config.DB_SHARDS
+DB_PERSISTENT_CONNECTION = Config.DB_PERSISTENT_CONNECTION
+DB_CACHE_SIZE_KB = Config.DB_CACHE_SIZE_KB
+DB_MMAP_SIZE = Config.DB_MMAP_SIZE
+DB_BUSY_TIMEOUT_MS = Config.DB_BUSY_TIMEOUT_MS
+DB_CACHED_STATEMENTS = Config.DB_CACHED_STATEMENTS
+HISTORY_WRITE_BEHIND = Config.HISTORY_WRITE_BEHIND
+HISTORY_FLUSH_SIZE = Config.HISTORY_FLUSH_SIZE
+HISTORY_FLUSH_INTERVAL = Config.HISTORY_FLUSH_INTERVAL
+HISTORY_PENDING_MAX = Config.HISTORY_PENDING_MAX
+HISTORY_PAGE_SIZE = Config.HISTORY_PAGE_SIZE
+HISTORY_CACHE_SIZE = Config.HISTORY_CACHE_SIZE
+HISTORY_CACHE_TTL = Config.HISTORY_CACHE_TTL
+HISTORY_MAX_ROWS_PER_USER = Config.HISTORY_MAX_ROWS_PER_USER
+HISTORY_MAX_AGE_DAYS = Config.HISTORY_MAX_AGE_DAYS
+MAINTENANCE_INTERVAL = Config.MAINTENANCE_INTERVAL
+MAINTENANCE_BATCH_SIZE = Config.MAINTENANCE_BATCH_SIZE
+MAINTENANCE_BATCH_PAUSE = Config.MAINTENANCE_BATCH_PAUSE
+MAINTENANCE_VACUUM_PAGES = Config.MAINTENANCE_VACUUM_PAGES
+FSM_STORAGE = Config.FSM_STORAGE
+FSM_STORAGE_PATH = Config.FSM_STORAGE_PATH
+FSM_CACHE_SIZE = Config.FSM_CACHE_SIZE
+FSM_STATE_TTL = Config.FSM_STATE_TTL
+FSM_FLUSH_SIZE = Config.FSM_FLUSH_SIZE
+FSM_FLUSH_INTERVAL = Config.FSM_FLUSH_INTERVAL
+CATALOG_MODE = Config.CATALOG_MODE
+CATALOG_PATH = Config.CATALOG_PATH
+CATALOG_MIN_RESULTS = Config.CATALOG_MIN_RESULTS
+CATALOG_RESULTS = Config.CATALOG_RESULTS
+SIMILARITY_ENABLED = Config.SIMILARITY_ENABLED
+SIMILARITY_THRESHOLD = Config.SIMILARITY_THRESHOLD
+SIMILARITY_DIM = Config.SIMILARITY_DIM
+SIMILARITY_MAX_ENTRIES = Config.SIMILARITY_MAX_ENTRIES
+CACHE_TTL_SECONDS = Config.CACHE_TTL_SECONDS
+CACHE_MAX_SIZE = Config.CACHE_MAX_SIZE
 TIMEZONE_OFFSET_HOURS = Config.TIMEZONE_OFFSET_HOURS
 TIMEZONE_NAME = Config.TIMEZONE_NAME
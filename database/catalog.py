@@ -0,0 +1,344 @@
+"""
+Локальный каталог игр: SQLite + полнотекстовый индекс FTS5 с ранжированием BM25
+"""
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiosqlite
+
+import config
+from database.models import GameInfo
+from utils.text import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Схема каталога. games_fts - FTS5 с внешним содержимым (content=games):
+# текст хранится один раз, индекс перестраивается импортёром целиком
+CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    genres TEXT,
+    platforms TEXT,
+    released TEXT,
+    rating REAL,
+    description TEXT,
+    background_image TEXT,
+    popularity INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_games_name_key ON games(name_key);
+CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5(
+    name, genres, platforms, description,
+    content='games', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Веса столбцов для bm25(): совпадение в названии важнее, чем в описании
+BM25_WEIGHTS = (10.0, 4.0, 1.0, 2.0)
+
+# Слова запроса, не несущие смысла для поиска по каталогу
+STOP_WORDS = frozenset("""
+а без бы в во все всё где да для до же за и из или к как какая какую какие
+ко ли мне мой на над не нибудь ни но о об от по под посоветуй посоветуйте подбери
+порекомендуй найди похож похожая похожую похожие похожее про с со так такая такую
+то там тип типа у хочу хотел хотелось чем что чтобы эта эту это я игра игру игры
+игр игрой играть поиграть ищу нужна нужно нужен можно
+a an and for game games i in like me of on or some the to want with
+""".split())
+
+# Русские основы жанров и платформ -> английские термины каталога (RAWG).
+# Ключ сравнивается с началом слова, поэтому покрывает падежные формы
+SYNONYMS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("стратег", ("strategy",)),
+    ("шутер", ("shooter",)),
+    ("fps", ("shooter",)),
+    ("стрелял", ("shooter",)),
+    ("гонк", ("racing",)),
+    ("гоноч", ("racing",)),
+    ("симулят", ("simulation", "simulator")),
+    ("выжив", ("survival",)),
+    ("ужас", ("horror",)),
+    ("хоррор", ("horror",)),
+    ("приключ", ("adventure",)),
+    ("головолом", ("puzzle",)),
+    ("пазл", ("puzzle",)),
+    ("головоломк", ("puzzle",)),
+    ("платформер", ("platformer",)),
+    ("файтинг", ("fighting",)),
+    ("спорт", ("sports",)),
+    ("футбол", ("football", "soccer")),
+    ("экшен", ("action",)),
+    ("экшн", ("action",)),
+    ("ролев", ("rpg",)),
+    ("rpg", ("rpg",)),
+    ("рпг", ("rpg",)),
+    ("инди", ("indie",)),
+    ("аркад", ("arcade",)),
+    ("казуал", ("casual",)),
+    ("карточ", ("card",)),
+    ("настольн", ("board games",)),
+    ("семейн", ("family",)),
+    ("мультиплеер", ("multiplayer",)),
+    ("кооператив", ("co-op", "cooperative")),
+    ("открыт", ("open world",)),
+    ("космос", ("space",)),
+    ("космич", ("space",)),
+    ("зомби", ("zombie", "zombies")),
+    ("дракон", ("dragon", "dragons")),
+    ("самура", ("samurai",)),
+    ("ниндзя", ("ninja",)),
+    ("пират", ("pirate", "pirates")),
+    ("средневек", ("medieval",)),
+    ("фэнтез", ("fantasy",)),
+    ("фантаст", ("sci-fi", "science fiction")),
+    ("киберпанк", ("cyberpunk",)),
+    ("стелс", ("stealth",)),
+    ("песочниц", ("sandbox",)),
+    ("пошагов", ("turn-based",)),
+    ("аниме", ("anime",)),
+    ("детектив", ("detective",)),
+    ("войн", ("war",)),
+    ("военн", ("war", "military")),
+    ("мир", ("world",)),
+    ("компьютер", ("pc",)),
+    ("пк", ("pc",)),
+    ("плейстейшн", ("playstation",)),
+    ("иксбокс", ("xbox",)),
+    ("свитч", ("nintendo switch",)),
+    ("нинтендо", ("nintendo",)),
+    ("мобил", ("ios", "android")),
+    ("телефон", ("ios", "android")),
+)
+
+_FTS_SAFE_RE = re.compile(r'"')
+
+# Описания в дампах RAWG бывают на несколько экранов - в ответ идёт начало
+DESCRIPTION_LIMIT = 300
+
+
+def name_key(name: str) -> str:
+    """Ключ для поиска игры по точному названию (регистр и пунктуация не важны)"""
+    return normalize_query(name)
+
+
+def _quote(term: str) -> str:
+    """Термин как строка FTS5 (фраза, если в нём несколько слов)"""
+    return '"' + _FTS_SAFE_RE.sub("", term) + '"'
+
+
+def stem(word: str) -> str:
+    """Грубое отсечение окончания: «открытым» -> «открыт» (для префиксного поиска)"""
+    if len(word) > 5 and re.search(r"[а-я]", word):
+        return word[:-2]
+    return word
+
+
+def synonyms_for(word: str) -> List[str]:
+    """Английские термины каталога для слова запроса (по началу слова)"""
+    return [synonym for stem, synonyms in SYNONYMS if word.startswith(stem) for synonym in synonyms]
+
+
+def build_match_query(query: str, require_all: bool = True) -> Optional[str]:
+    """
+    Выражение FTS5 MATCH для запроса пользователя
+
+    Каждое значимое слово превращается в группу «префикс слова OR английские
+    синонимы», группы объединяются через AND (require_all) или OR.
+
+    Returns:
+        Строка для MATCH или None, если в запросе нет значимых слов
+    """
+    groups: List[str] = []
+    seen = set()
+    for word in normalize_query(query).split():
+        if word in STOP_WORDS or len(word) < 2 or word in seen:
+            continue
+        seen.add(word)
+        terms = [f"{_quote(stem(word))}*"]
+        terms.extend(_quote(synonym) for synonym in synonyms_for(word) if synonym != word)
+        groups.append(terms[0] if len(terms) == 1 else "(" + " OR ".join(terms) + ")")
+    if not groups:
+        return None
+    return (" AND " if require_all else " OR ").join(groups)
+
+
+def _short(text: Optional[str], limit: int = DESCRIPTION_LIMIT) -> Optional[str]:
+    """Обрезка длинного описания из дампа по границе предложения или слова"""
+    if not text or len(text) <= limit:
+        return text
+    cut = text[:limit]
+    end = cut.rfind(". ")
+    if end > limit // 2:
+        return cut[:end + 1]
+    return cut.rsplit(" ", 1)[0] + "…"
+
+
+def _game_from_row(row: Iterable) -> GameInfo:
+    name, genres, platforms, released, rating, description, background_image = row
+    return GameInfo(
+        name=name,
+        rating=rating,
+        released=released[:4] if released else released,
+        platforms=platforms,
+        genres=genres,
+        description=_short(description),
+        background_image=background_image,
+    )
+
+
+def enrich_game(game: GameInfo, known: GameInfo) -> GameInfo:
+    """
+    Проверка ответа нейросети по каталогу.
+
+    Название, год, рейтинг, платформы и картинка берутся из каталога (в них
+    нейросеть чаще всего ошибается); жанры и описание на русском остаются
+    от нейросети и дополняются из каталога, только если их нет.
+    """
+    return GameInfo(
+        name=known.name,
+        rating=known.rating or game.rating,
+        released=known.released or game.released,
+        platforms=known.platforms or game.platforms,
+        genres=game.genres or known.genres,
+        description=game.description or known.description,
+        background_image=known.background_image or game.background_image,
+    )
+
+
+class GameCatalog:
+    """
+    Каталог игр для ответов без нейросети и проверки её ответов.
+
+    Хранится в отдельном файле CATALOG_PATH, который целиком собирает
+    импортёр (python -m database.import_catalog); бот открывает его
+    одним долгоживущим соединением и только читает.
+    """
+
+    _COLUMNS = "g.name, g.genres, g.platforms, g.released, g.rating, g.description, g.background_image"
+
+    def __init__(self, db_path: str = None):
+        """Инициализация каталога"""
+        self.db_path = db_path or config.CATALOG_PATH
+        self._conn: Optional[aiosqlite.Connection] = None
+        self.size = 0
+
+    @property
+    def available(self) -> bool:
+        return self._conn is not None
+
+    async def connect(self) -> bool:
+        """
+        Открытие каталога
+
+        Returns:
+            False, если файла каталога нет или он пуст
+        """
+        if self._conn is not None:
+            return True
+        if not os.path.exists(self.db_path):
+            logger.warning(f"Каталог игр не найден: {self.db_path}")
+            return False
+        conn = await aiosqlite.connect(self.db_path, cached_statements=config.DB_CACHED_STATEMENTS)
+        try:
+            await conn.execute("PRAGMA query_only = ON")
+            await conn.execute(f"PRAGMA cache_size = -{int(config.DB_CACHE_SIZE_KB)}")
+            await conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+            async with conn.execute("SELECT COUNT(*) FROM games") as cursor:
+                self.size = (await cursor.fetchone())[0]
+        except Exception as e:
+            await conn.close()
+            logger.error(f"Ошибка открытия каталога игр {self.db_path}: {e}")
+            return False
+        if not self.size:
+            await conn.close()
+            logger.warning(f"Каталог игр пуст: {self.db_path}")
+            return False
+        self._conn = conn
+        logger.info(f"Каталог игр открыт: {self.size} игр")
+        return True
+
+    async def close(self):
+        """Закрытие соединения с каталогом"""
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        await conn.close()
+
+    async def search(self, query: str, limit: int = 5,
+                     require_all: bool = True) -> List[Tuple[GameInfo, float]]:
+        """
+        Поиск игр по описанию с ранжированием BM25
+
+        Args:
+            query: Запрос пользователя
+            limit: Максимум результатов
+            require_all: Все значимые слова запроса должны совпасть
+
+        Returns:
+            Пары (игра, оценка bm25); меньшая оценка - лучшее совпадение
+        """
+        match = build_match_query(query, require_all=require_all)
+        if match is None or self._conn is None:
+            return []
+        weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+        try:
+            async with self._conn.execute(
+                f"""SELECT {self._COLUMNS}, bm25(games_fts, {weights}) AS score
+                    FROM games_fts JOIN games g ON g.id = games_fts.rowid
+                    WHERE games_fts MATCH ?
+                    ORDER BY score, g.popularity DESC
+                    LIMIT ?""",
+                (match, limit)
+            ) as cursor:
+                rows = await cursor.fetchall()
+        except aiosqlite.OperationalError as e:
+            logger.error(f"Ошибка поиска в каталоге по '{match}': {e}")
+            return []
+        return [(_game_from_row(row[:-1]), row[-1]) for row in rows]
+
+    async def lookup(self, names: List[str]) -> Dict[str, GameInfo]:
+        """
+        Поиск игр по точному названию
+
+        Returns:
+            name_key -> игра (при совпадении названий - самая популярная)
+        """
+        keys = list({name_key(name) for name in names if name})
+        if not keys or self._conn is None:
+            return {}
+        placeholders = ", ".join("?" * len(keys))
+        async with self._conn.execute(
+            f"""SELECT g.name_key, {self._COLUMNS}
+                FROM games g WHERE g.name_key IN ({placeholders})
+                ORDER BY g.popularity""",
+            keys
+        ) as cursor:
+            rows = await cursor.fetchall()
+        # Сортировка по возрастанию популярности: самая популярная запишется последней
+        return {row[0]: _game_from_row(row[1:]) for row in rows}
+
+    async def lookup_one(self, name: str) -> Optional[GameInfo]:
+        """
+        Поиск одной игры по точному названию (самой популярной)
+
+        Текст запроса не зависит от числа названий, поэтому подготовленное
+        выражение берётся из кэша соединения.
+        """
+        if not name or self._conn is None:
+            return None
+        async with self._conn.execute(
+            f"""SELECT {self._COLUMNS}
+                FROM games g WHERE g.name_key = ?
+                ORDER BY g.popularity DESC LIMIT 1""",
+            (name_key(name),)
+        ) as cursor:
+            row = await cursor.fetchone()
+        return None if row is None else _game_from_row(row)
+
+
+# Глобальный экземпляр каталога
+catalog = GameCatalog()
@@ -1,11 +1,22 @@
 """
 Инициализация и управление базой данных SQLite
 """
+import asyncio
+import os
 import sqlite3
+import time
+import logging
 import aiosqlite
-from typing import List, Tuple
-from datetime import datetime
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 import config
+from database.migrations import migrate
+from database.models import HistoryPage
+from services.metrics import db_query_errors, db_query_seconds, history_dropped, timed
+from utils.hashing import user_bucket
+from utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
 
 
 class Database:
@@ -14,65 +25,704 @@ class Database:
     def __init__(self, db_path: str = None):
         """Инициализация базы данных"""
         self.db_path = db_path or config.DATABASE_PATH
+        self._conn: Optional[aiosqlite.Connection] = None
+        # Отложенная запись истории: строки (user_id, query_text, created_at)
+        self.write_behind = False
+        self.flush_size = config.HISTORY_FLUSH_SIZE
+        self.flush_interval = config.HISTORY_FLUSH_INTERVAL
+        self.pending_max = config.HISTORY_PENDING_MAX
+        self.pending_dropped = 0
+        self._pending: List[Tuple[int, str, int]] = []
+        self._pending_by_user: Dict[int, int] = {}
+        # Наибольший id истории, уже проверенный get_users_over_history_limit
+        self._history_limit_checked_id = 0
+        self._flush_lock = asyncio.Lock()
+        self._flush_wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        # Кэш чтения истории: user_id -> (limit, первые строки) и user_id -> количество
+        self._history_cache: LRUCache[Tuple[int, List[Tuple[int, str, int]]]] = LRUCache(
+            config.HISTORY_CACHE_SIZE, ttl=config.HISTORY_CACHE_TTL
+        )
+        self._count_cache: LRUCache[int] = LRUCache(
+            config.HISTORY_CACHE_SIZE, ttl=config.HISTORY_CACHE_TTL
+        )
+        # Растёт при каждой инвалидации: чтение, начатое до изменения,
+        # не должно положить в кэш устаревший результат
+        self._history_generation = 0
+    
+    async def connect(self):
+        """
+        Открытие долгоживущего соединения с настроенными PRAGMA.
+        
+        Пока соединение открыто, все методы используют его вместо
+        открытия нового соединения (и нового потока) на каждый вызов.
+        """
+        if self._conn is not None:
+            return
+        conn = await aiosqlite.connect(self.db_path, cached_statements=config.DB_CACHED_STATEMENTS)
+        try:
+            # До перевода в WAL: auto_vacuum меняется только у пустой БД
+            await conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await conn.execute("PRAGMA journal_mode = WAL")
+            await conn.execute("PRAGMA synchronous = NORMAL")
+            await conn.execute("PRAGMA temp_store = MEMORY")
+            # Отрицательное значение cache_size задаётся в килобайтах
+            await conn.execute(f"PRAGMA cache_size = -{int(config.DB_CACHE_SIZE_KB)}")
+            await conn.execute(f"PRAGMA mmap_size = {int(config.DB_MMAP_SIZE)}")
+            await conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+        except Exception:
+            await conn.close()
+            raise
+        self._conn = conn
+        logger.info(f"Открыто постоянное соединение с базой данных {self.db_path}")
+    
+    async def close(self):
+        """Закрытие постоянного соединения"""
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        await conn.close()
+        logger.info("Соединение с базой данных закрыто")
+    
+    @asynccontextmanager
+    async def _connection(self) -> AsyncIterator[aiosqlite.Connection]:
+        """Постоянное соединение, если оно открыто, иначе временное"""
+        if self._conn is not None:
+            yield self._conn
+        else:
+            async with aiosqlite.connect(self.db_path) as conn:
+                yield conn
     
+    @timed(db_query_seconds, errors=db_query_errors)
     async def init_db(self):
-        """Создание таблиц в базе данных"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS search_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    query_text TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            await db.execute("""
-                CREATE INDEX IF NOT EXISTS idx_user_id 
-                ON search_history(user_id)
-            """)
-            await db.commit()
+        """Создание таблиц и применение миграций схемы (database/migrations.py)"""
+        async with self._connection() as db:
+            # Действует только для новой (пустой) БД: позволяет фоновому
+            # обслуживанию возвращать место через PRAGMA incremental_vacuum
+            await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            await migrate(db)
+    
+    def invalidate_user_history(self, user_id: Optional[int] = None):
+        """Сброс кэша истории пользователя (или всех пользователей, если user_id не указан)"""
+        self._history_generation += 1
+        if user_id is None:
+            self._history_cache.clear()
+            self._count_cache.clear()
+        else:
+            self._history_cache.pop(user_id)
+            self._count_cache.pop(user_id)
     
+    def history_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Счётчики кэша чтения истории"""
+        return {
+            "history": self._history_cache.stats(),
+            "count": self._count_cache.stats(),
+        }
+    
+    @timed(db_query_seconds, errors=db_query_errors)
     async def add_search_query(self, user_id: int, query_text: str):
-        """Добавление запроса в историю"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Добавление запроса в историю (в режиме write-behind - в очередь)"""
+        self.invalidate_user_history(user_id)
+        created_at = int(time.time())
+        if self.write_behind:
+            self._pending.append((user_id, query_text, created_at))
+            self._pending_by_user[user_id] = self._pending_by_user.get(user_id, 0) + 1
+            if not self._flush_lock.locked():
+                # Во время записи начало очереди - записываемая пачка, её не трогаем
+                self._trim_pending()
+            if len(self._pending) >= self.flush_size:
+                self._flush_wakeup.set()
+            return
+        
+        async with self._connection() as db:
             await db.execute(
-                "INSERT INTO search_history (user_id, query_text) VALUES (?, ?)",
-                (user_id, query_text)
+                "INSERT INTO search_history (user_id, query_text, created_at) VALUES (?, ?, ?)",
+                (user_id, query_text, created_at)
             )
             await db.commit()
     
-    async def get_user_history(self, user_id: int, limit: int = 10) -> List[Tuple[str, str]]:
-        """Получение истории запросов пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
+    async def start_write_behind(self):
+        """
+        Включение отложенной записи истории.
+        
+        Запросы копятся в памяти и записываются одной транзакцией (executemany),
+        когда набирается flush_size строк или проходит flush_interval секунд.
+        """
+        self.write_behind = True
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+    
+    async def stop_write_behind(self):
+        """Остановка фоновой записи и сброс всех накопленных строк в БД"""
+        self.write_behind = False
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush_pending()
+    
+    def _trim_pending(self):
+        """
+        Ограничение очереди записи pending_max строками.
+        
+        Пока БД недоступна, строки не записываются и копятся в памяти;
+        сверх предела отбрасываются самые старые (с записью в лог).
+        """
+        extra = len(self._pending) - self.pending_max
+        if self.pending_max <= 0 or extra <= 0:
+            return
+        dropped = self._pending[:extra]
+        del self._pending[:extra]
+        for user_id, _, _ in dropped:
+            left = self._pending_by_user[user_id] - 1
+            if left:
+                self._pending_by_user[user_id] = left
+            else:
+                del self._pending_by_user[user_id]
+            self.invalidate_user_history(user_id)
+        self.pending_dropped += extra
+        history_dropped.inc(amount=extra)
+        logger.error(
+            f"Очередь записи истории переполнена ({self.pending_max} строк): "
+            f"потеряно {extra}, всего {self.pending_dropped}"
+        )
+    
+    async def _flush_loop(self):
+        """Фоновая задача записи накопленной истории"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            try:
+                await self.flush_pending()
+            except Exception as e:
+                # Строки остаются в очереди и будут записаны следующей попыткой
+                logger.error(f"Ошибка записи истории запросов: {e}")
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def flush_pending(self) -> int:
+        """
+        Запись накопленных строк истории одной транзакцией
+        
+        Returns:
+            Количество записанных строк
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch = self._pending[:]
+            try:
+                async with self._connection() as db:
+                    await db.executemany(
+                        "INSERT INTO search_history (user_id, query_text, created_at) VALUES (?, ?, ?)",
+                        batch
+                    )
+                    await db.commit()
+            except Exception:
+                # Пачка остаётся в очереди до следующей попытки, но не сверх предела
+                self._trim_pending()
+                raise
+            
+            del self._pending[:len(batch)]
+            for user_id, _, _ in batch:
+                left = self._pending_by_user[user_id] - 1
+                if left:
+                    self._pending_by_user[user_id] = left
+                else:
+                    del self._pending_by_user[user_id]
+            return len(batch)
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def get_user_history(self, user_id: int, limit: int = 10) -> List[Tuple[str, int]]:
+        """Получение истории запросов пользователя: (текст, время в секундах Unix)"""
+        rows = await self._first_history_rows(user_id, limit)
+        return [(query_text, created_at) for _, query_text, created_at in rows[:limit]]
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def get_user_history_page(self, user_id: int, limit: int = 10,
+                                    before_id: Optional[int] = None,
+                                    after_id: Optional[int] = None) -> HistoryPage:
+        """
+        Получение страницы истории с keyset-пагинацией.
+        
+        Вместо OFFSET страница отсчитывается от строки-курсора, поэтому
+        выборка идёт по индексу (user_id, created_at, id) и стоит одинаково
+        независимо от длины истории.
+        
+        Args:
+            user_id: ID пользователя
+            limit: Размер страницы
+            before_id: Вернуть строки старше строки с этим id (следующая страница)
+            after_id: Вернуть строки новее строки с этим id (предыдущая страница)
+            
+        Returns:
+            Страница истории от новых записей к старым
+        """
+        if before_id is None and after_id is None:
+            # Первая страница - самая частая, она обслуживается кэшем
+            rows = await self._first_history_rows(user_id, limit + 1)
+            return HistoryPage(items=rows[:limit], has_older=len(rows) > limit)
+        
+        if user_id in self._pending_by_user:
+            await self.flush_pending()
+        
+        if before_id is not None:
+            condition, order = "<", "DESC"
+            cursor_id = before_id
+        else:
+            condition, order = ">", "ASC"
+            cursor_id = after_id
+        
+        async with self._connection() as db:
             async with db.execute(
-                """SELECT query_text, timestamp 
+                f"""SELECT id, query_text, created_at 
+                    FROM search_history 
+                    WHERE user_id = ? 
+                      AND (created_at, id) {condition} (
+                          SELECT created_at, id FROM search_history WHERE id = ? AND user_id = ?
+                      ) 
+                    ORDER BY created_at {order}, id {order} 
+                    LIMIT ?""",
+                (user_id, cursor_id, user_id, limit + 1)
+            ) as cursor:
+                rows = list(await cursor.fetchall())
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if before_id is not None:
+            return HistoryPage(items=rows, has_newer=True, has_older=has_more)
+        rows.reverse()
+        return HistoryPage(items=rows, has_newer=has_more, has_older=True)
+    
+    async def _first_history_rows(self, user_id: int, limit: int) -> List[Tuple[int, str, int]]:
+        """Самые новые строки истории (id, query_text, created_at) через кэш чтения"""
+        cached = self._history_cache.get(user_id)
+        if cached is not None:
+            cached_limit, rows = cached
+            # Закэшированный ответ подходит, если он не короче запрошенного
+            # или в истории пользователя больше строк нет
+            if cached_limit >= limit or len(rows) < cached_limit:
+                return rows[:limit]
+        
+        # Ещё не записанные строки пользователя сначала попадают в БД,
+        # чтобы пользователь видел свои последние запросы вместе с их id
+        if user_id in self._pending_by_user:
+            await self.flush_pending()
+        
+        generation = self._history_generation
+        async with self._connection() as db:
+            async with db.execute(
+                """SELECT id, query_text, created_at 
                    FROM search_history 
                    WHERE user_id = ? 
-                   ORDER BY timestamp DESC 
+                   ORDER BY created_at DESC, id DESC 
                    LIMIT ?""",
                 (user_id, limit)
             ) as cursor:
-                return await cursor.fetchall()
+                rows = list(await cursor.fetchall())
+        if generation == self._history_generation:
+            self._history_cache.set(user_id, (limit, rows))
+        return rows
     
+    @timed(db_query_seconds, errors=db_query_errors)
     async def clear_user_history(self, user_id: int):
         """Очистка истории запросов пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
-            await db.execute(
-                "DELETE FROM search_history WHERE user_id = ?",
-                (user_id,)
-            )
-            await db.commit()
+        self.invalidate_user_history(user_id)
+        async with self._flush_lock:
+            if user_id in self._pending_by_user:
+                self._pending[:] = [row for row in self._pending if row[0] != user_id]
+                del self._pending_by_user[user_id]
+            async with self._connection() as db:
+                await db.execute(
+                    "DELETE FROM search_history WHERE user_id = ?",
+                    (user_id,)
+                )
+                await db.commit()
+        # Чтения, начатые во время удаления, не должны вернуть строки в кэш
+        self.invalidate_user_history(user_id)
     
+    @timed(db_query_seconds, errors=db_query_errors)
     async def get_history_count(self, user_id: int) -> int:
-        """Получение количества запросов в истории"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Получение количества запросов в истории (через кэш чтения)"""
+        count = self._count_cache.get(user_id)
+        if count is not None:
+            return count
+        
+        generation = self._history_generation
+        count = await self._load_history_count(user_id)
+        if generation == self._history_generation:
+            self._count_cache.set(user_id, count)
+        return count
+    
+    async def _load_history_count(self, user_id: int) -> int:
+        """Подсчёт строк истории в БД с учётом ещё не записанных"""
+        if user_id not in self._pending_by_user:
+            return await self._select_history_count(user_id)
+        
+        async with self._flush_lock:
+            pending = self._pending_by_user.get(user_id, 0)
+            return pending + await self._select_history_count(user_id)
+    
+    async def _select_history_count(self, user_id: int) -> int:
+        async with self._connection() as db:
             async with db.execute(
                 "SELECT COUNT(*) FROM search_history WHERE user_id = ?",
                 (user_id,)
             ) as cursor:
                 result = await cursor.fetchone()
                 return result[0] if result else 0
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def delete_history_older_than(self, cutoff: int, batch_size: int) -> int:
+        """
+        Удаление одной пачки строк истории старше cutoff (секунды Unix)
+        
+        Returns:
+            Количество удалённых строк (0 - удалять больше нечего)
+        """
+        async with self._connection() as db:
+            cursor = await db.execute(
+                """DELETE FROM search_history WHERE id IN (
+                       SELECT id FROM search_history WHERE created_at < ?
+                       ORDER BY created_at LIMIT ?
+                   )""",
+                (cutoff, batch_size)
+            )
+            await db.commit()
+            return cursor.rowcount
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def get_users_over_history_limit(self, max_rows: int) -> List[int]:
+        """
+        Пользователи, у которых в истории больше max_rows строк
+        
+        Считаются только пользователи, добавившие строки после прошлого
+        вызова (id больше проверенного): у остальных история не росла.
+        Первый вызов после запуска проверяет всю таблицу. Вызывающий
+        должен обрезать историю всех возвращённых пользователей: повторно
+        пользователь попадёт в выборку только после нового запроса.
+        """
+        async with self._connection() as db:
+            async with db.execute("SELECT COALESCE(MAX(id), 0) FROM search_history") as cursor:
+                last_id = (await cursor.fetchone())[0]
+            async with db.execute(
+                """SELECT user_id FROM search_history 
+                   WHERE user_id IN (SELECT user_id FROM search_history WHERE id > ?)
+                   GROUP BY user_id 
+                   HAVING COUNT(*) > ?""",
+                (self._history_limit_checked_id, max_rows)
+            ) as cursor:
+                users = [row[0] for row in await cursor.fetchall()]
+        self._history_limit_checked_id = last_id
+        return users
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def trim_user_history(self, user_id: int, keep: int, batch_size: int) -> int:
+        """
+        Удаление одной пачки самых старых строк сверх keep новых
+        
+        Returns:
+            Количество удалённых строк (0 - удалять больше нечего)
+        """
+        async with self._connection() as db:
+            cursor = await db.execute(
+                """DELETE FROM search_history WHERE id IN (
+                       SELECT id FROM search_history 
+                       WHERE user_id = ? 
+                       ORDER BY created_at DESC, id DESC 
+                       LIMIT ? OFFSET ?
+                   )""",
+                (user_id, batch_size, keep)
+            )
+            await db.commit()
+            return cursor.rowcount
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def delete_expired_recommendations(self, max_age: float) -> int:
+        """Удаление устаревших записей кэша рекомендаций"""
+        async with self._connection() as db:
+            cursor = await db.execute(
+                "DELETE FROM recommendation_cache WHERE created_at < ?",
+                (int(time.time() - max_age),)
+            )
+            await db.commit()
+            return cursor.rowcount
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def get_storage_stats(self) -> Dict[str, int]:
+        """Размер файла БД в страницах: всего, свободных и размер страницы"""
+        stats = {}
+        async with self._connection() as db:
+            for pragma in ("page_count", "freelist_count", "page_size", "auto_vacuum"):
+                async with db.execute(f"PRAGMA {pragma}") as cursor:
+                    row = await cursor.fetchone()
+                    stats[pragma] = row[0] if row else 0
+        return stats
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def incremental_vacuum(self, pages: int = 0):
+        """Возврат свободных страниц файлу (0 - все свободные страницы)"""
+        pragma = f"PRAGMA incremental_vacuum({int(pages)})" if pages > 0 else "PRAGMA incremental_vacuum"
+        async with self._connection() as db:
+            # Прагма освобождает по странице на каждый шаг выполнения, а execute()
+            # модуля sqlite3 делает лишь один шаг; executescript выполняет её до конца
+            await db.executescript(f"{pragma};")
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def optimize(self):
+        """Обновление статистики планировщика запросов (PRAGMA optimize)"""
+        async with self._connection() as db:
+            await db.execute("PRAGMA optimize")
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def get_cached_recommendations(self, query_key: str, max_age: float) -> Optional[Tuple[str, int]]:
+        """
+        Получение сохранённых рекомендаций по нормализованному запросу
+        
+        Returns:
+            Кортеж (payload, created_at) или None, если записи нет или она устарела
+        """
+        async with self._connection() as db:
+            async with db.execute(
+                """SELECT payload, created_at 
+                   FROM recommendation_cache 
+                   WHERE query_key = ? AND created_at >= ?""",
+                (query_key, int(time.time() - max_age))
+            ) as cursor:
+                return await cursor.fetchone()
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def get_recent_cached_recommendations(self, max_age: float, limit: int) -> List[Tuple[str, str, int]]:
+        """
+        Самые свежие записи кэша рекомендаций (max_age 0 - без ограничения возраста)
+        
+        Returns:
+            Список (query_key, payload, created_at) от новых к старым
+        """
+        since = int(time.time() - max_age) if max_age > 0 else 0
+        async with self._connection() as db:
+            async with db.execute(
+                """SELECT query_key, payload, created_at 
+                   FROM recommendation_cache 
+                   WHERE created_at >= ?
+                   ORDER BY created_at DESC
+                   LIMIT ?""",
+                (since, limit)
+            ) as cursor:
+                return await cursor.fetchall()
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def save_cached_recommendations(self, query_key: str, payload: str):
+        """Сохранение рекомендаций по нормализованному запросу"""
+        async with self._connection() as db:
+            await db.execute(
+                """INSERT OR REPLACE INTO recommendation_cache (query_key, payload, created_at) 
+                   VALUES (?, ?, ?)""",
+                (query_key, payload, int(time.time()))
+            )
+            await db.commit()
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def save_ai_usage(self, rows: List[tuple]):
+        """Запись пачки строк телеметрии одной транзакцией"""
+        async with self._connection() as db:
+            await db.executemany(
+                """INSERT INTO ai_usage (created_at, user_id, model, stream, status, attempts,
+                                         queue_ms, ttfb_ms, generation_ms, total_ms,
+                                         prompt_tokens, completion_tokens, cost, games)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            await db.commit()
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def get_ai_usage_summary(self, since: int) -> List[Dict[str, Any]]:
+        """Сводка телеметрии по моделям начиная с момента since (unix-время)"""
+        async with self._connection() as db:
+            async with db.execute(
+                """SELECT model, COUNT(*), SUM(status = 'ok'),
+                          AVG(CASE WHEN status = 'ok' THEN queue_ms END),
+                          AVG(CASE WHEN status = 'ok' THEN ttfb_ms END),
+                          AVG(CASE WHEN status = 'ok' THEN generation_ms END),
+                          AVG(CASE WHEN status = 'ok' THEN total_ms END),
+                          AVG(prompt_tokens), AVG(completion_tokens),
+                          SUM(prompt_tokens), SUM(completion_tokens), SUM(cost)
+                   FROM ai_usage
+                   WHERE created_at >= ?
+                   GROUP BY model
+                   ORDER BY COUNT(*) DESC""",
+                (since,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+        keys = ("model", "calls", "ok", "queue_avg_ms", "ttfb_avg_ms", "generation_avg_ms",
+                "total_avg_ms", "prompt_tokens_avg", "completion_tokens_avg",
+                "prompt_tokens", "completion_tokens", "cost")
+        return [dict(zip(keys, row)) for row in rows]
+    
+    @timed(db_query_seconds, errors=db_query_errors)
+    async def delete_ai_usage_older_than(self, cutoff: int, batch_size: int) -> int:
+        """Удаление пачки строк телеметрии старше cutoff (unix-время)"""
+        async with self._connection() as db:
+            cursor = await db.execute(
+                """DELETE FROM ai_usage WHERE id IN (
+                       SELECT id FROM ai_usage WHERE created_at < ? LIMIT ?
+                   )""",
+                (cutoff, batch_size)
+            )
+            await db.commit()
+            return cursor.rowcount
+
+
+def shard_path(db_path: str, index: int) -> str:
+    """Путь к файлу шарда: bot_database.db -> bot_database.shard0.db"""
+    root, ext = os.path.splitext(db_path)
+    return f"{root}.shard{index}{ext or '.db'}"
+
+
+class ShardedDatabase:
+    """
+    История запросов, разнесённая по нескольким файлам SQLite.
+    
+    Каждый шард - обычный Database со своим соединением и очередью записи,
+    поэтому писатели разных шардов не блокируют друг друга. Методы истории
+    направляются в шард по хэшу user_id, данные без привязки к пользователю
+    (кэш рекомендаций, телеметрия) хранятся в нулевом шарде.
+    """
+    
+    def __init__(self, db_path: str = None, shards: int = None):
+        """Инициализация шардов"""
+        self.db_path = db_path or config.DATABASE_PATH
+        count = max(1, shards or config.DB_SHARDS)
+        self.shards = [Database(shard_path(self.db_path, i)) for i in range(count)]
+        self.primary = self.shards[0]
+    
+    def shard_for(self, user_id: int) -> Database:
+        """Шард, в котором хранится история пользователя"""
+        return self.shards[user_bucket(user_id, len(self.shards))]
+    
+    async def _each(self, method: str, *args) -> list:
+        return await asyncio.gather(*(getattr(shard, method)(*args) for shard in self.shards))
+    
+    async def connect(self):
+        await self._each("connect")
+    
+    async def close(self):
+        await self._each("close")
+    
+    async def init_db(self):
+        await self._each("init_db")
+    
+    async def start_write_behind(self):
+        await self._each("start_write_behind")
+    
+    async def stop_write_behind(self):
+        await self._each("stop_write_behind")
+    
+    async def flush_pending(self) -> int:
+        return sum(await self._each("flush_pending"))
+    
+    def invalidate_user_history(self, user_id: Optional[int] = None):
+        if user_id is None:
+            for shard in self.shards:
+                shard.invalidate_user_history()
+        else:
+            self.shard_for(user_id).invalidate_user_history(user_id)
+    
+    def history_cache_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Счётчики кэша чтения истории, суммированные по шардам"""
+        total: Dict[str, Dict[str, Any]] = {}
+        for shard in self.shards:
+            for name, stats in shard.history_cache_stats().items():
+                bucket = total.setdefault(name, {})
+                for key, value in stats.items():
+                    if key != "hit_rate":
+                        bucket[key] = bucket.get(key, 0) + value
+        for stats in total.values():
+            lookups = stats.get("hits", 0) + stats.get("misses", 0)
+            stats["hit_rate"] = round(stats.get("hits", 0) / lookups, 4) if lookups else 0.0
+        return total
+    
+    # История запросов: маршрутизация по user_id
+    
+    async def add_search_query(self, user_id: int, query_text: str):
+        await self.shard_for(user_id).add_search_query(user_id, query_text)
+    
+    async def get_user_history(self, user_id: int, limit: int = 10) -> List[Tuple[str, int]]:
+        return await self.shard_for(user_id).get_user_history(user_id, limit)
+    
+    async def get_user_history_page(self, user_id: int, limit: int = 10,
+                                    before_id: Optional[int] = None,
+                                    after_id: Optional[int] = None) -> HistoryPage:
+        return await self.shard_for(user_id).get_user_history_page(
+            user_id, limit, before_id=before_id, after_id=after_id
+        )
+    
+    async def clear_user_history(self, user_id: int):
+        await self.shard_for(user_id).clear_user_history(user_id)
+    
+    async def get_history_count(self, user_id: int) -> int:
+        return await self.shard_for(user_id).get_history_count(user_id)
+    
+    # Обслуживание: выполняется на всех шардах
+    
+    async def delete_history_older_than(self, cutoff: int, batch_size: int) -> int:
+        return sum(await self._each("delete_history_older_than", cutoff, batch_size))
+    
+    async def get_users_over_history_limit(self, max_rows: int) -> List[int]:
+        return [user_id for users in await self._each("get_users_over_history_limit", max_rows)
+                for user_id in users]
+    
+    async def trim_user_history(self, user_id: int, keep: int, batch_size: int) -> int:
+        return await self.shard_for(user_id).trim_user_history(user_id, keep, batch_size)
+    
+    async def get_storage_stats(self) -> Dict[str, int]:
+        stats = await self._each("get_storage_stats")
+        return {
+            "page_count": sum(s["page_count"] for s in stats),
+            "freelist_count": sum(s["freelist_count"] for s in stats),
+            "page_size": stats[0]["page_size"],
+            "auto_vacuum": min(s["auto_vacuum"] for s in stats),
+        }
+    
+    async def incremental_vacuum(self, pages: int = 0):
+        await self._each("incremental_vacuum", pages)
+    
+    async def optimize(self):
+        await self._each("optimize")
+    
+    # Кэш рекомендаций: нулевой шард
+    
+    async def delete_expired_recommendations(self, max_age: float) -> int:
+        return await self.primary.delete_expired_recommendations(max_age)
+    
+    async def get_cached_recommendations(self, query_key: str, max_age: float) -> Optional[Tuple[str, int]]:
+        return await self.primary.get_cached_recommendations(query_key, max_age)
+    
+    async def get_recent_cached_recommendations(self, max_age: float, limit: int) -> List[Tuple[str, str, int]]:
+        return await self.primary.get_recent_cached_recommendations(max_age, limit)
+    
+    async def save_cached_recommendations(self, query_key: str, payload: str):
+        await self.primary.save_cached_recommendations(query_key, payload)
+    
+    # Телеметрия запросов к нейросети: нулевой шард
+    
+    async def save_ai_usage(self, rows: List[tuple]):
+        await self.primary.save_ai_usage(rows)
+    
+    async def get_ai_usage_summary(self, since: int) -> List[Dict[str, Any]]:
+        return await self.primary.get_ai_usage_summary(since)
+    
+    async def delete_ai_usage_older_than(self, cutoff: int, batch_size: int) -> int:
+        return await self.primary.delete_ai_usage_older_than(cutoff, batch_size)
+
 
+# Любой из вариантов хранилища: они взаимозаменяемы для остального кода
+AnyDatabase = Union[Database, ShardedDatabase]
 
 # Глобальный экземпляр базы данных
-db = Database()
+db = ShardedDatabase() if config.DB_SHARDS > 1 else Database()
@@ -0,0 +1,252 @@
+"""
+Хранилище состояний FSM aiogram в SQLite с горячим кэшем в памяти
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import aiosqlite
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+import config
+from utils.lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Запись хранилища: (состояние, данные)
+Record = Tuple[Optional[str], Dict[str, Any]]
+
+_EMPTY: Record = (None, {})
+
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище FSM: SQLite как источник истины и ограниченный LRU в памяти.
+
+    Чтение идёт из LRU (в том числе «пустые» записи, чтобы не ходить в БД
+    за каждым сообщением пользователя без состояния), изменения копятся
+    в памяти и записываются одной транзакцией раз в flush_interval секунд
+    или по достижении flush_size изменений. Записи без изменений дольше
+    state_ttl секунд считаются истёкшими и периодически удаляются.
+    """
+
+    def __init__(self, db_path: str = None, cache_size: int = None, state_ttl: float = None,
+                 flush_size: int = None, flush_interval: float = None,
+                 key_builder: Optional[KeyBuilder] = None):
+        """Инициализация хранилища"""
+        self.db_path = db_path or config.FSM_STORAGE_PATH
+        self.state_ttl = config.FSM_STATE_TTL if state_ttl is None else state_ttl
+        self.flush_size = flush_size or config.FSM_FLUSH_SIZE
+        self.flush_interval = flush_interval or config.FSM_FLUSH_INTERVAL
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache: LRUCache[Record] = LRUCache(
+            cache_size or config.FSM_CACHE_SIZE, ttl=self.state_ttl or None
+        )
+        self._conn: Optional[aiosqlite.Connection] = None
+        # Изменения, ещё не записанные в БД: ключ -> (запись, время изменения)
+        self._dirty: Dict[str, Tuple[Record, int]] = {}
+        self._flushing: Dict[str, Tuple[Record, int]] = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._last_purge = 0.0
+        # После close() хранилище не открывается повторно: поздние обращения
+        # не должны заново создавать соединение и фоновую задачу
+        self._closed = False
+
+    def _ensure_open(self):
+        if self._closed:
+            raise RuntimeError("Хранилище состояний FSM уже закрыто")
+
+    async def start(self):
+        """Открытие соединения, создание таблицы и запуск фоновой записи"""
+        self._ensure_open()
+        if self._conn is None:
+            conn = await aiosqlite.connect(self.db_path, cached_statements=config.DB_CACHED_STATEMENTS)
+            try:
+                await conn.execute("PRAGMA journal_mode = WAL")
+                await conn.execute("PRAGMA synchronous = NORMAL")
+                await conn.execute(f"PRAGMA busy_timeout = {int(config.DB_BUSY_TIMEOUT_MS)}")
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS fsm_state (
+                        key TEXT PRIMARY KEY,
+                        state TEXT,
+                        data TEXT NOT NULL DEFAULT '{}',
+                        updated_at INTEGER NOT NULL
+                    ) WITHOUT ROWID
+                """)
+                await conn.commit()
+            except Exception:
+                await conn.close()
+                raise
+            self._conn = conn
+            logger.info(f"Хранилище состояний FSM: {self.db_path}")
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """
+        Запись всех накопленных изменений и закрытие соединения
+
+        Вызывается Dispatcher при остановке (он регистрирует закрытие
+        хранилища FSM сам); повторный вызов ничего не делает.
+        """
+        self._closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._conn is None:
+            return
+        try:
+            await self.flush()
+        finally:
+            conn, self._conn = self._conn, None
+            await conn.close()
+            logger.info("Хранилище состояний FSM закрыто")
+
+    # Интерфейс BaseStorage
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name = self.key_builder.build(key)
+        _, data = await self._load(name)
+        self._store(name, (state.state if isinstance(state, State) else state, data))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(f"Data must be a dict, not {type(data).__name__}")
+        name = self.key_builder.build(key)
+        state, _ = await self._load(name)
+        self._store(name, (state, data.copy()))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self.key_builder.build(key))
+        return data.copy()
+
+    # Внутренняя логика
+
+    def _store(self, name: str, record: Record):
+        """Запись в LRU и очередь на сохранение"""
+        self._ensure_open()
+        self._cache.set(name, record)
+        self._dirty[name] = (record, int(time.time()))
+        if len(self._dirty) >= self.flush_size:
+            self._flush_wakeup.set()
+
+    async def _load(self, name: str) -> Record:
+        """Получение записи: LRU, затем незаписанные изменения, затем БД"""
+        record = self._cache.get(name)
+        if record is not None:
+            return record
+
+        pending = self._dirty.get(name) or self._flushing.get(name)
+        if pending is not None:
+            record = pending[0]
+        else:
+            record = await self._select(name)
+            # Запись могла измениться, пока шёл запрос к БД
+            pending = self._dirty.get(name) or self._flushing.get(name)
+            if pending is not None:
+                record = pending[0]
+        self._cache.set(name, record)
+        return record
+
+    async def _select(self, name: str) -> Record:
+        if self._conn is None:
+            # До on_startup соединение открывается при первом чтении; после close() - ошибка
+            await self.start()
+        async with self._conn.execute(
+            "SELECT state, data, updated_at FROM fsm_state WHERE key = ?", (name,)
+        ) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return _EMPTY
+        state, data, updated_at = row
+        if self.state_ttl and updated_at + self.state_ttl <= time.time():
+            return _EMPTY
+        return state, json.loads(data)
+
+    async def _flush_loop(self):
+        """Фоновая задача записи изменений и удаления истёкших состояний"""
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            try:
+                await self.flush()
+                await self._purge_expired()
+            except Exception as e:
+                logger.error(f"Ошибка записи состояний FSM: {e}")
+
+    async def flush(self) -> int:
+        """
+        Запись накопленных изменений одной транзакцией
+
+        Returns:
+            Количество записанных ключей
+        """
+        async with self._flush_lock:
+            if not self._dirty or self._conn is None:
+                return 0
+            self._flushing, self._dirty = self._dirty, {}
+
+            upserts: List[Tuple[str, Optional[str], str, int]] = []
+            deletes: List[Tuple[str]] = []
+            for name, ((state, data), updated_at) in self._flushing.items():
+                if state is None and not data:
+                    deletes.append((name,))
+                else:
+                    upserts.append((name, state, json.dumps(data, ensure_ascii=False), updated_at))
+            try:
+                if upserts:
+                    await self._conn.executemany(
+                        """INSERT INTO fsm_state (key, state, data, updated_at) VALUES (?, ?, ?, ?)
+                           ON CONFLICT(key) DO UPDATE SET
+                               state = excluded.state, data = excluded.data, updated_at = excluded.updated_at""",
+                        upserts
+                    )
+                if deletes:
+                    await self._conn.executemany("DELETE FROM fsm_state WHERE key = ?", deletes)
+                await self._conn.commit()
+            except BaseException:
+                # Возвращаем изменения в очередь, если их не перезаписали более новые.
+                # BaseException: close() отменяет фоновую запись посреди транзакции,
+                # и пачку должен записать следующий flush() в close()
+                for name, pending in self._flushing.items():
+                    self._dirty.setdefault(name, pending)
+                raise
+            finally:
+                written = len(self._flushing)
+                self._flushing = {}
+            return written
+
+    async def _purge_expired(self):
+        """Удаление истёкших состояний не чаще раза в state_ttl (но хотя бы раз в час)"""
+        if not self.state_ttl or self._conn is None:
+            return
+        now = time.time()
+        if now - self._last_purge < min(self.state_ttl, 3600):
+            return
+        self._last_purge = now
+        cursor = await self._conn.execute(
+            "DELETE FROM fsm_state WHERE updated_at <= ?", (int(now - self.state_ttl),)
+        )
+        await self._conn.commit()
+        if cursor.rowcount:
+            logger.info(f"Удалено истёкших состояний FSM: {cursor.rowcount}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики горячего кэша и размер очереди записи"""
+        return {**self._cache.stats(), "dirty": len(self._dirty)}
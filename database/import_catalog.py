@@ -0,0 +1,199 @@
+"""
+Импорт дампа игр (CSV, JSON или JSON Lines) в локальный каталог.
+
+Запуск:
+    python -m database.import_catalog games.csv
+    python -m database.import_catalog rawg_page1.json rawg_page2.json --output games_catalog.db
+
+Поддерживаются дампы RAWG: CSV с разделителем «||» в списках (platforms,
+genres) и JSON ответов API (списки объектов {"name": ...} или
+{"platform": {"name": ...}}, поля description_raw, background_image).
+Каталог собирается во временном файле и атомарно подменяет старый;
+работающий бот увидит новый каталог после перезапуска.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from database.catalog import CATALOG_SCHEMA, name_key
+
+logger = logging.getLogger(__name__)
+
+# Строка таблицы games без id
+CatalogRow = Tuple[str, str, Optional[str], Optional[str], Optional[str], Optional[float],
+                   Optional[str], Optional[str], int]
+
+
+def _join_names(value: Any) -> Optional[str]:
+    """Список жанров или платформ в строку «A, B, C» (из строки с разделителями или JSON)"""
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        for separator in ("||", "|", ";"):
+            if separator in value:
+                value = value.split(separator)
+                break
+        else:
+            return value.strip() or None
+    names: List[str] = []
+    for item in value:
+        if isinstance(item, dict):
+            # RAWG: {"name": ...} для жанров и {"platform": {"name": ...}} для платформ
+            item = (item.get("platform") or item).get("name")
+        if item and str(item).strip() and str(item).strip() not in names:
+            names.append(str(item).strip())
+    return ", ".join(names) or None
+
+
+def _first(record: Dict[str, Any], *fields: str) -> Any:
+    for field in fields:
+        value = record.get(field)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_record(record: Dict[str, Any]) -> Optional[CatalogRow]:
+    """Запись дампа -> строка каталога (None, если у игры нет названия)"""
+    name = _first(record, "name", "title")
+    if not name or not str(name).strip():
+        return None
+    name = str(name).strip()
+    released = _first(record, "released", "year", "release_date")
+    description = _first(record, "description_raw", "description", "summary")
+    rating = _number(_first(record, "rating"))
+    popularity = _number(_first(record, "ratings_count", "added", "popularity", "reviews_count"))
+    return (
+        name,
+        name_key(name),
+        _join_names(_first(record, "genres", "genre")),
+        _join_names(_first(record, "platforms", "platform", "parent_platforms")),
+        str(released)[:10] if released is not None else None,
+        round(rating, 2) if rating is not None else None,
+        str(description).strip() if description else None,
+        _first(record, "background_image", "image"),
+        int(popularity or 0),
+    )
+
+
+def read_records(path: str) -> Iterator[Dict[str, Any]]:
+    """Записи дампа по одной (CSV читается потоково)"""
+    lower = path.lower()
+    if lower.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    elif lower.endswith((".jsonl", ".ndjson")):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif lower.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        # Страница ответа RAWG API: {"count": ..., "results": [...]}
+        if isinstance(data, dict):
+            data = data.get("results") or data.get("games") or []
+        yield from data
+    else:
+        raise ValueError(f"Неизвестный формат дампа (ожидается .csv, .json или .jsonl): {path}")
+
+
+def _batches(rows: Iterable[CatalogRow], size: int) -> Iterator[List[CatalogRow]]:
+    batch: List[CatalogRow] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_catalog(sources: List[str], output: str, batch_size: int = 5000) -> int:
+    """
+    Сборка каталога из дампов
+
+    Returns:
+        Количество импортированных игр
+    """
+    for source in sources:
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Файл дампа не найден: {source}")
+
+    tmp_path = output + ".tmp"
+    for suffix in ("", "-journal"):
+        if os.path.exists(tmp_path + suffix):
+            os.remove(tmp_path + suffix)
+
+    conn = sqlite3.connect(tmp_path)
+    imported = 0
+    try:
+        # Файл собирается с нуля и подменяет каталог только в конце,
+        # поэтому журнал не нужен: при сбое временный файл просто удаляется
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        conn.executescript(CATALOG_SCHEMA)
+        for source in sources:
+            rows = (row for row in map(normalize_record, read_records(source)) if row is not None)
+            for batch in _batches(rows, batch_size):
+                conn.executemany(
+                    """INSERT INTO games (name, name_key, genres, platforms, released, rating,
+                                          description, background_image, popularity)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    batch
+                )
+                imported += len(batch)
+                logger.info(f"Импортировано игр: {imported}")
+        # Индекс строится одним проходом после загрузки - быстрее, чем по строке
+        conn.execute("INSERT INTO games_fts(games_fts) VALUES ('rebuild')")
+        conn.execute("INSERT INTO games_fts(games_fts) VALUES ('optimize')")
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+    except BaseException:
+        conn.close()
+        os.remove(tmp_path)
+        raise
+    conn.close()
+
+    os.replace(tmp_path, output)
+    return imported
+
+
+def main(argv=None):
+    import config
+
+    parser = argparse.ArgumentParser(description="Импорт дампа игр в локальный каталог SQLite FTS5")
+    parser.add_argument("sources", nargs="+", help="файлы дампа (.csv, .json, .jsonl)")
+    parser.add_argument("--output", default=config.CATALOG_PATH, help="файл каталога")
+    parser.add_argument("--batch-size", type=int, default=5000, help="строк за одну вставку")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    started = time.monotonic()
+    try:
+        imported = build_catalog(args.sources, args.output, args.batch_size)
+    except (FileNotFoundError, ValueError, json.JSONDecodeError, csv.Error) as e:
+        logger.error(str(e))
+        return 1
+
+    logger.info(f"Готово: {imported} игр в {args.output} за {time.monotonic() - started:.1f} с. "
+                f"Установите CATALOG_MODE=enrich или answer и перезапустите бота.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+Фоновое обслуживание базы данных: ограничение истории и возврат места
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import config
+from database.db import AnyDatabase, db
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class MaintenanceReport:
+    """Результат одного прохода обслуживания"""
+    removed_by_age: int = 0
+    removed_by_cap: int = 0
+    removed_cache_entries: int = 0
+    removed_usage_rows: int = 0
+    bytes_reclaimed: int = 0
+    duration: float = 0.0
+    
+    @property
+    def rows_removed(self) -> int:
+        return self.removed_by_age + self.removed_by_cap
+
+
+class HistoryMaintenance:
+    """
+    Периодическая очистка search_history.
+    
+    Удаляет строки старше HISTORY_MAX_AGE_DAYS и сверх HISTORY_MAX_ROWS_PER_USER
+    на пользователя. Удаление идёт небольшими пачками отдельными транзакциями
+    с паузами между ними, чтобы не блокировать event loop и запись истории.
+    После удаления выполняются PRAGMA incremental_vacuum и optimize.
+    """
+    
+    def __init__(self, database: AnyDatabase):
+        self.database = database
+        self.interval = config.MAINTENANCE_INTERVAL
+        self.batch_size = config.MAINTENANCE_BATCH_SIZE
+        self.batch_pause = config.MAINTENANCE_BATCH_PAUSE
+        self.max_rows_per_user = config.HISTORY_MAX_ROWS_PER_USER
+        self.max_age_days = config.HISTORY_MAX_AGE_DAYS
+        self.vacuum_pages = config.MAINTENANCE_VACUUM_PAGES
+        self.last_report: Optional[MaintenanceReport] = None
+        self.total_rows_removed = 0
+        self.total_bytes_reclaimed = 0
+        self._task: Optional[asyncio.Task] = None
+        self._vacuum_warned = False
+    
+    def start(self):
+        """Запуск фоновой задачи"""
+        if self.interval <= 0:
+            logger.info("Фоновое обслуживание БД отключено")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+    
+    async def stop(self):
+        """Остановка фоновой задачи"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    async def _loop(self):
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка фонового обслуживания БД: {e}")
+            await asyncio.sleep(self.interval)
+    
+    async def run_once(self) -> MaintenanceReport:
+        """Один проход обслуживания"""
+        started = time.monotonic()
+        report = MaintenanceReport()
+        
+        if self.max_age_days > 0:
+            report.removed_by_age = await self._delete_in_batches(
+                self.database.delete_history_older_than, int(time.time() - self.max_age_days * 86400)
+            )
+            if report.removed_by_age:
+                self.database.invalidate_user_history()
+        
+        if self.max_rows_per_user > 0:
+            for user_id in await self.database.get_users_over_history_limit(self.max_rows_per_user):
+                removed = await self._delete_in_batches(
+                    self.database.trim_user_history, user_id, self.max_rows_per_user
+                )
+                if removed:
+                    self.database.invalidate_user_history(user_id)
+                report.removed_by_cap += removed
+        
+        if config.CACHE_TTL_SECONDS > 0:
+            report.removed_cache_entries = await self.database.delete_expired_recommendations(
+                config.CACHE_TTL_SECONDS
+            )
+        
+        if config.TELEMETRY_RETENTION_DAYS > 0:
+            report.removed_usage_rows = await self._delete_in_batches(
+                self.database.delete_ai_usage_older_than,
+                int(time.time() - config.TELEMETRY_RETENTION_DAYS * 86400)
+            )
+        
+        report.bytes_reclaimed = await self._reclaim_space()
+        await self.database.optimize()
+        
+        report.duration = time.monotonic() - started
+        self.last_report = report
+        self.total_rows_removed += report.rows_removed
+        self.total_bytes_reclaimed += report.bytes_reclaimed
+        logger.info(
+            f"Обслуживание БД: удалено строк истории {report.rows_removed} "
+            f"(по возрасту {report.removed_by_age}, сверх лимита {report.removed_by_cap}), "
+            f"записей кэша {report.removed_cache_entries}, телеметрии {report.removed_usage_rows}, "
+            f"освобождено {report.bytes_reclaimed} байт за {report.duration:.2f} с"
+        )
+        return report
+    
+    async def _delete_in_batches(self, delete_batch, *args) -> int:
+        """Вызов delete_batch(*args, batch_size) до тех пор, пока он что-то удаляет"""
+        removed = 0
+        while True:
+            deleted = await delete_batch(*args, self.batch_size)
+            removed += deleted
+            if deleted < self.batch_size:
+                return removed
+            # Пауза между пачками пропускает вперёд обработчики и запись истории
+            await asyncio.sleep(self.batch_pause)
+    
+    async def _reclaim_space(self) -> int:
+        """Возврат свободных страниц файлу; возвращает количество освобождённых байт"""
+        before = await self.database.get_storage_stats()
+        if before["auto_vacuum"] != 2:
+            # auto_vacuum=INCREMENTAL включается только для новой БД (или после VACUUM)
+            if not self._vacuum_warned:
+                logger.info("incremental_vacuum недоступен: для существующей БД выполните VACUUM вручную")
+                self._vacuum_warned = True
+            return 0
+        if not before["freelist_count"]:
+            return 0
+        await self.database.incremental_vacuum(self.vacuum_pages)
+        after = await self.database.get_storage_stats()
+        return max(0, before["page_count"] - after["page_count"]) * before["page_size"]
+
+
+# Глобальный экземпляр обслуживания истории
+history_maintenance = HistoryMaintenance(db)
@@ -0,0 +1,131 @@
+"""
+Перенос истории из одного файла SQLite в шарды.
+
+Запуск (бот должен быть остановлен):
+    python -m database.migrate_shards --source bot_database.db --shards 4
+
+Строки search_history раскладываются по файлам <source>.shardN.db тем же
+хэшем user_id, что использует ShardedDatabase; id и время запросов
+сохраняются. Кэш рекомендаций переносится в нулевой шард.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+from typing import Dict, List, Tuple
+
+from database.db import Database, shard_path
+from utils.hashing import user_bucket
+
+logger = logging.getLogger(__name__)
+
+
+def _count(conn: sqlite3.Connection, table: str) -> int:
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def migrate(source: str, shards: int, batch_size: int = 5000, force: bool = False) -> List[int]:
+    """
+    Разделение истории source на shards файлов
+    
+    Returns:
+        Количество строк истории в каждом шарде
+    """
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Файл базы данных не найден: {source}")
+    
+    paths = [shard_path(source, i) for i in range(shards)]
+    existing = [path for path in paths if os.path.exists(path)]
+    if existing and not force:
+        raise FileExistsError(f"Шарды уже существуют: {', '.join(existing)} (используйте --force)")
+    for path in existing:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    
+    # Схема шардов создаётся тем же кодом, что и при запуске бота;
+    # источник сначала приводится к той же версии схемы
+    async def init_schema():
+        for path in [source] + paths:
+            await Database(path).init_db()
+    asyncio.run(init_schema())
+    
+    src = sqlite3.connect(source)
+    targets = [sqlite3.connect(path) for path in paths]
+    counts = [0] * shards
+    try:
+        last_id = 0
+        while True:
+            rows = src.execute(
+                """SELECT id, user_id, query_text, created_at FROM search_history 
+                   WHERE id > ? ORDER BY id LIMIT ?""",
+                (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            
+            by_shard: Dict[int, List[Tuple]] = {}
+            for row in rows:
+                by_shard.setdefault(user_bucket(row[1], shards), []).append(row)
+            for index, shard_rows in by_shard.items():
+                targets[index].executemany(
+                    "INSERT INTO search_history (id, user_id, query_text, created_at) VALUES (?, ?, ?, ?)",
+                    shard_rows
+                )
+                targets[index].commit()
+                counts[index] += len(shard_rows)
+            logger.info(f"Перенесено строк истории: {sum(counts)}")
+        
+        has_cache = src.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'recommendation_cache'"
+        ).fetchone()
+        if has_cache:
+            targets[0].executemany(
+                "INSERT OR REPLACE INTO recommendation_cache (query_key, payload, created_at) VALUES (?, ?, ?)",
+                src.execute("SELECT query_key, payload, created_at FROM recommendation_cache")
+            )
+            targets[0].commit()
+        
+        expected = _count(src, "search_history")
+        migrated = sum(_count(target, "search_history") for target in targets)
+        if migrated != expected:
+            raise RuntimeError(f"Несовпадение количества строк: в источнике {expected}, в шардах {migrated}")
+    finally:
+        src.close()
+        for target in targets:
+            target.close()
+    
+    return counts
+
+
+def main(argv=None):
+    import config
+    
+    parser = argparse.ArgumentParser(description="Перенос истории запросов в шарды SQLite")
+    parser.add_argument("--source", default=config.DATABASE_PATH, help="исходный файл БД")
+    parser.add_argument("--shards", type=int, default=config.DB_SHARDS, help="количество шардов")
+    parser.add_argument("--batch-size", type=int, default=5000, help="строк за одну транзакцию")
+    parser.add_argument("--force", action="store_true", help="перезаписать существующие шарды")
+    args = parser.parse_args(argv)
+    
+    if args.shards < 2:
+        parser.error("для шардирования нужно не меньше 2 шардов")
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    try:
+        counts = migrate(args.source, args.shards, args.batch_size, args.force)
+    except (FileNotFoundError, FileExistsError, RuntimeError) as e:
+        logger.error(str(e))
+        return 1
+    
+    for index, count in enumerate(counts):
+        logger.info(f"{shard_path(args.source, index)}: {count} строк")
+    logger.info(f"Готово. Установите DB_SHARDS={args.shards} и перезапустите бота.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
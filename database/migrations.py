@@ -0,0 +1,243 @@
+"""
+Версионные миграции схемы SQLite (номер версии - PRAGMA user_version)
+
+Каждая миграция применяется один раз: init_db() выполняет все миграции
+с номером больше текущего user_version и записывает номер последней.
+Миграция с переносом данных делает это пачками (backfill) в отдельных
+коротких транзакциях и может быть прервана: при следующем запуске перенос
+продолжится с того места, где остановился. Структурные изменения и новый
+номер версии записываются одной транзакцией в конце.
+
+Процессы кластера открывают одну и ту же БД и запускают миграции
+одновременно: каждая транзакция начинается с BEGIN IMMEDIATE и заново
+проверяет user_version, поэтому миграцию завершает ровно один процесс,
+а остальные просто видят новую версию.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+Step = Callable[[aiosqlite.Connection], Awaitable[None]]
+Backfill = Callable[[aiosqlite.Connection, int], Awaitable[int]]
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Шаг изменения схемы
+
+    prepare и backfill должны быть идемпотентными: их транзакции
+    повторяются после перезапуска и выполняются несколькими процессами.
+    """
+    version: int
+    description: str
+    # Структурные изменения; выполняются в одной транзакции с записью версии
+    apply: Step
+    # Подготовка к переносу (например, создание новой таблицы)
+    prepare: Optional[Step] = None
+    # Перенос одной пачки строк; возвращает количество перенесённых строк
+    backfill: Optional[Backfill] = None
+
+
+async def get_version(conn: aiosqlite.Connection) -> int:
+    async with conn.execute("PRAGMA user_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def _transaction(conn: aiosqlite.Connection, version: int, step, *args) -> Tuple[bool, Any]:
+    """
+    Шаг миграции version в отдельной транзакции
+
+    Returns:
+        (False, None), если миграцию уже применил другой процесс, иначе (True, результат шага)
+    """
+    await conn.execute("BEGIN IMMEDIATE")
+    try:
+        if await get_version(conn) >= version:
+            await conn.rollback()
+            return False, None
+        result = await step(conn, *args)
+        await conn.commit()
+        return True, result
+    except BaseException:
+        await conn.rollback()
+        raise
+
+
+# ---------------------------------------------------------------------------
+# 1. Базовая схема (как её создавал init_db до появления миграций)
+
+async def _create_base_schema(conn: aiosqlite.Connection):
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS search_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            query_text TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Составной индекс покрывает и фильтр по пользователю, и сортировку;
+    # одиночный idx_user_id становится лишним и только замедляет вставки
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_ts_id
+        ON search_history(user_id, timestamp DESC, id DESC)
+    """)
+    await conn.execute("DROP INDEX IF EXISTS idx_user_id")
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS recommendation_cache (
+            query_key TEXT PRIMARY KEY,
+            payload TEXT NOT NULL,
+            created_at INTEGER NOT NULL
+        )
+    """)
+    # Телеметрия запросов к нейросети (задержки в миллисекундах)
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS ai_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at INTEGER NOT NULL,
+            user_id INTEGER,
+            model TEXT NOT NULL,
+            stream INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL,
+            queue_ms INTEGER NOT NULL,
+            ttfb_ms INTEGER,
+            generation_ms INTEGER,
+            total_ms INTEGER NOT NULL,
+            prompt_tokens INTEGER,
+            completion_tokens INTEGER,
+            cost REAL,
+            games INTEGER NOT NULL
+        )
+    """)
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ai_usage_created
+        ON ai_usage(created_at)
+    """)
+
+
+# ---------------------------------------------------------------------------
+# 2. search_history.timestamp (текст 'YYYY-MM-DD HH:MM:SS') -> created_at
+#    (секунды Unix): строка и индекс меньше, сравнение и сортировка - по целому
+
+async def _create_epoch_history(conn: aiosqlite.Connection):
+    await conn.execute("""
+        CREATE TABLE IF NOT EXISTS search_history_epoch (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            query_text TEXT NOT NULL,
+            created_at INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    """)
+
+
+async def _copy_history_to_epoch(conn: aiosqlite.Connection, limit: int) -> int:
+    """Перенос следующей пачки строк по возрастанию id (продолжается после перезапуска)"""
+    cursor = await conn.execute(
+        """INSERT INTO search_history_epoch (id, user_id, query_text, created_at)
+           SELECT id, user_id, query_text, COALESCE(CAST(strftime('%s', timestamp) AS INTEGER), 0)
+           FROM search_history
+           WHERE id > (SELECT COALESCE(MAX(id), 0) FROM search_history_epoch)
+           ORDER BY id
+           LIMIT ?""",
+        (limit,)
+    )
+    return cursor.rowcount
+
+
+async def _swap_epoch_history(conn: aiosqlite.Connection):
+    # Строки, добавленные после последней пачки
+    await _copy_history_to_epoch(conn, -1)
+    # Счётчик AUTOINCREMENT старой таблицы: id удалённых строк не должны повторяться
+    async with conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'search_history'") as cursor:
+        row = await cursor.fetchone()
+    await conn.execute("DROP TABLE search_history")
+    await conn.execute("ALTER TABLE search_history_epoch RENAME TO search_history")
+    if row is not None:
+        await conn.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'search_history'", (row[0],)
+        )
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_user_created_id
+        ON search_history(user_id, created_at DESC, id DESC)
+    """)
+
+
+# ---------------------------------------------------------------------------
+# 3. Индекс по времени: удаление по возрасту (HISTORY_MAX_AGE_DAYS) читает
+#    только старые строки, а не всю таблицу
+
+async def _create_history_created_index(conn: aiosqlite.Connection):
+    await conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_history_created
+        ON search_history(created_at)
+    """)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "базовая схема", _create_base_schema),
+    Migration(2, "время запросов в истории - секунды Unix", _swap_epoch_history,
+              prepare=_create_epoch_history, backfill=_copy_history_to_epoch),
+    Migration(3, "индекс истории по времени запроса", _create_history_created_index),
+]
+
+# Версия схемы, с которой работает код
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+async def _run(conn: aiosqlite.Connection, migration: Migration, batch_size: int,
+               batch_pause: float) -> bool:
+    """Применение одной миграции; False - её уже применил другой процесс"""
+    if migration.prepare is not None:
+        pending, _ = await _transaction(conn, migration.version, migration.prepare)
+        if not pending:
+            return False
+
+    if migration.backfill is not None:
+        moved = 0
+        while True:
+            pending, copied = await _transaction(conn, migration.version, migration.backfill, batch_size)
+            if not pending:
+                return False
+            moved += copied
+            if copied < batch_size:
+                break
+            logger.info(f"Миграция {migration.version}: перенесено строк {moved}")
+            # Между пачками другие процессы успевают записать свои изменения
+            await asyncio.sleep(batch_pause)
+
+    async def finish(conn: aiosqlite.Connection):
+        await migration.apply(conn)
+        # PRAGMA не поддерживает параметры; номер версии - целое из кода
+        await conn.execute(f"PRAGMA user_version = {int(migration.version)}")
+
+    pending, _ = await _transaction(conn, migration.version, finish)
+    return pending
+
+
+async def migrate(conn: aiosqlite.Connection, batch_size: int = 5000,
+                  batch_pause: float = 0.01) -> int:
+    """
+    Применение всех ещё не применённых миграций
+
+    Returns:
+        Версия схемы после миграций
+    """
+    version = await get_version(conn)
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Схема БД версии {version} новее, чем поддерживает код ({SCHEMA_VERSION}): "
+            f"обновите бота"
+        )
+    for migration in MIGRATIONS:
+        if migration.version <= version:
+            continue
+        if await _run(conn, migration, batch_size, batch_pause):
+            logger.info(f"Схема БД обновлена до версии {migration.version}: {migration.description}")
+        version = migration.version
+    return version
@@ -1,9 +1,9 @@
 """
 Модели данных для работы с базой данных
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Tuple
 
 
 @dataclass
@@ -18,9 +18,9 @@ class SearchQuery:
         return f"Query(user={self.user_id}, text='{self.query_text[:30]}...', time={self.timestamp})"
 
 
-@dataclass
+@dataclass(slots=True)
 class GameInfo:
-    """Модель информации об игре"""
+    """Модель информации об игре (со __slots__: объектов много, они живут в кэшах)"""
     name: str
     rating: Optional[float] = None
     released: Optional[str] = None
@@ -31,3 +31,19 @@ class GameInfo:
     
     def __str__(self):
         return f"Game(name='{self.name}', rating={self.rating})"
+
+
+@dataclass
+class HistoryPage:
+    """Страница истории запросов (строки от новых к старым)"""
+    items: List[Tuple[int, str, int]] = field(default_factory=list)  # (id, query_text, created_at)
+    has_newer: bool = False
+    has_older: bool = False
+    
+    @property
+    def newest_id(self) -> Optional[int]:
+        return self.items[0][0] if self.items else None
+    
+    @property
+    def oldest_id(self) -> Optional[int]:
+        return self.items[-1][0] if self.items else None
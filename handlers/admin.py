@@ -0,0 +1,112 @@
+"""
+Обработчик команды /stats (только для администраторов из ADMIN_IDS)
+"""
+from typing import Any, Dict, List, Optional
+
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message
+from services.ai_service import ai_service
+from utils.formatters import escape_html
+import config
+
+router = Router()
+router.message.filter(F.from_user.id.in_(set(config.ADMIN_IDS)))
+
+
+def _num(value: Optional[float]) -> str:
+    """Целое число или прочерк, если данных нет"""
+    return "—" if value is None else f"{value:.0f}"
+
+
+def format_model_stats(model: str, stats: Dict[str, Any]) -> str:
+    """Разбивка задержки и токенов одной модели (с момента запуска процесса)"""
+    statuses = ", ".join(f"{name} {count}" for name, count in sorted(stats["statuses"].items()))
+    text = (
+        f"<b>{escape_html(model)}</b>\n"
+        f"Запросов: {stats['calls']} ({statuses})\n"
+        f"p50/p95, мс: очередь {_num(stats['queue_p50_ms'])}/{_num(stats['queue_p95_ms'])}, "
+        f"первый байт {_num(stats['ttfb_p50_ms'])}/{_num(stats['ttfb_p95_ms'])}, "
+        f"генерация {_num(stats['generation_p50_ms'])}/{_num(stats['generation_p95_ms'])}, "
+        f"всего {_num(stats['total_p50_ms'])}/{_num(stats['total_p95_ms'])}\n"
+        f"Токены p50/p95: промпт {_num(stats['prompt_tokens_p50'])}/{_num(stats['prompt_tokens_p95'])}, "
+        f"ответ {_num(stats['completion_tokens_p50'])}/{_num(stats['completion_tokens_p95'])}\n"
+        f"Всего токенов: {stats['prompt_tokens']} + {stats['completion_tokens']}"
+    )
+    if stats["cost"]:
+        text += f", ${stats['cost']:.4f}"
+    return text + "\n"
+
+
+def format_usage_summary(rows: List[Dict[str, Any]]) -> str:
+    """Сводка из ai_usage (все процессы): средние значения по моделям"""
+    if not rows:
+        return "Записей нет\n"
+    text = ""
+    for row in rows:
+        text += (
+            f"<b>{escape_html(row['model'])}</b>: {row['calls']} запросов, успешных {row['ok'] or 0}\n"
+            f"среднее, мс: очередь {_num(row['queue_avg_ms'])}, первый байт {_num(row['ttfb_avg_ms'])}, "
+            f"генерация {_num(row['generation_avg_ms'])}, всего {_num(row['total_avg_ms'])}\n"
+            f"токены в среднем: {_num(row['prompt_tokens_avg'])} + {_num(row['completion_tokens_avg'])}, "
+            f"всего {row['prompt_tokens'] or 0} + {row['completion_tokens'] or 0}"
+        )
+        if row["cost"]:
+            text += f", ${row['cost']:.4f}"
+        text += "\n"
+    return text
+
+
+async def render_stats() -> str:
+    """Текст ответа на /stats"""
+    text = "📊 <b>Запросы к нейросети (этот процесс)</b>\n\n"
+    model_stats = ai_service.telemetry.stats()
+    if not model_stats:
+        text += "Запросов ещё не было\n"
+    for model, stats in model_stats.items():
+        text += format_model_stats(model, stats) + "\n"
+
+    if ai_service.telemetry.enabled:
+        text += "🗂 <b>За 24 часа (все процессы)</b>\n\n"
+        text += format_usage_summary(await ai_service.telemetry.summary(24)) + "\n"
+
+    scheduler = ai_service.scheduler.stats()
+    text += (
+        f"⏳ <b>Очередь:</b> выполняется {scheduler['active']}/{scheduler['max_concurrency']}, "
+        f"ждут {scheduler['queued']}, отклонено {scheduler['shed']}, "
+        f"ожидание p95 {scheduler['wait_p95_ms']:.0f} мс\n"
+    )
+    resilience = ai_service.resilience_stats()
+    breakers = ", ".join(
+        f"{escape_html(model)}: {state['state']}" for model, state in resilience["breakers"].items()
+    ) or "—"
+    text += f"🔁 <b>Повторы:</b> {resilience['retries']}, выключатели: {breakers}\n"
+    if ai_service.hedging:
+        hedge = ai_service.hedge.stats()
+        text += f"🏁 <b>Хеджирование:</b> отправлено {hedge['hedges_fired']}, выиграло {hedge['hedges_won']}\n"
+    if ai_service.similarity is not None:
+        similarity = ai_service.similarity.stats()
+        text += (
+            f"🧭 <b>Похожие запросы:</b> {similarity['size']}/{similarity['max_size']} в индексе "
+            f"({similarity['memory_mb']} МБ), ответов {similarity['hits']}, "
+            f"попаданий {similarity['hit_rate']:.0%}\n"
+        )
+    if ai_service.catalog is not None and ai_service.catalog.available:
+        text += (
+            f"📚 <b>Каталог ({ai_service.catalog_mode}):</b> {ai_service.catalog.size} игр, "
+            f"ответов без нейросети {ai_service.catalog_answers}, "
+            f"проверено игр {ai_service.catalog_enriched}\n"
+        )
+    if ai_service.cache is not None:
+        cache = ai_service.cache.stats()
+        text += (
+            f"💾 <b>Кэш:</b> {cache['size']}/{cache['max_size']} в памяти, "
+            f"попаданий {cache['hit_rate']:.0%}, из БД {cache['db_hits']}\n"
+        )
+    return text
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message):
+    """Обработка команды /stats"""
+    await message.answer(text=await render_stats(), parse_mode="HTML")
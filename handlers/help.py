@@ -5,6 +5,7 @@ from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from keyboards.inline import get_back_keyboard
+from utils.views import HELP_TEXT
 
 router = Router()
 
@@ -12,41 +13,8 @@ router = Router()
 @router.message(Command("help"))
 async def cmd_help(message: Message):
     """Обработка команды /help"""
-    help_text = """
-❓ <b>Подробная справка по использованию бота</b>
-
-<b>🔍 Поиск игр (/search)</b>
-Опишите игру, которую вы ищете. Например:
-• "Хочу RPG с открытым миром и красивой графикой"
-• "Стратегия про космос с элементами выживания"
-• "Шутер от первого лица с кооперативом"
-• "Игра как Skyrim, но про самураев"
-
-Бот проанализирует ваш запрос и подберет 3-5 подходящих игр.
-
-<b>📚 История запросов (/history)</b>
-Просмотр всех ваших предыдущих запросов. Вы можете очистить историю в любой момент.
-
-<b>ℹ️ О проекте (/info)</b>
-Информация о технологиях, использованных в боте, и авторах проекта.
-
-<b>💡 Советы для лучших результатов:</b>
-• Описывайте игру подробно (жанр, геймплей, атмосфера)
-• Можно упоминать похожие игры
-• Указывайте предпочтения по платформе
-• Пишите на русском или английском языке
-
-<b>⚙️ Как это работает:</b>
-1. Вы отправляете описание
-2. Нейросеть анализирует ваш запрос
-3. Бот ищет подходящие игры в базе RAWG
-4. Вы получаете список с подробной информацией
-
-Если у вас возникли проблемы, попробуйте переформулировать запрос или сделать его более конкретным.
-"""
-    
     await message.answer(
-        text=help_text,
+        text=HELP_TEXT,
         reply_markup=get_back_keyboard(),
         parse_mode="HTML"
     )
@@ -55,41 +23,8 @@ async def cmd_help(message: Message):
 @router.callback_query(F.data == "help")
 async def callback_help(callback: CallbackQuery):
     """Обработка callback для помощи"""
-    help_text = """
-❓ <b>Подробная справка по использованию бота</b>
-
-<b>🔍 Поиск игр (/search)</b>
-Опишите игру, которую вы ищете. Например:
-• "Хочу RPG с открытым миром и красивой графикой"
-• "Стратегия про космос с элементами выживания"
-• "Шутер от первого лица с кооперативом"
-• "Игра как Skyrim, но про самураев"
-
-Бот проанализирует ваш запрос и подберет 3-5 подходящих игр.
-
-<b>📚 История запросов (/history)</b>
-Просмотр всех ваших предыдущих запросов. Вы можете очистить историю в любой момент.
-
-<b>ℹ️ О проекте (/info)</b>
-Информация о технологиях, использованных в боте, и авторах проекта.
-
-<b>💡 Советы для лучших результатов:</b>
-• Описывайте игру подробно (жанр, геймплей, атмосфера)
-• Можно упоминать похожие игры
-• Указывайте предпочтения по платформе
-• Пишите на русском или английском языке
-
-<b>⚙️ Как это работает:</b>
-1. Вы отправляете описание
-2. Нейросеть анализирует ваш запрос
-3. Бот ищет подходящие игры в базе RAWG
-4. Вы получаете список с подробной информацией
-
-Если у вас возникли проблемы, попробуйте переформулировать запрос или сделать его более конкретным.
-"""
-    
     await callback.message.edit_text(
-        text=help_text,
+        text=HELP_TEXT,
         reply_markup=get_back_keyboard(),
         parse_mode="HTML"
     )
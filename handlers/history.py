@@ -1,30 +1,51 @@
 """
 Обработчик команды /history
 """
+from typing import Optional, Tuple
+
 from aiogram import Router, F
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery
-from keyboards.inline import get_history_keyboard, get_confirm_clear_keyboard, get_back_keyboard
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
+from keyboards.inline import (
+    HISTORY_PAGE_PREFIX, get_history_keyboard, get_confirm_clear_keyboard, get_back_keyboard
+)
 from database.db import db
 from utils.formatters import format_history
+from utils.views import CONFIRM_CLEAR_TEXT, HISTORY_CLEARED_TEXT
+import config
 
 router = Router()
 
 
-@router.message(Command("history"))
-async def cmd_history(message: Message):
-    """Обработка команды /history"""
-    user_id = message.from_user.id
+async def render_history_page(user_id: int, before_id: Optional[int] = None,
+                              after_id: Optional[int] = None,
+                              start: int = 1) -> Tuple[str, InlineKeyboardMarkup]:
+    """Текст и клавиатура для страницы истории пользователя"""
+    page_size = config.HISTORY_PAGE_SIZE
+    page = await db.get_user_history_page(user_id, page_size, before_id=before_id, after_id=after_id)
+    
+    if not page.items and (before_id is not None or after_id is not None):
+        # Строка-курсор удалена (история очищена) - показываем первую страницу
+        page = await db.get_user_history_page(user_id, page_size)
+        start = 1
     
-    # Получение истории из базы данных
-    history_items = await db.get_user_history(user_id, limit=15)
-    history_text = format_history(history_items)
+    history_text = format_history([(query, ts) for _, query, ts in page.items], start=start)
     
     # Показываем кнопки только если есть история
-    if history_items:
-        keyboard = get_history_keyboard()
+    if page.items:
+        keyboard = get_history_keyboard(page, start=start, page_size=page_size)
     else:
         keyboard = get_back_keyboard()
+    return history_text, keyboard
+
+
+@router.message(Command("history"))
+async def cmd_history(message: Message):
+    """Обработка команды /history"""
+    user_id = message.from_user.id
+    
+    # Получение первой страницы истории из базы данных
+    history_text, keyboard = await render_history_page(user_id)
     
     await message.answer(
         text=history_text,
@@ -38,15 +59,34 @@ async def callback_history(callback: CallbackQuery):
     """Обработка callback для истории"""
     user_id = callback.from_user.id
     
-    # Получение истории из базы данных
-    history_items = await db.get_user_history(user_id, limit=15)
-    history_text = format_history(history_items)
+    # Получение первой страницы истории из базы данных
+    history_text, keyboard = await render_history_page(user_id)
     
-    # Показываем кнопки только если есть история
-    if history_items:
-        keyboard = get_history_keyboard()
+    await callback.message.edit_text(
+        text=history_text,
+        reply_markup=keyboard,
+        parse_mode="HTML"
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith(f"{HISTORY_PAGE_PREFIX}:"))
+async def callback_history_page(callback: CallbackQuery):
+    """Переход на соседнюю страницу истории"""
+    user_id = callback.from_user.id
+    
+    try:
+        _, direction, cursor_id, start = callback.data.split(":")
+        cursor_id, start = int(cursor_id), int(start)
+    except ValueError:
+        direction, cursor_id, start = "", None, 1
+    
+    if direction == "older":
+        history_text, keyboard = await render_history_page(user_id, before_id=cursor_id, start=start)
+    elif direction == "newer":
+        history_text, keyboard = await render_history_page(user_id, after_id=cursor_id, start=start)
     else:
-        keyboard = get_back_keyboard()
+        history_text, keyboard = await render_history_page(user_id)
     
     await callback.message.edit_text(
         text=history_text,
@@ -59,15 +99,8 @@ async def callback_history(callback: CallbackQuery):
 @router.callback_query(F.data == "clear_history")
 async def callback_clear_history(callback: CallbackQuery):
     """Запрос подтверждения очистки истории"""
-    confirm_text = """
-⚠️ <b>Подтверждение действия</b>
-
-Вы уверены, что хотите очистить всю историю запросов?
-Это действие нельзя отменить.
-"""
-    
     await callback.message.edit_text(
-        text=confirm_text,
+        text=CONFIRM_CLEAR_TEXT,
         reply_markup=get_confirm_clear_keyboard(),
         parse_mode="HTML"
     )
@@ -82,14 +115,8 @@ async def callback_confirm_clear(callback: CallbackQuery):
     # Очистка истории
     await db.clear_user_history(user_id)
     
-    success_text = """
-✅ <b>История успешно очищена!</b>
-
-Ваша история запросов была полностью удалена.
-"""
-    
     await callback.message.edit_text(
-        text=success_text,
+        text=HISTORY_CLEARED_TEXT,
         reply_markup=get_back_keyboard(),
         parse_mode="HTML"
     )
@@ -5,6 +5,7 @@ from aiogram import Router, F
 from aiogram.filters import Command
 from aiogram.types import Message, CallbackQuery
 from keyboards.inline import get_back_keyboard
+from utils.views import INFO_TEXT
 
 router = Router()
 
@@ -12,44 +13,8 @@ router = Router()
 @router.message(Command("info"))
 async def cmd_info(message: Message):
     """Обработка команды /info"""
-    info_text = """
-ℹ️ <b>Информация о проекте</b>
-
-<b>🎮 О боте:</b>
-Telegram-бот для поиска видеоигр по описанию с использованием искусственного интеллекта.
-
-<b>🛠 Технологический стек:</b>
-• <b>Python 3.10+</b> - язык программирования
-• <b>aiogram 3.x</b> - асинхронный фреймворк для Telegram Bot API
-• <b>OpenRouter API</b> - доступ к LLM моделям (DeepSeek)
-• <b>RAWG API</b> - крупнейшая база данных видеоигр
-• <b>SQLite3</b> - локальная база данных для истории
-• <b>aiohttp</b> - асинхронные HTTP-запросы
-
-<b>⚡ Возможности:</b>
-✅ Интеллектуальный поиск игр по описанию
-✅ Подробная информация о каждой игре
-✅ История поиска для каждого пользователя
-✅ Поддержка русского и английского языков
-✅ Интуитивный интерфейс с inline-кнопками
-
-<b>👨‍💻 Авторы:</b>
-• [Укажите имена и группу самостоятельно]
-
-<b>📅 Дата создания:</b>
-Ноябрь 2025
-
-<b>🔗 Полезные ссылки:</b>
-• Исходный код: [Добавьте ссылку на GitHub]
-• Документация RAWG: https://rawg.io/apidocs
-• OpenRouter: https://openrouter.ai/
-
-<b>📧 Обратная связь:</b>
-По всем вопросам и предложениям обращайтесь: [Ваш контакт]
-"""
-    
     await message.answer(
-        text=info_text,
+        text=INFO_TEXT,
         reply_markup=get_back_keyboard(),
         parse_mode="HTML",
         disable_web_page_preview=True
@@ -59,44 +24,8 @@ Telegram-бот для поиска видеоигр по описанию с и
 @router.callback_query(F.data == "info")
 async def callback_info(callback: CallbackQuery):
     """Обработка callback для информации"""
-    info_text = """
-ℹ️ <b>Информация о проекте</b>
-
-<b>🎮 О боте:</b>
-Telegram-бот для поиска видеоигр по описанию с использованием искусственного интеллекта.
-
-<b>🛠 Технологический стек:</b>
-• <b>Python 3.10+</b> - язык программирования
-• <b>aiogram 3.x</b> - асинхронный фреймворк для Telegram Bot API
-• <b>OpenRouter API</b> - доступ к LLM моделям (DeepSeek)
-• <b>RAWG API</b> - крупнейшая база данных видеоигр
-• <b>SQLite3</b> - локальная база данных для истории
-• <b>aiohttp</b> - асинхронные HTTP-запросы
-
-<b>⚡ Возможности:</b>
-✅ Интеллектуальный поиск игр по описанию
-✅ Подробная информация о каждой игре
-✅ История поиска для каждого пользователя
-✅ Поддержка русского и английского языков
-✅ Интуитивный интерфейс с inline-кнопками
-
-<b>👨‍💻 Авторы:</b>
-• [Укажите имена и группу самостоятельно]
-
-<b>📅 Дата создания:</b>
-Ноябрь 2025
-
-<b>🔗 Полезные ссылки:</b>
-• Исходный код: [Добавьте ссылку на GitHub]
-• Документация RAWG: https://rawg.io/apidocs
-• OpenRouter: https://openrouter.ai/
-
-<b>📧 Обратная связь:</b>
-По всем вопросам и предложениям обращайтесь: [Ваш контакт]
-"""
-    
     await callback.message.edit_text(
-        text=info_text,
+        text=INFO_TEXT,
         reply_markup=get_back_keyboard(),
         parse_mode="HTML",
         disable_web_page_preview=True
@@ -1,14 +1,22 @@
 """
 Обработчик команды /search - основная функциональность бота
 """
+import time
+from typing import List
+
 from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
 from aiogram.filters import Command, StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
 from keyboards.inline import get_back_keyboard
+from utils.views import NO_RECOMMENDATIONS_TEXT, SEARCH_PROMPT_TEXT, render_recommendations
 from database.db import db
+from database.models import GameInfo
 from services.ai_service import ai_service
+from services.scheduler import PositionCallback, SchedulerOverloaded
+import config
 
 router = Router()
 
@@ -18,26 +26,73 @@ class SearchStates(StatesGroup):
     waiting_for_query = State()
 
 
-@router.message(Command("search"))
-async def cmd_search(message: Message, state: FSMContext):
-    """Обработка команды /search"""
-    search_prompt = """
-🔍 <b>Поиск игр по описанию</b>
-
-Опишите игру, которую вы ищете. Будьте максимально конкретны!
+def queue_position_reporter(processing_msg: Message) -> PositionCallback:
+    """
+    Колбэк, показывающий позицию запроса в очереди к нейросети.
+    
+    Сообщение обновляется не чаще раза в STREAM_EDIT_INTERVAL секунд:
+    при большой очереди позиция меняется слишком часто.
+    """
+    last_edit = 0.0
+    
+    async def report(position: int):
+        nonlocal last_edit
+        now = time.monotonic()
+        if now - last_edit < config.STREAM_EDIT_INTERVAL:
+            return
+        last_edit = now
+        try:
+            await processing_msg.edit_text(
+                f"⏳ Много запросов - ваш в очереди {position}-й. Подождите немного."
+            )
+        except TelegramRetryAfter as e:
+            last_edit = now + e.retry_after
+        except TelegramBadRequest:
+            pass
+    
+    return report
 
-<b>Примеры хороших запросов:</b>
-• "Ищу RPG с открытым миром, драконами и магией"
-• "Хочу шутер от первого лица про вторую мировую войну"
-• "Нужна стратегия про космос с элементами строительства базы"
-• "Игра как The Witcher, но про самураев в Японии"
 
-Просто отправьте сообщение с вашим описанием!
-Для отмены введите /cancel
-"""
+async def stream_recommendations(processing_msg: Message, user_query: str,
+                                 user_id: int = None) -> List[GameInfo]:
+    """
+    Получение рекомендаций в потоковом режиме с постепенным обновлением сообщения.
+    
+    Сообщение редактируется не чаще раза в STREAM_EDIT_INTERVAL секунд, чтобы
+    не упираться в ограничения Telegram на частоту редактирования.
+    """
+    games_info: List[GameInfo] = []
+    # Первую игру показываем сразу, дальше - с ограничением частоты
+    last_edit = 0.0
+    
+    async for game in ai_service.stream_game_recommendations(
+        user_query, user_id=user_id, on_queue_position=queue_position_reporter(processing_msg)
+    ):
+        games_info.append(game)
+        now = time.monotonic()
+        if now - last_edit < config.STREAM_EDIT_INTERVAL:
+            continue
+        last_edit = now
+        try:
+            # Длинный ответ разобьётся на сообщения в конце, пока показываем начало
+            await processing_msg.edit_text(
+                text=render_recommendations(games_info, pending=True)[0],
+                parse_mode="HTML"
+            )
+        except TelegramRetryAfter as e:
+            # Превышен лимит редактирований - откладываем следующее обновление
+            last_edit = now + e.retry_after
+        except TelegramBadRequest:
+            pass
     
+    return games_info
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, state: FSMContext):
+    """Обработка команды /search"""
     await message.answer(
-        text=search_prompt,
+        text=SEARCH_PROMPT_TEXT,
         parse_mode="HTML"
     )
     
@@ -47,23 +102,8 @@ async def cmd_search(message: Message, state: FSMContext):
 @router.callback_query(F.data == "search")
 async def callback_search(callback: CallbackQuery, state: FSMContext):
     """Обработка callback для поиска"""
-    search_prompt = """
-🔍 <b>Поиск игр по описанию</b>
-
-Опишите игру, которую вы ищете. Будьте максимально конкретны!
-
-<b>Примеры хороших запросов:</b>
-• "Ищу RPG с открытым миром, драконами и магией"
-• "Хочу шутер от первого лица про вторую мировую войну"
-• "Нужна стратегия про космос с элементами строительства базы"
-• "Игра как The Witcher, но про самураев в Японии"
-
-Просто отправьте сообщение с вашим описанием!
-Для отмены введите /cancel
-"""
-    
     await callback.message.edit_text(
-        text=search_prompt,
+        text=SEARCH_PROMPT_TEXT,
         parse_mode="HTML"
     )
     
@@ -87,7 +127,8 @@ async def cmd_cancel(message: Message, state: FSMContext):
     )
 
 
-@router.message(SearchStates.waiting_for_query)
+# Команды (в том числе недоступные пользователю, например /stats) запросом не считаются
+@router.message(SearchStates.waiting_for_query, F.text, ~F.text.startswith("/"))
 async def process_search_query(message: Message, state: FSMContext):
     """Обработка запроса пользователя"""
     user_query = message.text.strip()
@@ -111,55 +152,47 @@ async def process_search_query(message: Message, state: FSMContext):
     
     try:
         # Получение детальных рекомендаций от AI
-        games_info = await ai_service.get_game_recommendations_with_details(user_query)
+        if config.AI_STREAMING:
+            games_info = await stream_recommendations(processing_msg, user_query, user_id)
+        else:
+            games_info = await ai_service.get_game_recommendations_with_details(
+                user_query, user_id=user_id, on_queue_position=queue_position_reporter(processing_msg)
+            )
         
         if not games_info:
             await processing_msg.edit_text(
-                "😔 Не удалось получить рекомендации.\n\n"
-                "Возможные причины:\n"
-                "• Неправильный API ключ OpenRouter\n"
-                "• Недостаточно кредитов на балансе\n"
-                "• Проблемы с подключением\n\n"
-                "Проверьте настройки и попробуйте позже.",
+                NO_RECOMMENDATIONS_TEXT,
                 reply_markup=get_back_keyboard()
             )
             await state.clear()
             return
         
-        # Форматирование результатов
-        result_text = "🎮 <b>Рекомендации для вас:</b>\n\n"
+        # Форматирование результатов (больше одного сообщения - если не влезли в лимит Telegram)
+        pages = render_recommendations(games_info)
         
-        for i, game in enumerate(games_info, 1):
-            result_text += f"<b>{i}. {game.get('name', 'Неизвестно')}</b>\n"
-            
-            if game.get('rating'):
-                stars = "⭐" * int(float(game['rating']))
-                result_text += f"🎮 Рейтинг: {game['rating']}/5 {stars}\n"
-            
-            if game.get('released'):
-                result_text += f"📅 Год выпуска: {game['released']}\n"
-            
-            if game.get('genres'):
-                result_text += f"🎯 Жанры: {game['genres']}\n"
-            
-            if game.get('platforms'):
-                result_text += f"💻 Платформы: {game['platforms']}\n"
-            
-            if game.get('description'):
-                result_text += f"\n📝 <i>{game['description']}</i>\n"
-            
-            result_text += "\n" + "─" * 30 + "\n\n"
-        
-        # Отправка результатов
+        # Отправка результатов: первое сообщение заменяет «Анализирую...»,
+        # кнопка «Назад» - под последним
         await processing_msg.edit_text(
-            text=result_text,
+            text=pages[0],
             parse_mode="HTML",
-            reply_markup=get_back_keyboard()
+            reply_markup=get_back_keyboard() if len(pages) == 1 else None
         )
+        for number, page in enumerate(pages[1:], 2):
+            await message.answer(
+                text=page,
+                parse_mode="HTML",
+                reply_markup=get_back_keyboard() if number == len(pages) else None
+            )
         
         # Сохранение в историю
         await db.add_search_query(user_id, user_query)
         
+    except SchedulerOverloaded as e:
+        if e.reason == "user":
+            text = "⏳ Ваш предыдущий запрос ещё обрабатывается. Дождитесь ответа и попробуйте снова."
+        else:
+            text = "🚦 Сейчас слишком много запросов. Пожалуйста, попробуйте через минуту."
+        await processing_msg.edit_text(text, reply_markup=get_back_keyboard())
     except Exception as e:
         print(f"❌ Ошибка при обработке запроса: {e}")
         await processing_msg.edit_text(
@@ -5,6 +5,7 @@ from aiogram import Router, F
 from aiogram.filters import CommandStart
 from aiogram.types import Message, CallbackQuery
 from keyboards.inline import get_main_menu_keyboard
+from utils.views import MAIN_MENU_TEXT, WELCOME_TEXT
 
 router = Router()
 
@@ -12,23 +13,8 @@ router = Router()
 @router.message(CommandStart())
 async def cmd_start(message: Message):
     """Обработка команды /start"""
-    welcome_text = """
-👋 <b>Добро пожаловать в бота для поиска игр!</b>
-
-Я помогу вам найти идеальную игру по вашему описанию! 
-Просто опишите, что вы хотите, и я подберу 3-5 подходящих игр.
-
-<b>Доступные команды:</b>
-🔍 /search - поиск игр по описанию
-📚 /history - история ваших запросов
-❓ /help - подробная справка
-ℹ️ /info - информация о проекте
-
-Используйте кнопки ниже для быстрого доступа:
-"""
-    
     await message.answer(
-        text=welcome_text,
+        text=WELCOME_TEXT,
         reply_markup=get_main_menu_keyboard(),
         parse_mode="HTML"
     )
@@ -37,14 +23,8 @@ async def cmd_start(message: Message):
 @router.callback_query(F.data == "back_to_menu")
 async def back_to_menu(callback: CallbackQuery):
     """Возврат в главное меню"""
-    welcome_text = """
-👋 <b>Главное меню</b>
-
-Выберите действие из списка ниже:
-"""
-    
     await callback.message.edit_text(
-        text=welcome_text,
+        text=MAIN_MENU_TEXT,
         reply_markup=get_main_menu_keyboard(),
         parse_mode="HTML"
     )
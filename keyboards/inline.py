@@ -1,43 +1,79 @@
 """
 Inline клавиатуры для бота
 """
+from typing import Optional
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from database.models import HistoryPage
+
+# Префикс callback_data для навигации по страницам истории:
+# history_page:<older|newer>:<id строки-курсора>:<номер первой строки страницы>
+HISTORY_PAGE_PREFIX = "history_page"
+
+
+# Неизменяемые клавиатуры собираются один раз при импорте: объекты aiogram
+# заморожены, поэтому один экземпляр можно отправлять во всех ответах
+BACK_TO_MENU_BUTTON = InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_menu")
+CLEAR_HISTORY_BUTTON = InlineKeyboardButton(text="🗑️ Очистить историю", callback_data="clear_history")
+
+MAIN_MENU_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🔍 Поиск игр", callback_data="search")],
+    [InlineKeyboardButton(text="📚 История запросов", callback_data="history")],
+    [InlineKeyboardButton(text="❓ Помощь", callback_data="help")],
+    [InlineKeyboardButton(text="ℹ️ О проекте", callback_data="info")]
+])
+
+BACK_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[[BACK_TO_MENU_BUTTON]])
+
+CONFIRM_CLEAR_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[
+    [
+        InlineKeyboardButton(text="✅ Да, очистить", callback_data="confirm_clear"),
+        InlineKeyboardButton(text="❌ Отмена", callback_data="history")
+    ]
+])
+
+# Клавиатура истории без кнопок навигации (история в одну страницу)
+HISTORY_KEYBOARD = InlineKeyboardMarkup(inline_keyboard=[[CLEAR_HISTORY_BUTTON], [BACK_TO_MENU_BUTTON]])
 
 
 def get_main_menu_keyboard() -> InlineKeyboardMarkup:
     """Главное меню с основными командами"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🔍 Поиск игр", callback_data="search")],
-        [InlineKeyboardButton(text="📚 История запросов", callback_data="history")],
-        [InlineKeyboardButton(text="❓ Помощь", callback_data="help")],
-        [InlineKeyboardButton(text="ℹ️ О проекте", callback_data="info")]
-    ])
-    return keyboard
+    return MAIN_MENU_KEYBOARD
 
 
-def get_history_keyboard() -> InlineKeyboardMarkup:
-    """Клавиатура для управления историей"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="🗑️ Очистить историю", callback_data="clear_history")],
-        [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_menu")]
-    ])
-    return keyboard
+def get_history_keyboard(page: Optional[HistoryPage] = None, start: int = 1,
+                         page_size: int = 0) -> InlineKeyboardMarkup:
+    """
+    Клавиатура для управления историей
+    
+    Args:
+        page: Текущая страница истории (для кнопок навигации)
+        start: Номер первой строки текущей страницы
+        page_size: Размер страницы
+    """
+    if page is None or not (page.has_newer or page.has_older):
+        return HISTORY_KEYBOARD
+    
+    navigation = []
+    if page.has_newer:
+        newer_start = max(1, start - page_size)
+        navigation.append(InlineKeyboardButton(
+            text="◀️ Новее",
+            callback_data=f"{HISTORY_PAGE_PREFIX}:newer:{page.newest_id}:{newer_start}"
+        ))
+    if page.has_older:
+        navigation.append(InlineKeyboardButton(
+            text="Старше ▶️",
+            callback_data=f"{HISTORY_PAGE_PREFIX}:older:{page.oldest_id}:{start + len(page.items)}"
+        ))
+    return InlineKeyboardMarkup(inline_keyboard=[navigation, [CLEAR_HISTORY_BUTTON], [BACK_TO_MENU_BUTTON]])
 
 
 def get_back_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура с кнопкой назад"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="⬅️ Назад в меню", callback_data="back_to_menu")]
-    ])
-    return keyboard
+    return BACK_KEYBOARD
 
 
 def get_confirm_clear_keyboard() -> InlineKeyboardMarkup:
     """Клавиатура подтверждения очистки истории"""
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(text="✅ Да, очистить", callback_data="confirm_clear"),
-            InlineKeyboardButton(text="❌ Отмена", callback_data="history")
-        ]
-    ])
-    return keyboard
+    return CONFIRM_CLEAR_KEYBOARD
@@ -0,0 +1,3 @@
+"""
+Пакет с middleware бота
+"""
@@ -0,0 +1,54 @@
+"""
+Метрики обработчиков: гистограмма задержек и счётчик ошибок по обработчику
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from services.metrics import HistogramSeries, handler_errors, handler_seconds
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Inner-middleware сообщений и callback-запросов.
+
+    Вызывается после фильтров, когда обработчик уже выбран, поэтому
+    время записывается в ряд конкретного обработчика (метка handler -
+    «модуль.функция», например search.process_search_query). Регистрация
+    на Dispatcher действует и на все подключённые к нему роутеры.
+    """
+
+    def __init__(self):
+        # Ряд гистограммы по функции-обработчику: имя строится один раз
+        self._series: Dict[Callable, HistogramSeries] = {}
+
+    @staticmethod
+    def handler_name(callback: Callable) -> str:
+        module = getattr(callback, "__module__", "") or ""
+        return f"{module.rsplit('.', 1)[-1]}.{getattr(callback, '__name__', type(callback).__name__)}"
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        if handler_object is None:
+            return await handler(event, data)
+
+        callback = handler_object.callback
+        series = self._series.get(callback)
+        if series is None:
+            series = self._series[callback] = handler_seconds.labels(self.handler_name(callback))
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            handler_errors.inc(self.handler_name(callback), type(e).__name__)
+            raise
+        finally:
+            series.observe(time.perf_counter() - started)
@@ -0,0 +1,176 @@
+"""
+Ограничение частоты запросов пользователей (token bucket)
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from aiogram import BaseMiddleware
+from aiogram.types import CallbackQuery, Message, TelegramObject
+
+import config
+from handlers.search import SearchStates
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    """Состояние корзины: токены на момент updated и флаг отправленного предупреждения"""
+    
+    __slots__ = ("tokens", "updated", "warned")
+    
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+        self.warned = False
+
+
+class TokenBuckets:
+    """
+    Набор корзин токенов по ключам (пользователям).
+    
+    Корзина пополняется со скоростью rate токенов в секунду до capacity.
+    Корзина, простоявшая дольше времени полного пополнения, ничем не
+    отличается от новой, поэтому удаляется: в памяти остаются только
+    недавно активные пользователи (и не больше max_keys).
+    """
+    
+    def __init__(self, rate: float, capacity: float, max_keys: int = None):
+        """
+        Args:
+            rate: Скорость пополнения, токенов в секунду
+            capacity: Размер корзины (допустимый всплеск)
+            max_keys: Максимальное количество хранимых корзин
+        """
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.max_keys = max_keys or config.THROTTLE_MAX_USERS
+        self.idle_after = self.capacity / rate if rate > 0 else float("inf")
+        self._buckets: "OrderedDict[Hashable, _Bucket]" = OrderedDict()
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+    
+    def consume(self, key: Hashable, now: Optional[float] = None) -> float:
+        """
+        Списание токена
+        
+        Returns:
+            0 - запрос разрешён, иначе через сколько секунд появится токен
+        """
+        now = time.monotonic() if now is None else now
+        self._evict_idle(now)
+        
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = _Bucket(self.capacity, now)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.capacity, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        
+        if bucket.tokens >= 1:
+            bucket.tokens -= 1
+            bucket.warned = False
+            return 0.0
+        return (1 - bucket.tokens) / self.rate if self.rate > 0 else float("inf")
+    
+    def refund(self, key: Hashable):
+        """Возврат токена (запрос отклонён на другом уровне)"""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.tokens = min(self.capacity, bucket.tokens + 1)
+    
+    def should_warn(self, key: Hashable) -> bool:
+        """Первое отклонение подряд - предупреждаем, последующие молча игнорируем"""
+        bucket = self._buckets.get(key)
+        if bucket is None or bucket.warned:
+            return False
+        bucket.warned = True
+        return True
+    
+    def _evict_idle(self, now: float):
+        # Корзины упорядочены по последнему обращению: старые - в начале
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated < self.idle_after and len(self._buckets) < self.max_keys:
+                break
+            del self._buckets[key]
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Outer-middleware сообщений и callback-запросов.
+    
+    Дорогие действия (текст поискового запроса - запрос к нейросети) и
+    дешёвые (команды, кнопки меню) ограничиваются отдельными корзинами:
+    на пользователя и общей на бота. Отклонённое событие не доходит до
+    обработчика; пользователь получает одно короткое предупреждение на
+    серию отклонений.
+    """
+    
+    def __init__(self):
+        self.search_user = TokenBuckets(config.THROTTLE_SEARCH_USER_RATE, config.THROTTLE_SEARCH_USER_BURST)
+        self.search_global = TokenBuckets(config.THROTTLE_SEARCH_GLOBAL_RATE, config.THROTTLE_SEARCH_GLOBAL_BURST)
+        self.cheap_user = TokenBuckets(config.THROTTLE_CHEAP_USER_RATE, config.THROTTLE_CHEAP_USER_BURST)
+        self.cheap_global = TokenBuckets(config.THROTTLE_CHEAP_GLOBAL_RATE, config.THROTTLE_CHEAP_GLOBAL_BURST)
+        self.throttled = 0
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+        
+        # Состояние FSM уже загружено update-middleware Dispatcher; команды
+        # (/cancel, /search) в состоянии ожидания запроса к нейросети не обращаются
+        expensive = (
+            isinstance(event, Message)
+            and data.get("raw_state") == SearchStates.waiting_for_query.state
+            and not (event.text or "").startswith("/")
+        )
+        per_user, shared = (
+            (self.search_user, self.search_global) if expensive else (self.cheap_user, self.cheap_global)
+        )
+        
+        retry_after = per_user.consume(user.id)
+        if retry_after:
+            reason = "user"
+        else:
+            retry_after = shared.consume(None)
+            reason = "global"
+            if retry_after:
+                per_user.refund(user.id)
+        
+        if not retry_after:
+            return await handler(event, data)
+        
+        self.throttled += 1
+        if per_user.should_warn(user.id):
+            await self._warn(event, reason, retry_after, expensive)
+        elif isinstance(event, CallbackQuery):
+            # Callback нужно подтвердить, иначе кнопка «зависнет» у пользователя
+            await event.answer()
+        return None
+    
+    @staticmethod
+    async def _warn(event: TelegramObject, reason: str, retry_after: float, expensive: bool):
+        """Единственный дешёвый ответ на серию отклонённых событий"""
+        if reason == "global":
+            text = "🚦 Бот сейчас сильно загружен. Попробуйте чуть позже."
+        elif expensive:
+            text = f"⏳ Слишком много поисковых запросов. Следующий можно отправить через {int(retry_after) + 1} с."
+        else:
+            text = "⏳ Слишком часто! Подождите немного."
+        try:
+            if isinstance(event, CallbackQuery):
+                await event.answer(text)
+            elif isinstance(event, Message):
+                await event.answer(text)
+        except Exception as e:
+            logger.debug(f"Не удалось отправить предупреждение об ограничении: {e}")
@@ -1,36 +1,38 @@
 """
-"""Сервис для работы с OpenRouter API"""
+Сервис для работы с OpenRouter API
+"""
 import aiohttp
+import asyncio
+import functools
 import json
 import logging
-import re
-from typing import List, Optional, Dict, Any
+import ssl
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Dict, Any, Union
 import config
+from database.catalog import GameCatalog, catalog, enrich_game, name_key
+from database.db import db
+from database.models import GameInfo
+from services.cache import RecommendationCache
+from services.hedging import HedgePolicy
+from services.metrics import ai_request_errors, ai_request_seconds, metrics, timed, timed_stream
+from services.resilience import CircuitBreaker, CircuitOpen, RetryPolicy, UpstreamError, parse_retry_after
+from services.parsing import COMPACT_FIELDS, IncrementalJSONArrayParser, decode_games, game_from_raw
+from services.scheduler import FairScheduler, PositionCallback
+from services.similarity import SimilarityIndex, create_similarity_index
+from services.telemetry import ModelCall, Telemetry, telemetry
+from utils.text import normalize_query
 
 logger = logging.getLogger(__name__)
 
 
-class AIService:
-    """Класс для работы с OpenRouter API"""
-    
-    def __init__(self):
-        self.api_url = config.OPENROUTER_API_URL
-        self.api_key = config.OPENROUTER_API_KEY
-        self.model = config.OPENROUTER_MODEL
-    
-    async def get_game_recommendations_with_details(self, user_query: str) -> Optional[List[Dict[str, Any]]]:
-        """
-        Получение подробных рекомендаций игр от нейросети
-        
-        Args:
-            user_query: Описание игры от пользователя
-            
-        Returns:
-            Список словарей с информацией об играх или None в случае ошибки
-        """
-        
-        # Формирование промпта для нейросети
-        system_prompt = """Ты - эксперт по видеоиграм. Твоя задача - рекомендовать игры и предоставить детальную информацию о них на русском языке.
+class FlightAborted(Exception):
+    """Общий запрос прерван до получения ответа (ожидающие должны повторить его сами)"""
+
+
+# Системный промпт для нейросети
+SYSTEM_PROMPT = """Ты - эксперт по видеоиграм. Твоя задача - рекомендовать игры и предоставить детальную информацию о них на русском языке.
 
 ВАЖНО:
 1. Порекомендуй от 3 до 5 подходящих игр
@@ -51,71 +53,793 @@ class AIService:
   }
 ]"""
 
-        user_prompt = f"""Пользователь описывает игру, которую он ищет:
+
+# Компактный промпт: каждая игра - позиционный массив без повторяющихся ключей
+COMPACT_SYSTEM_PROMPT = """Ты - эксперт по видеоиграм. Рекомендуй игры на русском языке.
+
+Ответ - только JSON массив из 3-5 игр без пояснений. Каждая игра - массив:
+[название, жанры, платформы, год, рейтинг, описание]
+Название на английском, остальное на русском. Рейтинг - число из 5, описание - 1-2 предложения.
+
+Пример:
+[["The Witcher 3: Wild Hunt","RPG, Открытый мир","PC, PlayStation, Xbox","2015",4.8,"Ролевая игра о ведьмаке Геральте в огромном фэнтезийном мире."]]"""
+
+# JSON Schema для structured outputs (response_format) в компактном режиме
+COMPACT_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "games",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {
+                "games": {
+                    "type": "array",
+                    "items": {
+                        "type": "array",
+                        "items": {"type": ["string", "number"]},
+                        "minItems": len(COMPACT_FIELDS),
+                        "maxItems": len(COMPACT_FIELDS),
+                    },
+                },
+            },
+            "required": ["games"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+
+class AIService:
+    """Класс для работы с OpenRouter API"""
+    
+    def __init__(self, cache: Optional[RecommendationCache] = None,
+                 scheduler: Optional[FairScheduler] = None,
+                 telemetry: Optional[Telemetry] = None,
+                 catalog: Optional[GameCatalog] = None,
+                 similarity: Optional[SimilarityIndex] = None):
+        self.api_url = config.OPENROUTER_API_URL
+        self.api_key = config.OPENROUTER_API_KEY
+        self.model = config.OPENROUTER_MODELS[0]
+        # Резервные модели для хеджирования медленных ответов основной
+        self.backup_models = config.OPENROUTER_MODELS[1:]
+        self.hedging = config.AI_HEDGING
+        self.hedge = HedgePolicy()
+        # Для потока хедж считается по времени до первой игры
+        self.stream_hedge = HedgePolicy()
+        # Повторы при сбоях и выключатели по моделям
+        self.retry = RetryPolicy()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self.retries = 0
+        # Компактный формат ответа (позиционные массивы) и structured outputs
+        self.compact_output = config.AI_COMPACT_OUTPUT
+        self.structured_output = config.AI_STRUCTURED_OUTPUT
+        # Стоимость запроса в блоке usage (usage accounting OpenRouter)
+        self.usage_accounting = config.AI_USAGE_ACCOUNTING
+        # Токены и задержки запросов (без телеметрии - только в памяти, без записи)
+        self.telemetry = telemetry or Telemetry(db, enabled=False)
+        # Параметры TLS для коннектора (None - проверка сертификатов по умолчанию)
+        self.ssl_context: Optional[ssl.SSLContext] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.cache = cache
+        # Ответы на похожие (перефразированные) запросы
+        self.similarity = similarity
+        # Допуск запросов к нейросети: лимит параллелизма и честная очередь
+        self.scheduler = scheduler or FairScheduler()
+        # Запросы к нейросети, выполняющиеся прямо сейчас (ключ - нормализованный запрос)
+        self._inflight: Dict[str, "asyncio.Future[Optional[List[GameInfo]]]"] = {}
+        self.upstream_requests = 0
+        self.coalesced_requests = 0
+        # Локальный каталог игр: ответ без нейросети и проверка её ответов
+        self.catalog = catalog
+        self.catalog_mode = config.CATALOG_MODE
+        self.catalog_answers = 0
+        self.catalog_enriched = 0
+    
+    def _create_session(self) -> aiohttp.ClientSession:
+        """Создание HTTP-сессии с пулом keep-alive соединений"""
+        ssl_param: Union[ssl.SSLContext, bool] = self.ssl_context if self.ssl_context is not None else True
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_POOL_LIMIT,
+            limit_per_host=config.HTTP_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+            use_dns_cache=True,
+            ssl=ssl_param,
+        )
+        return aiohttp.ClientSession(
+            connector=connector,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "HTTP-Referer": "https://github.com",
+            },
+        )
+    
+    async def start(self):
+        """Открытие долгоживущей HTTP-сессии (вызывается при старте бота)"""
+        if self._session is None or self._session.closed:
+            self._session = self._create_session()
+            logger.info(
+                f"HTTP-сессия OpenRouter открыта (пул: {config.HTTP_POOL_LIMIT}, "
+                f"на хост: {config.HTTP_POOL_LIMIT_PER_HOST})"
+            )
+    
+    async def close(self):
+        """Закрытие HTTP-сессии и всех соединений пула"""
+        for flight in list(self._inflight.values()):
+            flight.cancel()
+        self._inflight.clear()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("HTTP-сессия OpenRouter закрыта")
+        self._session = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Получение общей сессии (открывается лениво, если start() не вызывался)"""
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+    
+    @timed(ai_request_seconds, "recommendations", errors=ai_request_errors)
+    async def get_game_recommendations_with_details(self, user_query: str, user_id: Optional[int] = None,
+                                                    on_queue_position: Optional[PositionCallback] = None
+                                                    ) -> Optional[List[GameInfo]]:
+        """
+        Получение подробных рекомендаций игр (с учётом кэша)
+        
+        Args:
+            user_query: Описание игры от пользователя
+            user_id: ID пользователя (для честной очереди запросов)
+            on_queue_position: Колбэк с позицией запроса в очереди
+            
+        Returns:
+            Список игр (GameInfo) или None в случае ошибки
+            
+        Raises:
+            SchedulerOverloaded: Запрос не допущен к нейросети из-за перегрузки
+        """
+        key = normalize_query(user_query) or user_query
+        
+        if self.cache is not None:
+            games = await self.cache.get(key)
+            if games is not None:
+                logger.info(f"Рекомендации найдены в кэше: '{key[:50]}'")
+                return games
+        
+        games = self._similar_answer(key)
+        if games:
+            return games
+        
+        games = await self._answer_from_catalog(user_query)
+        if games:
+            return games
+        
+        return await self._coalesced_fetch(key, user_query, user_id, on_queue_position)
+    
+    @timed_stream(ai_request_seconds, "stream", errors=ai_request_errors)
+    async def stream_game_recommendations(self, user_query: str, user_id: Optional[int] = None,
+                                          on_queue_position: Optional[PositionCallback] = None
+                                          ) -> AsyncIterator[GameInfo]:
+        """
+        Потоковое получение рекомендаций: каждая игра отдаётся сразу,
+        как только нейросеть закончила её описание (SSE, stream: true)
+        
+        Args:
+            user_query: Описание игры от пользователя
+            user_id: ID пользователя (для честной очереди запросов)
+            on_queue_position: Колбэк с позицией запроса в очереди
+            
+        Yields:
+            Игры (GameInfo)
+            
+        Raises:
+            SchedulerOverloaded: Запрос не допущен к нейросети из-за перегрузки
+        """
+        key = normalize_query(user_query) or user_query
+        
+        if self.cache is not None:
+            games = await self.cache.get(key)
+            if games is not None:
+                logger.info(f"Рекомендации найдены в кэше: '{key[:50]}'")
+                for game in games:
+                    yield game
+                return
+        
+        games = self._similar_answer(key) or await self._answer_from_catalog(user_query)
+        if games:
+            for game in games:
+                yield game
+            return
+        
+        if key in self._inflight:
+            # Такой же запрос уже выполняется - ждём его целиком
+            for game in await self._coalesced_fetch(key, user_query, user_id, on_queue_position) or []:
+                yield game
+            return
+        
+        # Ведущий запрос: остальные одинаковые запросы ждут этот future
+        flight = asyncio.get_running_loop().create_future()
+        self._register_flight(key, flight)
+        parser = IncrementalJSONArrayParser()
+        games = []
+        enqueued = time.monotonic()
+        try:
+            async with self.scheduler.slot(user_id, on_queue_position):
+                self.upstream_requests += 1
+                queue_wait = time.monotonic() - enqueued
+                async for game in self._stream_hedged(user_query, parser, user_id, queue_wait):
+                    # Проверка по каталогу - по одной игре: пакетная задержала бы
+                    # первую игру до конца ответа, а поиск по ключу - доли миллисекунды
+                    game = await self._enrich_game(game)
+                    games.append(game)
+                    yield game
+            
+            if games:
+                logger.info(f"Получено {len(games)} игр от AI (поток)")
+            flight.set_result(games or None)
+            if games and parser.finished:
+                await self._remember(key, games)
+        finally:
+            # Потребитель отменён или прекратил чтение - ожидающие повторят запрос сами
+            if not flight.done():
+                flight.set_exception(FlightAborted())
+    
+    async def _coalesced_fetch(self, key: str, user_query: str, user_id: Optional[int] = None,
+                               on_position: Optional[PositionCallback] = None) -> Optional[List[GameInfo]]:
+        """
+        Объединение одинаковых одновременных запросов в один запрос к нейросети.
+        
+        Первый вызов запускает общую задачу, остальные ждут её результат.
+        Задача защищена от отмены отдельным ожидающим (asyncio.shield), а после
+        завершения удаляется из таблицы, поэтому ошибка или пустой ответ
+        не «залипают»: следующий вызов выполнит запрос заново.
+        """
+        while True:
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = asyncio.ensure_future(self._fetch_and_store(key, user_query, user_id, on_position))
+                self._register_flight(key, flight)
+            else:
+                self.coalesced_requests += 1
+                logger.info(f"Запрос присоединён к уже выполняющемуся: '{key[:50]}'")
+            
+            try:
+                return await asyncio.shield(flight)
+            except FlightAborted:
+                # Ведущий потоковый запрос был отменён - повторяем запрос сами
+                continue
+    
+    async def _answer_from_catalog(self, user_query: str) -> Optional[List[GameInfo]]:
+        """
+        Ответ из локального каталога без обращения к нейросети (CATALOG_MODE=answer).
+        
+        Каталог отвечает, только если все значимые слова запроса нашлись
+        хотя бы у CATALOG_MIN_RESULTS игр; иначе запрос уходит нейросети.
+        """
+        if self.catalog_mode != "answer" or self.catalog is None or not self.catalog.available:
+            return None
+        try:
+            found = await self.catalog.search(user_query, limit=config.CATALOG_RESULTS)
+        except Exception as e:
+            logger.error(f"Ошибка поиска в каталоге игр: {e}")
+            return None
+        if len(found) < max(1, config.CATALOG_MIN_RESULTS):
+            return None
+        self.catalog_answers += 1
+        logger.info(f"Ответ из каталога игр ({len(found)} игр): '{user_query[:50]}'")
+        return [game for game, _ in found]
+    
+    async def _enrich(self, games: Optional[List[GameInfo]]) -> Optional[List[GameInfo]]:
+        """Проверка игр из ответа нейросети по каталогу (год, рейтинг, платформы, картинка)"""
+        if not games or self.catalog_mode == "off" or self.catalog is None or not self.catalog.available:
+            return games
+        try:
+            known = await self.catalog.lookup([game.name for game in games])
+        except Exception as e:
+            logger.error(f"Ошибка проверки ответа по каталогу игр: {e}")
+            return games
+        enriched = []
+        for game in games:
+            match = known.get(name_key(game.name))
+            if match is not None:
+                self.catalog_enriched += 1
+                game = enrich_game(game, match)
+            enriched.append(game)
+        return enriched
+    
+    async def _enrich_game(self, game: GameInfo) -> GameInfo:
+        """Проверка одной игры по каталогу (потоковый ответ)"""
+        if self.catalog_mode == "off" or self.catalog is None or not self.catalog.available:
+            return game
+        try:
+            match = await self.catalog.lookup_one(game.name)
+        except Exception as e:
+            logger.error(f"Ошибка проверки ответа по каталогу игр: {e}")
+            return game
+        if match is None:
+            return game
+        self.catalog_enriched += 1
+        return enrich_game(game, match)
+    
+    def _register_flight(self, key: str, flight: asyncio.Future):
+        """Регистрация общего запроса в таблице выполняющихся"""
+        self._inflight[key] = flight
+        flight.add_done_callback(functools.partial(self._forget_flight, key))
+    
+    def _forget_flight(self, key: str, flight: asyncio.Future):
+        """Удаление завершившейся задачи из таблицы выполняющихся запросов"""
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        if not flight.cancelled() and flight.exception() is not None:
+            # Исключение уже получили ожидающие; помечаем его обработанным,
+            # чтобы asyncio не ругался, если все ожидающие были отменены
+            logger.debug(f"Общий запрос завершился ошибкой: {flight.exception()}")
+    
+    async def _fetch_and_store(self, key: str, user_query: str, user_id: Optional[int] = None,
+                               on_position: Optional[PositionCallback] = None) -> Optional[List[GameInfo]]:
+        """Запрос к нейросети (через очередь планировщика) с сохранением успешного ответа в кэш"""
+        enqueued = time.monotonic()
+        async with self.scheduler.slot(user_id, on_position):
+            self.upstream_requests += 1
+            games = await self._fetch_hedged(user_query, user_id, time.monotonic() - enqueued)
+        games = await self._enrich(games)
+        if games:
+            await self._remember(key, games)
+        return games
+    
+    async def _remember(self, key: str, games: List[GameInfo]):
+        """Сохранение полного ответа нейросети в кэш и индекс похожих запросов"""
+        if self.cache is not None:
+            await self.cache.set(key, games)
+        if self.similarity is not None:
+            self.similarity.add(key, games)
+    
+    def _similar_answer(self, key: str) -> Optional[List[GameInfo]]:
+        """Ответ на ранее заданный похожий запрос (косинусная близость не ниже порога)"""
+        if self.similarity is None:
+            return None
+        match = self.similarity.get(key)
+        if match is None:
+            return None
+        similar_key, score, games = match
+        logger.info(f"Ответ на похожий запрос ({score:.2f}): '{key[:50]}' ~ '{similar_key[:50]}'")
+        return games
+    
+    def _build_payload(self, user_query: str, stream: bool = False, model: Optional[str] = None) -> Dict[str, Any]:
+        """Формирование тела запроса к OpenRouter"""
+        if self.compact_output:
+            system_prompt = COMPACT_SYSTEM_PROMPT
+            user_prompt = f'Запрос пользователя: "{user_query}"'
+        else:
+            system_prompt = SYSTEM_PROMPT
+            user_prompt = f"""Пользователь описывает игру, которую он ищет:
 "{user_query}"
 
 Порекомендуй 3-5 подходящих игр с подробной информацией в формате JSON. Все описания на русском языке!"""
 
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://github.com",
-        }
-        
         payload = {
-            "model": self.model,
+            "model": model or self.model,
             "messages": [
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
             ],
             "temperature": 0.7,
-            "max_tokens": 2000
+            "max_tokens": config.AI_MAX_TOKENS if self.compact_output else 2000
         }
+        if self.compact_output and self.structured_output:
+            payload["response_format"] = COMPACT_RESPONSE_FORMAT
+        if stream:
+            payload["stream"] = True
+        if self.usage_accounting:
+            payload["usage"] = {"include": True}
+        return payload
+    
+    @staticmethod
+    def _log_api_error(status: int, error_text: str):
+        """Логирование ошибочного ответа OpenRouter"""
+        logger.error(f"Ошибка OpenRouter API: {status} - {error_text}")
+        if status == 401:
+            logger.warning("API ключ OpenRouter недействителен.")
+        elif status == 402:
+            logger.warning("Недостаточно кредитов на аккаунте OpenRouter.")
+    
+    async def _fetch_hedged(self, user_query: str, user_id: Optional[int] = None,
+                            queue_wait: float = 0.0) -> Optional[List[GameInfo]]:
+        """
+        Запрос с хеджированием: если основная модель не ответила за
+        hedge.delay() секунд (или ответила ошибкой), тот же запрос уходит
+        следующей модели из OPENROUTER_MODELS. Берётся первый корректный
+        ответ, остальные запросы отменяются.
+        """
+        if not self.hedging or not self.backup_models:
+            return await self._fetch_recommendations(user_query, user_id=user_id, queue_wait=queue_wait)
+        
+        started = time.monotonic()
+        models = iter([self.model] + self.backup_models)
+        tasks: Dict[asyncio.Task, str] = {}
         
+        def launch():
+            model = next(models, None)
+            if model is None:
+                return False
+            fetch = self._fetch_recommendations(user_query, model, user_id=user_id, queue_wait=queue_wait)
+            tasks[asyncio.ensure_future(fetch)] = model
+            return True
+        
+        self.hedge.requests += 1
+        launch()
+        hedged = False
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    self.api_url,
-                    headers=headers,
-                    json=payload,
-                    timeout=aiohttp.ClientTimeout(total=30)
-                ) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        content = data['choices'][0]['message']['content']
-                        
-                        # Извлечение JSON из ответа
-                        try:
-                            # Ищем JSON в ответе (может быть обернут в markdown)
-                            json_match = re.search(r'\[.*\]', content, re.DOTALL)
-                            if json_match:
-                                json_str = json_match.group(0)
-                                games = json.loads(json_str)
-                                logger.info(f"Получено {len(games)} игр от AI")
-                                return games
-                            else:
-                                logger.warning(f"JSON не найден в ответе: {content[:200]}...")
-                                return None
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Ошибка парсинга JSON: {e}")
-                            logger.debug(f"Ответ AI: {content[:300]}...")
-                            return None
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ошибка OpenRouter API: {response.status} - {error_text}")
-                        if response.status == 401:
-                            logger.warning("API ключ OpenRouter недействителен.")
-                        elif response.status == 402:
-                            logger.warning("Недостаточно кредитов на аккаунте OpenRouter.")
-                        return None
-                        
+            while tasks:
+                done, _ = await asyncio.wait(
+                    tasks, timeout=None if hedged else self.hedge.delay(),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Основная модель не уложилась в задержку хеджа
+                    hedged = True
+                    self.hedge.fired += 1
+                    launch()
+                    continue
+                for task in done:
+                    model = tasks.pop(task)
+                    games = task.result()
+                    if model == self.model:
+                        # Время ошибки тоже учитывается - как нижняя граница задержки
+                        self.hedge.primary.add(time.monotonic() - started)
+                    if games:
+                        if model != self.model:
+                            self.hedge.won += 1
+                            logger.info(f"Резервная модель {model} ответила первой")
+                        self.hedge.observed.add(time.monotonic() - started)
+                        return games
+                if not tasks:
+                    # Все запущенные запросы завершились ошибкой - сразу пробуем следующую модель
+                    hedged = True
+                    launch()
+            return None
+        finally:
+            for task, model in tasks.items():
+                if model == self.model:
+                    # Основная модель не успела: её задержка не меньше прошедшего времени
+                    self.hedge.primary.add(time.monotonic() - started)
+                task.cancel()
+    
+    async def _stream_hedged(self, user_query: str, parser: IncrementalJSONArrayParser,
+                             user_id: Optional[int] = None,
+                             queue_wait: float = 0.0) -> AsyncIterator[GameInfo]:
+        """
+        Потоковый запрос с хеджированием по времени до первой игры.
+        
+        Побеждает поток, первым выдавший игру; остальные потоки закрываются.
+        parser получает состояние парсера победившего потока.
+        """
+        if not self.hedging or not self.backup_models:
+            async for game in self._stream_recommendations(user_query, parser,
+                                                           user_id=user_id, queue_wait=queue_wait):
+                yield game
+            return
+        
+        started = time.monotonic()
+        models = iter([self.model] + self.backup_models)
+        # Задача ожидания первой игры -> (модель, парсер, поток)
+        racers: Dict[asyncio.Task, tuple] = {}
+        
+        def launch():
+            model = next(models, None)
+            if model is None:
+                return
+            racer_parser = parser if not racers and model == self.model else IncrementalJSONArrayParser()
+            stream = self._stream_recommendations(user_query, racer_parser, model,
+                                                  user_id=user_id, queue_wait=queue_wait)
+            racers[asyncio.ensure_future(stream.__anext__())] = (model, racer_parser, stream)
+        
+        self.stream_hedge.requests += 1
+        launch()
+        hedged = False
+        winner = None
+        try:
+            while racers and winner is None:
+                done, _ = await asyncio.wait(
+                    racers, timeout=None if hedged else self.stream_hedge.delay(),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedged = True
+                    self.stream_hedge.fired += 1
+                    launch()
+                    continue
+                for task in done:
+                    model, racer_parser, stream = racers.pop(task)
+                    try:
+                        first_game = task.result()
+                    except StopAsyncIteration:
+                        # Поток закончился без единой игры
+                        if model == self.model:
+                            self.stream_hedge.primary.add(time.monotonic() - started)
+                        continue
+                    winner = (model, racer_parser, stream, first_game)
+                    break
+                if winner is None and not racers:
+                    hedged = True
+                    launch()
+        finally:
+            for task, (model, _, stream) in racers.items():
+                if model == self.model:
+                    # Основная модель не успела: её задержка не меньше прошедшего времени
+                    self.stream_hedge.primary.add(time.monotonic() - started)
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, StopAsyncIteration):
+                    pass
+                await stream.aclose()
+        
+        if winner is None:
+            return
+        model, racer_parser, stream, first_game = winner
+        elapsed = time.monotonic() - started
+        if model == self.model:
+            self.stream_hedge.primary.add(elapsed)
+        else:
+            self.stream_hedge.won += 1
+            logger.info(f"Резервная модель {model} начала ответ первой")
+        self.stream_hedge.observed.add(elapsed)
+        
+        try:
+            yield first_game
+            async for game in stream:
+                yield game
+        finally:
+            await stream.aclose()
+            if racer_parser is not parser:
+                # Полнота ответа определяется парсером победившего потока
+                parser.started, parser.finished = racer_parser.started, racer_parser.finished
+    
+    async def _fetch_recommendations(self, user_query: str, model: Optional[str] = None,
+                                     user_id: Optional[int] = None,
+                                     queue_wait: float = 0.0) -> Optional[List[GameInfo]]:
+        """
+        Запрос подробных рекомендаций игр у нейросети
+        
+        Args:
+            user_query: Описание игры от пользователя
+            model: Модель (по умолчанию основная)
+            user_id: ID пользователя (для телеметрии)
+            queue_wait: Время ожидания в очереди планировщика, сек (для телеметрии)
+            
+        Returns:
+            Список игр (GameInfo) или None в случае ошибки
+        """
+        payload = self._build_payload(user_query, model=model)
+        call = self.telemetry.begin(payload["model"], user_id=user_id, queue_wait=queue_wait)
+        # Если задачу отменят (проигравший хедж), статус так и останется cancelled
+        status = "cancelled"
+        
+        try:
+            async with self._open_completion(payload, call) as response:
+                call.mark_first_byte()
+                data = await response.json()
+            call.set_usage(data.get('usage'))
+            content = data['choices'][0]['message']['content']
+            
+            # Извлечение JSON из ответа (может быть обернут в markdown)
+            games = decode_games(content)
+            if games is None:
+                status = "empty"
+                logger.warning(f"JSON не найден в ответе: {content[:200]}...")
+                return None
+            status = "ok" if games else "empty"
+            call.games = len(games)
+            logger.info(f"Получено {len(games)} игр от AI")
+            return games
+        
+        except CircuitOpen as e:
+            status = "circuit_open"
+            logger.warning(f"Запрос не отправлен: {e}")
+            return None
+        except UpstreamError as e:
+            status = "error"
+            logger.error(f"Запрос к OpenRouter не удался: {e}")
+            return None
         except aiohttp.ClientError as e:
+            status = "error"
             logger.error(f"Ошибка при запросе к OpenRouter: {e}")
             return None
         except Exception as e:
+            status = "error"
             logger.error(f"Неожиданная ошибка в AIService: {e}")
             return None
+        finally:
+            self.telemetry.finish(call, status)
+    
+    def breaker(self, model: str) -> CircuitBreaker:
+        """Выключатель модели (создаётся при первом обращении)"""
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(model)
+        return breaker
+    
+    @asynccontextmanager
+    async def _open_completion(self, payload: Dict[str, Any],
+                               call: Optional[ModelCall] = None) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        POST к chat/completions с повторами; отдаёт ответ со статусом 200.
+        
+        Сетевые ошибки, тайм-ауты, 408, 429 и 5xx повторяются с задержкой
+        (RetryPolicy) в пределах общего срока AI_RETRY_DEADLINE. Ошибки
+        сервера учитываются выключателем модели: пока он разомкнут,
+        запрос сразу завершается CircuitOpen, не дожидаясь тайм-аута.
+        429 выключатель не размыкает: Retry-After откладывает все запросы
+        к модели, а если ожидание не укладывается в срок - ошибка сразу.
+        
+        Raises:
+            CircuitOpen: Выключатель модели разомкнут
+            UpstreamError: Все попытки неудачны
+        """
+        model = payload["model"]
+        breaker = self.breaker(model)
+        deadline = time.monotonic() + self.retry.deadline
+        attempt = 0
+        
+        while True:
+            pause = breaker.wait_time()
+            if pause:
+                if pause + 1.0 > deadline - time.monotonic():
+                    raise UpstreamError(f"HTTP 429: {model} просит подождать {pause:.1f} с",
+                                        status=429, retry_after=pause)
+                await asyncio.sleep(pause)
+            if not breaker.allow():
+                raise CircuitOpen(f"выключатель модели {model} разомкнут")
+            if call is not None:
+                call.attempts += 1
+            
+            try:
+                session = await self._get_session()
+                response = await session.post(
+                    self.api_url,
+                    json=payload,
+                    timeout=aiohttp.ClientTimeout(total=min(30.0, deadline - time.monotonic()))
+                )
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = UpstreamError(f"{type(e).__name__}: {e}")
+            else:
+                if response.status == 200:
+                    breaker.record_success()
+                    try:
+                        yield response
+                    finally:
+                        response.release()
+                    return
+                error_text = await response.text()
+                response.release()
+                self._log_api_error(response.status, error_text)
+                error = UpstreamError(
+                    f"HTTP {response.status}",
+                    status=response.status,
+                    retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                )
+            
+            if error.upstream_failure:
+                breaker.record_failure()
+            elif error.status == 429 and error.retry_after is not None:
+                breaker.defer(error.retry_after)
+            delay = self.retry.next_delay(attempt, error, deadline - time.monotonic())
+            if delay is None:
+                raise error
+            self.retries += 1
+            attempt += 1
+            logger.warning(f"Повтор запроса к {model} через {delay:.2f} с ({error})")
+            await asyncio.sleep(delay)
+    
+    def resilience_stats(self) -> Dict[str, Any]:
+        """Количество повторов и состояние выключателей"""
+        return {
+            "retries": self.retries,
+            "breakers": {model: breaker.stats() for model, breaker in self._breakers.items()},
+        }
+
+    async def _stream_recommendations(self, user_query: str, parser: IncrementalJSONArrayParser,
+                                      model: Optional[str] = None, user_id: Optional[int] = None,
+                                      queue_wait: float = 0.0) -> AsyncIterator[GameInfo]:
+        """
+        Чтение SSE-потока OpenRouter и разбор игр по мере поступления токенов
+        
+        Args:
+            user_query: Описание игры от пользователя
+            parser: Потоковый парсер; по parser.finished видно, дошёл ли ответ до конца
+            model: Модель (по умолчанию основная)
+            user_id: ID пользователя (для телеметрии)
+            queue_wait: Время ожидания в очереди планировщика, сек (для телеметрии)
+        """
+        payload = self._build_payload(user_query, stream=True, model=model)
+        call = self.telemetry.begin(payload["model"], user_id=user_id, stream=True, queue_wait=queue_wait)
+        # Поток закрыт потребителем (проигравший хедж, отмена обработчика) - cancelled
+        status = "cancelled"
+        
+        try:
+            # Повторяется только установка соединения: после первых данных
+            # повтор привёл бы к дублированию уже показанных игр
+            async with self._open_completion(payload, call) as response:
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    # Пустые строки и комментарии (": OPENROUTER PROCESSING") пропускаем
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except json.JSONDecodeError:
+                        continue
+                    
+                    if chunk.get("error"):
+                        status = "error"
+                        logger.error(f"Ошибка OpenRouter в потоке: {chunk['error']}")
+                        return
+                    # Блок usage приходит последним чанком (обычно с пустым choices)
+                    call.set_usage(chunk.get("usage"))
+                    choices = chunk.get("choices") or []
+                    delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                    if not delta:
+                        continue
+                    
+                    call.mark_first_byte()
+                    for item in parser.feed(delta):
+                        game = game_from_raw(item)
+                        if game is not None:
+                            call.games += 1
+                            yield game
+                
+                status = "ok" if call.games else "empty"
+                if not parser.finished:
+                    logger.warning("Поток OpenRouter завершился до конца JSON массива")
+        
+        except CircuitOpen as e:
+            status = "circuit_open"
+            logger.warning(f"Потоковый запрос не отправлен: {e}")
+        except UpstreamError as e:
+            status = "error"
+            logger.error(f"Потоковый запрос к OpenRouter не удался: {e}")
+        except aiohttp.ClientError as e:
+            status = "error"
+            logger.error(f"Ошибка при потоковом запросе к OpenRouter: {e}")
+        except asyncio.TimeoutError:
+            status = "error"
+            logger.error("Превышено время ожидания потокового ответа OpenRouter")
+        finally:
+            self.telemetry.finish(call, status)
 
 
 # Глобальный экземпляр сервиса
-ai_service = AIService()
+ai_service = AIService(cache=RecommendationCache(db), telemetry=telemetry, catalog=catalog,
+                       similarity=create_similarity_index())
+
+
+def _answer_sources() -> Dict[tuple, int]:
+    """Откуда взяты ответы: запросы к нейросети, совмещённые, каталог, кэш, похожие запросы"""
+    sources = {
+        ("upstream",): ai_service.upstream_requests,
+        ("coalesced",): ai_service.coalesced_requests,
+        ("catalog",): ai_service.catalog_answers,
+    }
+    if ai_service.cache is not None:
+        sources[("cache_memory",)] = ai_service.cache.memory.hits
+        sources[("cache_db",)] = ai_service.cache.db_hits
+    if ai_service.similarity is not None:
+        sources[("similarity",)] = ai_service.similarity.hits
+    return sources
+
+
+# Состояние сервиса считывается при сборе метрик и не стоит ничего на горячем пути
+metrics.callback("bot_ai_answers_total", "Ответы на запросы по источнику", _answer_sources,
+                 ("source",), kind="counter")
+metrics.callback("bot_ai_retries_total", "Повторы запросов к нейросети",
+                 lambda: ai_service.retries, kind="counter")
+metrics.callback("bot_ai_scheduler_active", "Запросы к нейросети, выполняющиеся сейчас",
+                 lambda: ai_service.scheduler.active)
+metrics.callback("bot_ai_scheduler_queued", "Запросы в очереди к нейросети",
+                 lambda: ai_service.scheduler.queued)
+metrics.callback("bot_ai_scheduler_shed_total", "Запросы, отклонённые из-за перегрузки",
+                 lambda: ai_service.scheduler.shed, kind="counter")
@@ -0,0 +1,100 @@
+"""
+Двухуровневый кэш рекомендаций: LRU в памяти процесса + таблица в SQLite
+"""
+import dataclasses
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import config
+from database.db import AnyDatabase
+from database.models import GameInfo
+from services.parsing import game_from_raw
+from utils.lru import LRUCache
+from utils.text import normalize_query
+
+logger = logging.getLogger(__name__)
+
+
+class RecommendationCache:
+    """Кэш ответов нейросети, ключом служит нормализованный запрос"""
+    
+    def __init__(self, database: AnyDatabase, max_size: int = None, ttl: float = None):
+        """
+        Args:
+            database: База данных для постоянного уровня кэша
+            max_size: Количество записей в памяти
+            ttl: Время жизни записи в секундах
+        """
+        self.database = database
+        self.ttl = ttl if ttl is not None else config.CACHE_TTL_SECONDS
+        self.memory: LRUCache[List[GameInfo]] = LRUCache(
+            max_size if max_size is not None else config.CACHE_MAX_SIZE,
+            ttl=self.ttl,
+        )
+        self.db_hits = 0
+        self.db_misses = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+    
+    @staticmethod
+    def make_key(user_query: str) -> str:
+        """Ключ кэша для запроса"""
+        return normalize_query(user_query)
+    
+    async def get(self, key: str) -> Optional[List[GameInfo]]:
+        """Поиск рекомендаций сначала в памяти, затем в SQLite"""
+        if not self.enabled or not key:
+            return None
+        
+        games = self.memory.get(key)
+        if games is not None:
+            return games
+        
+        try:
+            row = await self.database.get_cached_recommendations(key, self.ttl)
+            if row is not None:
+                payload, created_at = row
+                items = json.loads(payload)
+                if not isinstance(items, list):
+                    raise ValueError(f"ожидался список, получен {type(items).__name__}")
+                games = [game for game in map(game_from_raw, items) if game is not None]
+        except Exception as e:
+            # Повреждённая запись - промах: запрос уйдёт к нейросети и перезапишет её
+            logger.error(f"Ошибка чтения кэша рекомендаций: {e}")
+            self.db_misses += 1
+            return None
+        
+        if row is None:
+            self.db_misses += 1
+            return None
+        
+        self.db_hits += 1
+        # Запись в памяти живёт ровно столько, сколько ей осталось в SQLite
+        remaining = self.ttl - (time.time() - created_at)
+        if remaining > 0:
+            self.memory.set(key, games, ttl=remaining)
+        return games
+    
+    async def set(self, key: str, games: List[GameInfo]):
+        """Сохранение рекомендаций в оба уровня кэша"""
+        if not self.enabled or not key or not games:
+            return
+        
+        self.memory.set(key, games)
+        try:
+            await self.database.save_cached_recommendations(
+                key, json.dumps([dataclasses.asdict(game) for game in games], ensure_ascii=False)
+            )
+        except Exception as e:
+            logger.error(f"Ошибка записи кэша рекомендаций: {e}")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики кэша для мониторинга"""
+        stats = self.memory.stats()
+        stats["db_hits"] = self.db_hits
+        stats["db_misses"] = self.db_misses
+        return stats
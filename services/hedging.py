@@ -0,0 +1,80 @@
+"""
+Статистика задержек для хеджирования запросов к нейросети
+"""
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+import config
+
+
+class LatencyWindow:
+    """Задержки последних запросов (скользящее окно) и их квантили"""
+
+    def __init__(self, size: int = 200):
+        self._samples: Deque[float] = deque(maxlen=size)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, seconds: float):
+        self._samples.append(seconds)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Квантиль q (0..1) или None, если данных нет"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class HedgePolicy:
+    """
+    Когда отправлять резервный запрос.
+
+    Задержка хеджа - квантиль AI_HEDGE_QUANTILE задержек основной модели:
+    при 0.9 резервный запрос уходит примерно в 10% случаев, и только для
+    самых медленных ответов. Пока замеров мало, используется
+    AI_HEDGE_INITIAL_DELAY.
+
+    В окно основной модели попадают и запросы, которые не дали ответа:
+    отменённые после победы резервной модели и завершившиеся ошибкой.
+    Их время - нижняя граница задержки; без них окно состояло бы только
+    из быстрых ответов, и квантиль занижался бы ровно тогда, когда
+    основная модель тормозит.
+    """
+
+    def __init__(self, quantile: float = None, min_delay: float = None,
+                 initial_delay: float = None, min_samples: int = None):
+        self.quantile = config.AI_HEDGE_QUANTILE if quantile is None else quantile
+        self.min_delay = config.AI_HEDGE_MIN_DELAY if min_delay is None else min_delay
+        self.initial_delay = config.AI_HEDGE_INITIAL_DELAY if initial_delay is None else initial_delay
+        self.min_samples = config.AI_HEDGE_MIN_SAMPLES if min_samples is None else min_samples
+        # Задержки основной модели (по ним выбирается момент хеджа)
+        # и итоговые задержки запросов (по ним виден эффект хеджирования)
+        self.primary = LatencyWindow()
+        self.observed = LatencyWindow()
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+
+    def delay(self) -> float:
+        """Сколько ждать ответа основной модели перед резервным запросом"""
+        if len(self.primary) < self.min_samples:
+            return self.initial_delay
+        return max(self.min_delay, self.primary.quantile(self.quantile))
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.fired,
+            "hedges_won": self.won,
+            "fire_rate": round(self.fired / self.requests, 4) if self.requests else 0.0,
+            "delay_ms": ms(self.delay()),
+            "primary_p50_ms": ms(self.primary.quantile(0.5)),
+            "primary_p99_ms": ms(self.primary.quantile(0.99)),
+            "observed_p50_ms": ms(self.observed.quantile(0.5)),
+            "observed_p99_ms": ms(self.observed.quantile(0.99)),
+        }
@@ -0,0 +1,440 @@
+"""
+Метрики в текстовом формате Prometheus: счётчики и гистограммы задержек
+
+Значения обновляются только из потока цикла событий (обработчики,
+обёртки AIService и Database выполняются в нём, потоки aiosqlite
+метрики не трогают), поэтому блокировки не нужны: запись - это поиск
+корзины через bisect и несколько операций над обычными числами.
+Ряд с конкретными значениями меток создаётся при первом обращении;
+обёртки получают свой ряд заранее и на горячем пути не ищут его по меткам.
+"""
+import functools
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from aiohttp import web
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм задержек (секунды): от запроса к кэшу в памяти
+# до ответа нейросети с повторами
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 80.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+# Значение метрики-колбэка: число (без меток) или {значения меток: число}
+CallbackValue = Union[float, Dict[Labels, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Labels, Any] = {}
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values: Any):
+        """Ряд с заданными значениями меток (создаётся при первом обращении)"""
+        # Обычно метки - уже строки, и ряд находится без построения ключа
+        series = self._series.get(values)
+        if series is not None:
+            return series
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name}: ожидались метки {self.labelnames}, получено {key}")
+            series = self._series[key] = self._new_series()
+        return series
+
+    def items(self) -> List[Tuple[Labels, Any]]:
+        """Ряды метрики: (значения меток, ряд)"""
+        return list(self._series.items())
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class CounterSeries:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(_Metric):
+    """Монотонный счётчик (события, ошибки)"""
+
+    kind = "counter"
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries()
+
+    def inc(self, *values: Any, amount: float = 1):
+        self.labels(*values).value += amount
+
+    def samples(self) -> Iterable[str]:
+        for key, series in list(self._series.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(series.value)}"
+
+
+class HistogramSeries:
+    """Количество наблюдений по корзинам (не накопительно), их сумма и число"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Последняя корзина - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        # Граница le включительная: bisect_left даёт первую границу >= value
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Оценка квантиля по корзинам (линейно внутри корзины, как
+        histogram_quantile в Prometheus); None - наблюдений нет
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.bounds[-1]
+
+
+class Histogram(_Metric):
+    """Гистограмма задержек с фиксированными корзинами"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self.buckets)
+
+    def observe(self, value: float, *values: Any):
+        self.labels(*values).observe(value)
+
+    def samples(self) -> Iterable[str]:
+        le_names = self.labelnames + ("le",)
+        bounds = [_format_value(bound) for bound in self.buckets] + ["+Inf"]
+        for key, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, series.counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(le_names, key + (bound,))} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series.sum)}"
+            yield f"{self.name}_count{labels} {series.count}"
+
+
+class CallbackMetric(_Metric):
+    """
+    Значение, которое считывается в момент сбора (размер очереди, счётчики
+    сервисов): на горячем пути ничего не стоит
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], CallbackValue],
+                 labelnames: Sequence[str] = (), kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self) -> Iterable[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.error(f"Ошибка чтения метрики {self.name}: {e}")
+            return
+        if value is None:
+            return
+        items = value.items() if isinstance(value, dict) else [((), value)]
+        for key, number in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(number)}"
+
+
+class MetricsRegistry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, callback: Callable[[], CallbackValue],
+                 labelnames: Sequence[str] = (), kind: str = "gauge") -> CallbackMetric:
+        """Метрика, значение которой возвращает callback при каждом сборе"""
+        metric = CallbackMetric(name, documentation, callback, labelnames, kind)
+        # Повторная регистрация (например, новый экземпляр сервиса) заменяет колбэк
+        self._metrics[name] = metric
+        return metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def merge_expositions(parts: Dict[str, str], label: str) -> str:
+    """
+    Объединение метрик нескольких процессов в один ответ.
+
+    К каждому значению добавляется метка label с ключом процесса, а значения
+    одной метрики из разных процессов идут подряд под одним заголовком
+    (как требует формат Prometheus).
+    """
+    headers: Dict[str, List[str]] = {}
+    samples: Dict[str, List[str]] = {}
+    for source, text in parts.items():
+        extra = f'{label}="{_escape(source)}"'
+        family = ""
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith("#"):
+                fields = line.split(" ", 3)
+                if len(fields) >= 3 and fields[1] in ("HELP", "TYPE"):
+                    family = fields[2]
+                    family_headers = headers.setdefault(family, [])
+                    if len(family_headers) < 2:
+                        family_headers.append(line)
+                    samples.setdefault(family, [])
+                continue
+            brace = line.find("{")
+            if brace == -1:
+                name, _, rest = line.partition(" ")
+                line = f"{name}{{{extra}}} {rest}"
+            else:
+                line = f"{line[:brace]}{{{extra},{line[brace + 1:]}"
+            samples.setdefault(family, []).append(line)
+    lines: List[str] = []
+    for family, family_samples in samples.items():
+        lines.extend(headers.get(family, []))
+        lines.extend(family_samples)
+    return "\n".join(lines) + "\n"
+
+
+def timed(histogram: Histogram, *labels: Any, errors: Optional[Counter] = None):
+    """
+    Декоратор корутины: время выполнения в histogram, исключения - в errors
+
+    Без меток рядом указывается имя функции (одна метка), например
+    @timed(db_query_seconds) для методов Database.
+    """
+    def decorator(func: Callable[..., Awaitable[Any]]):
+        values = labels or (func.__name__,)
+        series = histogram.labels(*values)
+        error_series = errors.labels(*values) if errors is not None else None
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                if error_series is not None:
+                    error_series.value += 1
+                raise
+            finally:
+                series.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+def timed_stream(histogram: Histogram, *labels: Any, errors: Optional[Counter] = None):
+    """То же, что timed, для асинхронного генератора (время до его завершения)"""
+    def decorator(func: Callable[..., AsyncIterator[Any]]):
+        values = labels or (func.__name__,)
+        series = histogram.labels(*values)
+        error_series = errors.labels(*values) if errors is not None else None
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            stream = func(*args, **kwargs)
+            try:
+                async for item in stream:
+                    yield item
+            except Exception:
+                if error_series is not None:
+                    error_series.value += 1
+                raise
+            finally:
+                # Закрытие обёртки (break у вызывающего) сразу закрывает и исходный генератор
+                await stream.aclose()
+                series.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+
+class MetricsServer:
+    """Встроенный HTTP-сервер, отдающий метрики по GET METRICS_PATH"""
+
+    def __init__(self, render: Callable[[], Awaitable[str]] = None, host: str = None,
+                 port: int = None, path: str = None):
+        """
+        Args:
+            render: Корутина, возвращающая текст метрик (по умолчанию - реестр процесса)
+            host: Адрес (по умолчанию METRICS_HOST)
+            port: Порт (по умолчанию METRICS_PORT, 0 - любой свободный)
+            path: Путь (по умолчанию METRICS_PATH)
+        """
+        self.render = render or self._render_registry
+        self.host = host or config.METRICS_HOST
+        self.port = config.METRICS_PORT if port is None else port
+        self.path = path or config.METRICS_PATH
+        self._runner: Optional[web.AppRunner] = None
+
+    @staticmethod
+    async def _render_registry() -> str:
+        return metrics.render()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        response = web.Response(body=(await self.render()).encode("utf-8"))
+        response.headers["Content-Type"] = CONTENT_TYPE
+        return response
+
+    @property
+    def url(self) -> Optional[str]:
+        """Адрес запущенного сервера (с фактическим портом)"""
+        if self._runner is None or not self._runner.addresses:
+            return None
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}{self.path}"
+
+    async def start(self):
+        if self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get(self.path, self._handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.host, self.port).start()
+        except Exception:
+            await runner.cleanup()
+            raise
+        self._runner = runner
+        logger.info(f"Метрики доступны на {self.url}")
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        runner, self._runner = self._runner, None
+        await runner.cleanup()
+
+
+# Реестр метрик процесса
+metrics = MetricsRegistry()
+
+# Обработчики aiogram (middlewares/metrics.py)
+handler_seconds = metrics.histogram(
+    "bot_handler_duration_seconds", "Время обработки события обработчиком", ("handler",)
+)
+handler_errors = metrics.counter(
+    "bot_handler_errors_total", "Исключения в обработчиках", ("handler", "error")
+)
+
+# Нейросеть: запрос пользователя целиком (кэш, очередь, повторы) и этапы запроса к модели
+ai_request_seconds = metrics.histogram(
+    "bot_ai_request_duration_seconds", "Время получения рекомендаций (с кэшем и очередью)",
+    ("operation",)
+)
+ai_request_errors = metrics.counter(
+    "bot_ai_request_errors_total", "Исключения при получении рекомендаций", ("operation",)
+)
+ai_stage_seconds = metrics.histogram(
+    "bot_ai_stage_duration_seconds",
+    "Этапы успешного запроса к модели: queue, ttfb, generation, total", ("model", "stage")
+)
+ai_calls = metrics.counter(
+    "bot_ai_calls_total", "Запросы к моделям по итогу (ok, error, empty, ...)", ("model", "status")
+)
+
+# База данных (методы Database, по шардам суммарно)
+db_query_seconds = metrics.histogram(
+    "bot_db_query_duration_seconds", "Время выполнения метода Database", ("method",)
+)
+db_query_errors = metrics.counter(
+    "bot_db_query_errors_total", "Исключения в методах Database", ("method",)
+)
+history_dropped = metrics.counter(
+    "bot_history_dropped_total", "Строки истории, потерянные при переполнении очереди записи"
+)
+telemetry_dropped = metrics.counter(
+    "bot_telemetry_dropped_total", "Строки ai_usage, потерянные при переполнении очереди записи"
+)
+
+# Глобальный сервер метрик (запускается при METRICS_ENABLED)
+metrics_server = MetricsServer()
@@ -0,0 +1,181 @@
+"""
+Разбор ответов нейросети
+"""
+import json
+import logging
+import math
+import re
+from typing import Any, List, Optional
+
+from database.models import GameInfo
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalJSONArrayParser:
+    """
+    Потоковый разбор JSON-массива верхнего уровня.
+    
+    Принимает текст кусками (например, токенами из SSE-потока) и возвращает
+    элементы-объекты/массивы, как только они полностью получены. Текст до
+    открывающей скобки (пояснения модели, ```json) пропускается.
+    """
+    
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._parts: List[str] = []
+    
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Добавление очередного куска текста
+        
+        Returns:
+            Список элементов массива, завершённых в этом куске
+        """
+        completed: List[Any] = []
+        if self.finished or not chunk:
+            return completed
+        
+        # Начало текущего элемента внутри chunk (если элемент открыт)
+        start = 0 if self._depth else -1
+        
+        for i, ch in enumerate(chunk):
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+            
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                continue
+            
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 0:
+                    start = i
+                self._depth += 1
+            elif ch in "}]":
+                if self._depth == 0:
+                    # Закрывающая скобка самого массива
+                    self.finished = True
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    self._parts.append(chunk[start:i + 1])
+                    text = "".join(self._parts)
+                    self._parts.clear()
+                    start = -1
+                    try:
+                        completed.append(json.loads(text))
+                    except json.JSONDecodeError as e:
+                        logger.warning(f"Пропущен некорректный элемент ответа: {e}")
+        
+        if self._depth and start >= 0:
+            self._parts.append(chunk[start:])
+        
+        return completed
+
+
+# Порядок полей в компактном (позиционном) формате ответа
+COMPACT_FIELDS = ("name", "genres", "platforms", "released", "rating", "description")
+
+_JSON_DECODER = json.JSONDecoder()
+_JSON_START_RE = re.compile(r"[\[{]")
+
+
+# Проверки type(value) is str/float - быстрый путь для типичного ответа:
+# разбор вызывает их для каждого поля каждой игры
+
+def _to_text(value: Any) -> Optional[str]:
+    if type(value) is str:
+        return value or None
+    if value is None:
+        return None
+    return str(value)
+
+
+def _to_rating(value: Any) -> Optional[float]:
+    """Число рейтинга; nan, inf (в том числе строки "nan"/"inf") и нечисловое - None"""
+    if type(value) is not float:
+        if value is None or value == "":
+            return None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return None
+    return value if math.isfinite(value) else None
+
+
+def game_from_raw(item: Any) -> Optional[GameInfo]:
+    """
+    Преобразование элемента ответа нейросети в GameInfo
+    
+    Args:
+        item: Объект {"name": ..., ...} или позиционный массив в порядке COMPACT_FIELDS
+        
+    Returns:
+        GameInfo или None, если у элемента нет названия
+    """
+    if isinstance(item, list):
+        if len(item) < len(COMPACT_FIELDS):
+            item = item + [None] * (len(COMPACT_FIELDS) - len(item))
+        name, genres, platforms, released, rating, description = item[:len(COMPACT_FIELDS)]
+        background_image = None
+    elif isinstance(item, dict):
+        get = item.get
+        name, genres, platforms = get("name"), get("genres"), get("platforms")
+        released, rating, description = get("released"), get("rating"), get("description")
+        background_image = get("background_image")
+    else:
+        return None
+    
+    if not name:
+        return None
+    # Позиционные аргументы в порядке полей GameInfo: заметно быстрее именованных
+    return GameInfo(
+        name if type(name) is str else str(name),
+        _to_rating(rating),
+        _to_text(released),
+        _to_text(platforms),
+        _to_text(genres),
+        _to_text(description),
+        _to_text(background_image),
+    )
+
+
+def decode_games(content: str) -> Optional[List[GameInfo]]:
+    """
+    Однопроходный разбор ответа нейросети в список GameInfo.
+    
+    Вместо жадного регулярного выражения по всему тексту JSON декодируется
+    с первой подходящей открывающей скобки (raw_decode), остаток текста
+    не просматривается.
+    Поддерживаются массив объектов, массив позиционных массивов
+    и объект {"games": [...]} из structured outputs.
+    
+    Returns:
+        Список игр или None, если JSON в ответе не найден
+    """
+    for match in _JSON_START_RE.finditer(content):
+        try:
+            value, _ = _JSON_DECODER.raw_decode(content, match.start())
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            value = value.get("games")
+        if not isinstance(value, list):
+            continue
+        games = [game for game in map(game_from_raw, value) if game is not None]
+        if games or not value:
+            return games
+    return None
@@ -0,0 +1,179 @@
+"""
+Повторы запросов с экспоненциальной задержкой и автоматический выключатель (circuit breaker)
+"""
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """Неудачный запрос к OpenRouter"""
+
+    def __init__(self, message: str, status: Optional[int] = None,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        """Имеет ли смысл повторить запрос (сеть, тайм-аут, 408/429/5xx)"""
+        return self.status is None or self.status in (408, 429) or self.status >= 500
+
+    @property
+    def upstream_failure(self) -> bool:
+        """
+        Говорит ли ошибка о сбое на стороне OpenRouter (а не в нашем запросе).
+
+        429 - не сбой: сервер исправен и просит подождать, поэтому такая
+        ошибка выключатель не размыкает, а откладывает запросы (Retry-After).
+        """
+        return self.status is None or self.status == 408 or self.status >= 500
+
+
+class CircuitOpen(UpstreamError):
+    """Запрос не отправлен: выключатель модели разомкнут"""
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Значение заголовка Retry-After в секундах (число секунд или HTTP-дата)"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Повторы с экспоненциальной задержкой и «полным» джиттером.
+
+    Задержка перед n-й попыткой - случайная величина от 0 до
+    min(max_delay, base_delay * 2^n); если сервер прислал Retry-After,
+    ждём не меньше указанного. Все попытки укладываются в общий срок
+    deadline: если следующая попытка в него не помещается, повтора нет.
+    """
+
+    def __init__(self, attempts: int = None, base_delay: float = None,
+                 max_delay: float = None, deadline: float = None):
+        self.attempts = max(1, config.AI_RETRY_ATTEMPTS if attempts is None else attempts)
+        self.base_delay = config.AI_RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = config.AI_RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.deadline = config.AI_RETRY_DEADLINE if deadline is None else deadline
+
+    def next_delay(self, attempt: int, error: UpstreamError, remaining: float) -> Optional[float]:
+        """
+        Задержка перед следующей попыткой
+
+        Args:
+            attempt: Номер неудачной попытки (с нуля)
+            error: Ошибка этой попытки
+            remaining: Сколько секунд осталось до общего срока
+
+        Returns:
+            Задержка в секундах или None, если повторять не нужно
+        """
+        if not error.retryable or attempt + 1 >= self.attempts:
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if error.retry_after is not None:
+            delay = max(delay, error.retry_after)
+        # На саму попытку тоже нужно время - без запаса повтор бессмыслен
+        if delay + 1.0 > remaining:
+            return None
+        return delay
+
+
+class CircuitBreaker:
+    """
+    Автоматический выключатель для одной модели.
+
+    closed - запросы идут как обычно; после failure_threshold ошибок
+    подряд выключатель размыкается (open), и запросы сразу отклоняются,
+    не дожидаясь тайм-аута. Через recovery_timeout пропускается один
+    пробный запрос (half-open): успех замыкает выключатель, ошибка снова
+    размыкает его.
+
+    Ответ 429 выключатель не размыкает: по Retry-After запросы к модели
+    откладываются (defer) до указанного сервером времени.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = None, recovery_timeout: float = None):
+        self.name = name
+        self.failure_threshold = config.AI_BREAKER_THRESHOLD if failure_threshold is None else failure_threshold
+        self.recovery_timeout = config.AI_BREAKER_RECOVERY if recovery_timeout is None else recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+        self._retry_at = 0.0
+        self.rejected = 0
+        self.opened = 0
+        self.deferred = 0
+
+    def allow(self) -> bool:
+        """Можно ли отправить запрос прямо сейчас"""
+        if self.failure_threshold <= 0 or self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self._opened_at >= self.recovery_timeout:
+            self.state = self.HALF_OPEN
+            logger.info(f"Выключатель {self.name}: пробный запрос")
+        if self.state == self.HALF_OPEN and now - self._probe_started >= self.recovery_timeout:
+            # Одна проба за раз; зависшая проба не блокирует следующую навсегда
+            self._probe_started = now
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"Выключатель {self.name} замкнут: OpenRouter снова отвечает")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_started = 0.0
+
+    def record_failure(self):
+        if self.failure_threshold <= 0:
+            return
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+                logger.warning(f"Выключатель {self.name} разомкнут после {self.failures} ошибок подряд")
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_started = 0.0
+
+    def defer(self, seconds: float):
+        """Сервер ответил 429 с Retry-After: не отправлять запросы ещё seconds секунд"""
+        self._retry_at = max(self._retry_at, time.monotonic() + seconds)
+        self.deferred += 1
+
+    def wait_time(self) -> float:
+        """Сколько секунд осталось ждать по последнему Retry-After"""
+        return max(0.0, self._retry_at - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "deferred": self.deferred,
+        }
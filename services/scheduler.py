@@ -0,0 +1,239 @@
+"""
+Планировщик запросов к нейросети: ограничение параллелизма и честная очередь
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Optional, Set
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Колбэк, получающий позицию запроса в очереди (1 - следующий)
+PositionCallback = Callable[[int], Awaitable[None]]
+
+
+class SchedulerOverloaded(Exception):
+    """Запрос отклонён: очередь переполнена или ожидание слишком долгое"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Waiter:
+    """Запрос, ожидающий свободного слота"""
+
+    __slots__ = ("key", "granted", "moved", "enqueued_at")
+
+    def __init__(self, key: Hashable):
+        self.key = key
+        self.granted: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self.moved = asyncio.Event()
+        self.enqueued_at = time.monotonic()
+
+
+class FairScheduler:
+    """
+    Допуск запросов к нейросети.
+
+    Одновременно выполняется не больше max_concurrency запросов, у одного
+    пользователя - не больше одного. Остальные ждут в очередях по
+    пользователям, которые обслуживаются по кругу: пользователь с десятком
+    запросов не задерживает тех, у кого запрос один. Если очередь заполнена
+    или ожидание превысило max_wait, запрос отклоняется (SchedulerOverloaded),
+    а не висит до тайм-аута HTTP.
+    """
+
+    def __init__(self, max_concurrency: int = None, max_queue: int = None,
+                 max_queue_per_user: int = None, max_wait: float = None):
+        """
+        Args:
+            max_concurrency: Максимум одновременных запросов к нейросети
+            max_queue: Максимум ожидающих запросов всех пользователей
+            max_queue_per_user: Максимум ожидающих запросов одного пользователя
+            max_wait: Максимальное время ожидания в очереди, сек (0 - без ограничения)
+        """
+        self.max_concurrency = max(1, max_concurrency or config.AI_MAX_CONCURRENCY)
+        self.max_queue = config.AI_QUEUE_MAX if max_queue is None else max_queue
+        self.max_queue_per_user = config.AI_QUEUE_PER_USER if max_queue_per_user is None else max_queue_per_user
+        self.max_wait = config.AI_QUEUE_TIMEOUT if max_wait is None else max_wait
+        # Очереди пользователей в порядке обслуживания (круговой обход)
+        self._queues: "OrderedDict[Hashable, Deque[_Waiter]]" = OrderedDict()
+        self._busy: Set[Hashable] = set()
+        self.active = 0
+        self.queued = 0
+        # Метрики
+        self.admitted = 0
+        self.shed = 0
+        self.timeouts = 0
+        self.max_queued = 0
+        self._waits: Deque[float] = deque(maxlen=1000)
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[int] = None,
+                   on_position: Optional[PositionCallback] = None) -> AsyncIterator[None]:
+        """
+        Ожидание слота для запроса пользователя
+
+        Args:
+            user_id: ID пользователя (None - запрос без ограничения на пользователя)
+            on_position: Колбэк, вызываемый при изменении позиции в очереди
+
+        Raises:
+            SchedulerOverloaded: Запрос не допущен
+        """
+        key = user_id if user_id is not None else object()
+        waiter = self._enqueue(key)
+        try:
+            await self._wait(waiter, on_position)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        try:
+            yield
+        finally:
+            self._release(key)
+
+    def _enqueue(self, key: Hashable) -> _Waiter:
+        user_queue = self._queues.get(key)
+        if self.max_queue and self.queued >= self.max_queue:
+            self.shed += 1
+            raise SchedulerOverloaded("queue")
+        if user_queue and self.max_queue_per_user and len(user_queue) >= self.max_queue_per_user:
+            self.shed += 1
+            raise SchedulerOverloaded("user")
+
+        waiter = _Waiter(key)
+        if user_queue is None:
+            user_queue = self._queues[key] = deque()
+        user_queue.append(waiter)
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        self._dispatch()
+        return waiter
+
+    async def _wait(self, waiter: _Waiter, on_position: Optional[PositionCallback]):
+        """Ожидание допуска с уведомлением о смене позиции"""
+        deadline = waiter.enqueued_at + self.max_wait if self.max_wait else None
+        reported = 0
+        while not waiter.granted.done():
+            position = self.position(waiter)
+            if on_position is not None and position != reported:
+                reported = position
+                try:
+                    await on_position(position)
+                except Exception as e:
+                    logger.debug(f"Ошибка уведомления о позиции в очереди: {e}")
+                if waiter.granted.done():
+                    break
+
+            waiter.moved.clear()
+            moved = asyncio.ensure_future(waiter.moved.wait())
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                done, _ = await asyncio.wait({waiter.granted, moved}, timeout=timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                moved.cancel()
+            if not done:
+                self.timeouts += 1
+                self.shed += 1
+                raise SchedulerOverloaded("timeout")
+
+    def _dispatch(self):
+        """Выдача свободных слотов по кругу среди пользователей без активного запроса"""
+        granted = False
+        while self.active < self.max_concurrency:
+            key = next((k for k in self._queues if k not in self._busy), None)
+            if key is None:
+                break
+            user_queue = self._queues.pop(key)
+            waiter = user_queue.popleft()
+            if user_queue:
+                # Следующий запрос пользователя - в конец круга
+                self._queues[key] = user_queue
+            self.queued -= 1
+            self.active += 1
+            self.admitted += 1
+            self._busy.add(key)
+            self._waits.append(time.monotonic() - waiter.enqueued_at)
+            waiter.granted.set_result(None)
+            granted = True
+        if granted:
+            for user_queue in self._queues.values():
+                for waiter in user_queue:
+                    waiter.moved.set()
+
+    def _abandon(self, waiter: _Waiter):
+        """Отмена ожидания (тайм-аут, отмена обработчика)"""
+        if waiter.granted.done():
+            # Слот успели выдать - возвращаем его
+            self._release(waiter.key)
+            return
+        user_queue = self._queues.get(waiter.key)
+        if user_queue is None or waiter not in user_queue:
+            return
+        user_queue.remove(waiter)
+        if not user_queue:
+            del self._queues[waiter.key]
+        self.queued -= 1
+        for user_queue in self._queues.values():
+            for other in user_queue:
+                other.moved.set()
+
+    def _release(self, key: Hashable):
+        self.active -= 1
+        self._busy.discard(key)
+        self._dispatch()
+
+    def position(self, waiter: _Waiter) -> int:
+        """
+        Позиция запроса в очереди (1 - следующий).
+
+        Считается по круговому порядку обслуживания; пользователи с активным
+        запросом в нём тоже участвуют, поэтому оценка может быть чуть выше
+        фактической.
+        """
+        if waiter.granted.done():
+            return 0
+        user_queue = self._queues.get(waiter.key)
+        if user_queue is None:
+            return 0
+        rounds = user_queue.index(waiter)
+        position = rounds + 1
+        before = True
+        for key, other in self._queues.items():
+            if key == waiter.key:
+                before = False
+                continue
+            # За полные круги перед нашим плюс текущий круг, если пользователь раньше в круге
+            position += min(len(other), rounds + 1 if before else rounds)
+        return position
+
+    def stats(self) -> Dict[str, Any]:
+        """Глубина очереди, загрузка и время ожидания (по последним запросам)"""
+        waits = sorted(self._waits)
+
+        def quantile(q: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(len(waits) * q))] * 1000, 1)
+
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "queued_users": len(self._queues),
+            "max_queued": self.max_queued,
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            "wait_p50_ms": quantile(0.5),
+            "wait_p95_ms": quantile(0.95),
+            "wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
@@ -0,0 +1,262 @@
+"""
+Повторное использование ответов на похожие запросы: векторный индекс прошлых запросов
+"""
+import json
+import logging
+import math
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy нужен только для этого индекса
+    np = None
+
+import config
+from database.catalog import STOP_WORDS, stem, synonyms_for
+from database.db import AnyDatabase
+from database.models import GameInfo
+from services.parsing import game_from_raw
+from utils.text import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Длина символьных n-грамм: устойчивы к падежным окончаниям и опечаткам
+NGRAM = 3
+# Вес признака «слово целиком» относительно одной n-граммы
+WORD_WEIGHT = 2.0
+
+
+def query_features(text: str) -> Counter:
+    """
+    Признаки запроса: символьные триграммы слов и слова целиком.
+
+    Стоп-слова («хочу», «игру», «про») отбрасываются. Слова с синонимами
+    в каталоге заменяются ими («шутер» и «FPS» - оба «shooter»), у остальных
+    отсекается окончание («второй» и «вторую» - «втор»).
+    """
+    features: Counter = Counter()
+    for word in normalize_query(text).split():
+        if word in STOP_WORDS:
+            continue
+        for term in synonyms_for(word) or [stem(word)]:
+            features["w:" + term] += WORD_WEIGHT
+            padded = f" {term} "
+            for i in range(max(1, len(padded) - NGRAM + 1)):
+                features[padded[i:i + NGRAM]] += 1.0
+    return features
+
+
+class SimilarityIndex:
+    """
+    Индекс прошлых запросов для ответа на перефразированные запросы.
+
+    Запрос превращается в вектор хэшированием признаков (feature hashing)
+    в dim измерений с весами TF-IDF; векторы нормированы, поэтому косинусная
+    близость - это скалярное произведение, и поиск по всем записям - одно
+    умножение матрицы на вектор. IDF обновляется при каждом добавлении,
+    у сохранённых векторов веса фиксируются в момент добавления.
+
+    Размер ограничен max_entries: при заполнении вытесняется запись, которую
+    дольше всех не использовали; записи старше ttl не выдаются и удаляются.
+    Индекс живёт в памяти процесса и при запуске заполняется из кэша
+    рекомендаций в БД.
+    """
+
+    def __init__(self, dim: int = None, max_entries: int = None, threshold: float = None,
+                 ttl: float = None):
+        """
+        Args:
+            dim: Размерность векторов
+            max_entries: Максимум запросов в индексе
+            threshold: Минимальная косинусная близость для повторного ответа
+            ttl: Время жизни записи в секундах (0 - без ограничения)
+        """
+        if np is None:
+            raise RuntimeError("Для индекса похожих запросов нужен numpy (pip install numpy)")
+        self.dim = dim or config.SIMILARITY_DIM
+        self.max_entries = max(1, max_entries or config.SIMILARITY_MAX_ENTRIES)
+        self.threshold = config.SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.ttl = config.CACHE_TTL_SECONDS if ttl is None else ttl
+        # Строки матрицы выделяются по мере роста индекса (удвоением), а не сразу
+        self._matrix = np.zeros((min(1024, self.max_entries), self.dim), dtype=np.float32)
+        self._created = np.zeros(len(self._matrix), dtype=np.float64)
+        self._used = np.zeros(len(self._matrix), dtype=np.float64)
+        self._keys: List[Optional[str]] = [None] * len(self._matrix)
+        self._games: List[Optional[List[GameInfo]]] = [None] * len(self._matrix)
+        self._rows: Dict[str, int] = {}
+        self._free: List[int] = []
+        self._size = 0
+        # Документная частота по измерениям (для IDF) и число документов
+        self._df = np.zeros(self.dim, dtype=np.float64)
+        self._docs = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _hashed(self, text: str) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Индексы измерений и знаковые веса TF признаков запроса"""
+        features = query_features(text)
+        indices = np.empty(len(features), dtype=np.int64)
+        weights = np.empty(len(features), dtype=np.float32)
+        for i, (feature, count) in enumerate(features.items()):
+            h = zlib.crc32(feature.encode("utf-8"))
+            indices[i] = h % self.dim
+            # Знак из старшего бита: коллизии хэша гасят друг друга, а не складываются
+            weights[i] = (1.0 + math.log(count)) * (1.0 if h & 0x80000000 else -1.0)
+        return indices, weights
+
+    def _vector(self, indices: "np.ndarray", weights: "np.ndarray") -> "np.ndarray":
+        idf = np.log((self._docs + 1.0) / (self._df[indices] + 1.0)) + 1.0
+        vector = np.zeros(self.dim, dtype=np.float32)
+        np.add.at(vector, indices, weights * idf.astype(np.float32))
+        norm = float(np.linalg.norm(vector))
+        if norm:
+            vector /= norm
+        return vector
+
+    def embed(self, text: str) -> "np.ndarray":
+        """Нормированный вектор запроса"""
+        return self._vector(*self._hashed(text))
+
+    def add(self, key: str, games: List[GameInfo], created_at: float = None):
+        """Добавление (или обновление) запроса с ответом на него"""
+        if not key or not games:
+            return
+        indices, weights = self._hashed(key)
+        if not len(indices):
+            return
+        row = self._rows.get(key)
+        if row is None:
+            np.add.at(self._df, np.unique(indices), 1.0)
+            self._docs += 1
+            row = self._allocate()
+            self._rows[key] = row
+            self._keys[row] = key
+        self._matrix[row] = self._vector(indices, weights)
+        self._games[row] = games
+        self._created[row] = created_at if created_at is not None else time.time()
+        self._used[row] = time.monotonic()
+
+    def _allocate(self) -> int:
+        """Свободная строка матрицы: из освобождённых, новая или на месте вытесненной"""
+        if self._free:
+            return self._free.pop()
+        if self._size == len(self._matrix) and self._size < self.max_entries:
+            self._grow(min(self.max_entries, self._size * 2))
+        if self._size < len(self._matrix):
+            self._size += 1
+            return self._size - 1
+        # Индекс заполнен - вытесняем давно не использованную запись
+        row = int(np.argmin(self._used[:self._size]))
+        self._remove(row)
+        self.evictions += 1
+        return self._free.pop()
+
+    def _grow(self, capacity: int):
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
+        self._created = np.concatenate([self._created, np.zeros(capacity - len(self._created))])
+        self._used = np.concatenate([self._used, np.zeros(capacity - len(self._used))])
+        self._keys.extend([None] * (capacity - len(self._keys)))
+        self._games.extend([None] * (capacity - len(self._games)))
+
+    def _remove(self, row: int):
+        key = self._keys[row]
+        if key is None:
+            return
+        del self._rows[key]
+        # Те же измерения, что учтены в add(): по ненулевым элементам вектора
+        # их не восстановить - знаковые коллизии дают в сумме ровно 0
+        indices = np.unique(self._hashed(key)[0])
+        self._df[indices] = np.maximum(0.0, self._df[indices] - 1.0)
+        self._docs = max(0, self._docs - 1)
+        self._matrix[row] = 0.0
+        self._keys[row] = None
+        self._games[row] = None
+        # Свободная строка не должна выигрывать в argmin вместо занятых
+        self._used[row] = math.inf
+        self._free.append(row)
+
+    def search(self, text: str, k: int = 5) -> List[Tuple[str, float]]:
+        """
+        Ближайшие сохранённые запросы
+
+        Returns:
+            Пары (ключ запроса, косинусная близость) по убыванию близости
+        """
+        if not self._rows:
+            return []
+        scores = self._matrix[:self._size] @ self.embed(text)
+        k = min(k, self._size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._keys[row], float(scores[row])) for row in top if self._keys[row] is not None]
+
+    def get(self, text: str) -> Optional[Tuple[str, float, List[GameInfo]]]:
+        """
+        Ответ на самый похожий запрос, если близость не ниже порога
+
+        Returns:
+            (ключ похожего запроса, близость, игры) или None
+        """
+        now = time.time()
+        for key, score in self.search(text, k=3):
+            if score < self.threshold:
+                break
+            row = self._rows[key]
+            if self.ttl and self._created[row] + self.ttl <= now:
+                self._remove(row)
+                continue
+            self._used[row] = time.monotonic()
+            self.hits += 1
+            return key, score, self._games[row]
+        self.misses += 1
+        return None
+
+    async def warm_up(self, database: AnyDatabase) -> int:
+        """Заполнение индекса свежими записями кэша рекомендаций из БД"""
+        rows = await database.get_recent_cached_recommendations(self.ttl, self.max_entries)
+        # От старых к новым: при переполнении вытесняются самые старые
+        for key, payload, created_at in reversed(rows):
+            games = [game for game in map(game_from_raw, json.loads(payload)) if game is not None]
+            self.add(key, games, created_at=created_at)
+        logger.info(f"Индекс похожих запросов: загружено {len(self)} запросов")
+        return len(self)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "max_size": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_mb": round(self._matrix.nbytes / 2 ** 20, 1),
+        }
+
+
+def create_similarity_index() -> Optional[SimilarityIndex]:
+    """
+    Индекс похожих запросов, если он включён в настройках и numpy установлен
+
+    Срок жизни записей индекса - CACHE_TTL_SECONDS. Для кэша 0 означает
+    «кэш выключен», а для индекса - «без срока», поэтому при выключенном
+    кэше индекс не создаётся: иначе ответы повторялись бы бессрочно.
+    """
+    if not config.SIMILARITY_ENABLED:
+        return None
+    if config.CACHE_TTL_SECONDS <= 0:
+        logger.warning("SIMILARITY_ENABLED=1, но кэш выключен (CACHE_TTL_SECONDS=0) - индекс похожих запросов отключён")
+        return None
+    if np is None:
+        logger.warning("SIMILARITY_ENABLED=1, но numpy не установлен - индекс похожих запросов отключён")
+        return None
+    return SimilarityIndex()
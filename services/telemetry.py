@@ -0,0 +1,275 @@
+"""
+Телеметрия запросов к нейросети: токены, стоимость и разбивка задержки
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import config
+from database.db import AnyDatabase, db
+from services.hedging import LatencyWindow
+from services.metrics import ai_calls, ai_stage_seconds, telemetry_dropped
+
+logger = logging.getLogger(__name__)
+
+# Строка таблицы ai_usage: (created_at, user_id, model, stream, status, attempts,
+# queue_ms, ttfb_ms, generation_ms, total_ms, prompt_tokens, completion_tokens, cost, games)
+UsageRow = Tuple[int, Optional[int], str, int, str, int,
+                 int, Optional[int], Optional[int], int,
+                 Optional[int], Optional[int], Optional[float], int]
+
+
+class ModelCall:
+    """
+    Один запрос к модели (все его повторы)
+
+    Отметки времени - time.monotonic(). queue_wait - сколько запрос
+    пользователя ждал слота планировщика: при хеджировании она общая
+    для запросов ко всем моделям.
+    """
+
+    __slots__ = ("model", "user_id", "stream", "queue_wait", "started", "first_byte",
+                 "attempts", "prompt_tokens", "completion_tokens", "cost", "games")
+
+    def __init__(self, model: str, user_id: Optional[int] = None, stream: bool = False,
+                 queue_wait: float = 0.0):
+        self.model = model
+        self.user_id = user_id
+        self.stream = stream
+        self.queue_wait = queue_wait
+        self.started = time.monotonic()
+        # Заголовки ответа (обычный запрос) или первый токен (поток)
+        self.first_byte: Optional[float] = None
+        self.attempts = 0
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.cost: Optional[float] = None
+        self.games = 0
+
+    def mark_first_byte(self):
+        if self.first_byte is None:
+            self.first_byte = time.monotonic()
+
+    def set_usage(self, usage: Optional[Dict[str, Any]]):
+        """Данные из блока usage ответа OpenRouter"""
+        if not usage:
+            return
+        self.prompt_tokens = usage.get("prompt_tokens", self.prompt_tokens)
+        self.completion_tokens = usage.get("completion_tokens", self.completion_tokens)
+        self.cost = usage.get("cost", self.cost)
+
+
+class ModelStats:
+    """Скользящие квантили задержек и суммарные счётчики одной модели"""
+
+    def __init__(self, window: int):
+        self.queue = LatencyWindow(window)
+        self.ttfb = LatencyWindow(window)
+        self.generation = LatencyWindow(window)
+        self.total = LatencyWindow(window)
+        self.prompt_tokens = LatencyWindow(window)
+        self.completion_tokens = LatencyWindow(window)
+        self.calls = 0
+        self.statuses: Dict[str, int] = {}
+        self.prompt_tokens_total = 0
+        self.completion_tokens_total = 0
+        self.cost_total = 0.0
+
+    def add(self, call: ModelCall, status: str, finished: float):
+        self.calls += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status != "ok":
+            # Задержки неудачных и отменённых запросов исказили бы квантили
+            return
+        self.queue.add(call.queue_wait)
+        self.total.add(call.queue_wait + finished - call.started)
+        if call.first_byte is not None:
+            self.ttfb.add(call.first_byte - call.started)
+            self.generation.add(finished - call.first_byte)
+        if call.prompt_tokens is not None:
+            self.prompt_tokens.add(call.prompt_tokens)
+            self.prompt_tokens_total += call.prompt_tokens
+        if call.completion_tokens is not None:
+            self.completion_tokens.add(call.completion_tokens)
+            self.completion_tokens_total += call.completion_tokens
+        if call.cost is not None:
+            self.cost_total += call.cost
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(window: LatencyWindow, q: float) -> Optional[float]:
+            value = window.quantile(q)
+            return None if value is None else round(value * 1000, 1)
+
+        def tokens(window: LatencyWindow, q: float) -> Optional[int]:
+            value = window.quantile(q)
+            return None if value is None else int(value)
+
+        result: Dict[str, Any] = {
+            "calls": self.calls,
+            "statuses": dict(self.statuses),
+            "prompt_tokens": self.prompt_tokens_total,
+            "completion_tokens": self.completion_tokens_total,
+            "cost": round(self.cost_total, 6),
+        }
+        for name, window in (("queue", self.queue), ("ttfb", self.ttfb),
+                             ("generation", self.generation), ("total", self.total)):
+            result[f"{name}_p50_ms"] = ms(window, 0.5)
+            result[f"{name}_p95_ms"] = ms(window, 0.95)
+        for name, window in (("prompt", self.prompt_tokens), ("completion", self.completion_tokens)):
+            result[f"{name}_tokens_p50"] = tokens(window, 0.5)
+            result[f"{name}_tokens_p95"] = tokens(window, 0.95)
+        return result
+
+
+class Telemetry:
+    """
+    Учёт запросов к нейросети.
+
+    По каждой модели в памяти держатся скользящие квантили задержек
+    (ожидание в очереди, до первого байта, генерация, всего) и токенов,
+    а также суммарные счётчики. Каждый запрос дополнительно сохраняется
+    строкой в таблицу ai_usage; строки копятся в памяти и записываются
+    транзакциями по flush_size строк, как история запросов в режиме
+    write-behind. Пока запись не удаётся, очередь ограничена pending_max
+    строками: самые старые сверх предела отбрасываются.
+    """
+
+    def __init__(self, database: AnyDatabase, enabled: bool = None, window: int = None,
+                 flush_size: int = None, flush_interval: float = None):
+        self.database = database
+        self.enabled = config.TELEMETRY_ENABLED if enabled is None else enabled
+        self.window = window or config.TELEMETRY_WINDOW
+        self.flush_size = flush_size or config.TELEMETRY_FLUSH_SIZE
+        self.flush_interval = flush_interval or config.TELEMETRY_FLUSH_INTERVAL
+        self.pending_max = config.TELEMETRY_PENDING_MAX
+        self.pending_dropped = 0
+        self._models: Dict[str, ModelStats] = {}
+        self._pending: List[UsageRow] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_wakeup = asyncio.Event()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.started_at = time.time()
+
+    def begin(self, model: str, user_id: Optional[int] = None, stream: bool = False,
+              queue_wait: float = 0.0) -> ModelCall:
+        """Начало запроса к модели"""
+        return ModelCall(model, user_id=user_id, stream=stream, queue_wait=queue_wait)
+
+    def finish(self, call: ModelCall, status: str):
+        """
+        Завершение запроса к модели
+
+        Args:
+            call: Запрос из begin()
+            status: ok, error, empty (ответ без игр), circuit_open или cancelled
+        """
+        finished = time.monotonic()
+        # Гистограммы Prometheus ведутся и без записи телеметрии в БД
+        ai_calls.inc(call.model, status)
+        if status == "ok":
+            ai_stage_seconds.observe(call.queue_wait, call.model, "queue")
+            ai_stage_seconds.observe(call.queue_wait + finished - call.started, call.model, "total")
+            if call.first_byte is not None:
+                ai_stage_seconds.observe(call.first_byte - call.started, call.model, "ttfb")
+                ai_stage_seconds.observe(finished - call.first_byte, call.model, "generation")
+        if not self.enabled:
+            return
+        model_stats = self._models.get(call.model)
+        if model_stats is None:
+            model_stats = self._models[call.model] = ModelStats(self.window)
+        model_stats.add(call, status, finished)
+
+        def ms(seconds: Optional[float]) -> Optional[int]:
+            return None if seconds is None else int(seconds * 1000)
+
+        ttfb = None if call.first_byte is None else call.first_byte - call.started
+        generation = None if call.first_byte is None else finished - call.first_byte
+        self._pending.append((
+            int(time.time()), call.user_id, call.model, int(call.stream), status, call.attempts,
+            ms(call.queue_wait), ms(ttfb), ms(generation), ms(call.queue_wait + finished - call.started),
+            call.prompt_tokens, call.completion_tokens, call.cost, call.games,
+        ))
+        if not self._flush_lock.locked():
+            # Во время записи начало очереди - записываемая пачка, её не трогаем
+            self._trim_pending()
+        if len(self._pending) >= self.flush_size:
+            self._flush_wakeup.set()
+
+    def _trim_pending(self):
+        """Отбрасывание самых старых строк сверх pending_max (с записью в лог)"""
+        extra = len(self._pending) - self.pending_max
+        if self.pending_max <= 0 or extra <= 0:
+            return
+        del self._pending[:extra]
+        self.pending_dropped += extra
+        telemetry_dropped.inc(amount=extra)
+        logger.warning(
+            f"Очередь записи телеметрии переполнена ({self.pending_max} строк): "
+            f"потеряно {extra}, всего {self.pending_dropped}"
+        )
+
+    async def start(self):
+        """Запуск фоновой записи строк в ai_usage"""
+        if self.enabled and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Остановка фоновой записи и сброс накопленных строк"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Ошибка записи телеметрии: {e}")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                # Строки остаются в очереди и будут записаны следующей попыткой
+                logger.error(f"Ошибка записи телеметрии: {e}")
+
+    async def flush(self) -> int:
+        """
+        Запись накопленных строк транзакциями не больше flush_size строк
+
+        Returns:
+            Количество записанных строк
+        """
+        async with self._flush_lock:
+            written = 0
+            while self._pending:
+                batch = self._pending[:self.flush_size]
+                try:
+                    await self.database.save_ai_usage(batch)
+                except BaseException:
+                    # Строки остаются в очереди до следующей попытки, но не сверх предела
+                    self._trim_pending()
+                    raise
+                del self._pending[:len(batch)]
+                written += len(batch)
+            return written
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Статистика по моделям с момента запуска процесса"""
+        return {model: model_stats.stats() for model, model_stats in self._models.items()}
+
+    async def summary(self, hours: float = 24) -> List[Dict[str, Any]]:
+        """Сводка по моделям из ai_usage за последние hours часов (все процессы)"""
+        return await self.database.get_ai_usage_summary(int(time.time() - hours * 3600))
+
+
+# Глобальный экземпляр телеметрии
+telemetry = Telemetry(db)
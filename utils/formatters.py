@@ -2,8 +2,10 @@
 Утилиты для форматирования вывода информации
 """
 from database.models import GameInfo
-from typing import List
-from datetime import datetime, timezone, timedelta
+from typing import Iterable, List, Union
+from datetime import datetime, timezone, timedelta, tzinfo
+from functools import lru_cache
+import time
 try:
     from zoneinfo import ZoneInfo  # Python 3.9+
 except Exception:  # pragma: no cover
@@ -66,12 +68,13 @@ def format_games_list(games: List[GameInfo]) -> str:
     return result
 
 
-def format_history(history_items: List[tuple]) -> str:
+def format_history(history_items: List[tuple], start: int = 1) -> str:
     """
     Форматирование истории запросов
     
     Args:
-        history_items: Список кортежей (query_text, timestamp)
+        history_items: Список кортежей (query_text, created_at в секундах Unix)
+        start: Номер первой строки (для страниц истории)
         
     Returns:
         Отформатированная строка с историей
@@ -79,14 +82,15 @@ def format_history(history_items: List[tuple]) -> str:
     if not history_items:
         return "📭 История запросов пуста."
     
-    result = "📚 <b>Ваша история запросов:</b>\n\n"
+    parts = ["📚 <b>Ваша история запросов:</b>\n\n"]
     
-    for i, (query, timestamp) in enumerate(history_items, 1):
-        # Форматирование даты с переводом в UTC+offset (по умолчанию +5)
-        date_str = to_local_time_str(timestamp)
-        result += f"{i}. <i>{query}</i>\n   🕐 {date_str}\n\n"
+    # Время всех строк переводится в местное одним вызовом
+    dates = format_local_times([created_at for _, created_at in history_items])
+    for i, ((query, _), date_str) in enumerate(zip(history_items, dates), start):
+        # Запрос - текст пользователя: без экранирования «<» сломает разметку сообщения
+        parts.append(f"{i}. <i>{escape_html(query)}</i>\n   🕐 {date_str}\n\n")
     
-    return result
+    return "".join(parts)
 
 
 def escape_html(text: str) -> str:
@@ -102,55 +106,75 @@ def escape_html(text: str) -> str:
     if not text:
         return ""
     
-    replacements = {
-        "&": "&amp;",
-        "<": "&lt;",
-        ">": "&gt;",
-        '"': "&quot;",
-        "'": "&#x27;"
-    }
-    
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    
-    return text
+    # «&» заменяется первым, чтобы не экранировать уже готовые сущности
+    return (text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+            .replace('"', "&quot;").replace("'", "&#x27;"))
 
 
-def to_local_time_str(ts: str) -> str:
+@lru_cache(maxsize=1)
+def local_timezone() -> tzinfo:
     """
-    Конвертирует строковый timestamp из БД (UTC) в локальное время по смещению.
-    Ожидает форматы вида 'YYYY-MM-DD HH:MM:SS' или ISO 'YYYY-MM-DDTHH:MM:SS'.
-    Возвращает строку 'YYYY-MM-DD HH:MM'.
+    Часовой пояс для отображения времени: TIMEZONE_NAME, а если он не задан
+    или недоступен - фиксированное смещение TIMEZONE_OFFSET_HOURS (по умолчанию +5)
     """
-    if not ts:
-        return ""
-    try:
-        clean = ts.strip().replace("Z", "")
-        # fromisoformat поддерживает как ' ' так и 'T' между датой и временем
-        dt = datetime.fromisoformat(clean)
-    except Exception:
-        # fallback для явного формата SQLite
-        try:
-            dt = datetime.strptime(ts[:19], "%Y-%m-%d %H:%M:%S")
-        except Exception:
-            return ts[:16].replace('T', ' ')
-
-    # Считаем, что исходное время в БД — UTC без таймзоны
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=timezone.utc)
-    else:
-        dt = dt.astimezone(timezone.utc)
-
-    # Пытаемся применить именованную таймзону, если доступна
     tz_name = getattr(config, "TIMEZONE_NAME", None)
     if tz_name and ZoneInfo is not None:
         try:
-            local_dt = dt.astimezone(ZoneInfo(tz_name))
-            return local_dt.strftime("%Y-%m-%d %H:%M")
+            return ZoneInfo(tz_name)
         except Exception:
             pass
+    return timezone(timedelta(hours=getattr(config, "TIMEZONE_OFFSET_HOURS", 5)))
+
+
+# Переходы на летнее время и обратно происходят на границе 15 минут (UTC),
+# поэтому смещение внутри такого интервала постоянно и его можно кэшировать
+_OFFSET_STEP = 900
+
+
+@lru_cache(maxsize=4096)
+def _utc_offset(step: int) -> int:
+    """Смещение местного времени от UTC (в секундах) для интервала номер step"""
+    return int(datetime.fromtimestamp(step * _OFFSET_STEP, local_timezone()).utcoffset().total_seconds())
+
 
-    # Фоллбек: используем сдвиг в часах
-    offset_hours = getattr(config, "TIMEZONE_OFFSET_HOURS", 5)
-    local_dt = dt + timedelta(hours=offset_hours)
-    return local_dt.strftime("%Y-%m-%d %H:%M")
+@lru_cache(maxsize=1024)
+def _local_date(day: int) -> str:
+    """Дата 'YYYY-MM-DD' для номера местного дня от 1970-01-01"""
+    return time.strftime("%Y-%m-%d", time.gmtime(day * 86400))
+
+
+def format_local_times(timestamps: Iterable[int]) -> List[str]:
+    """
+    Перевод времени из секунд Unix (UTC) в строки 'YYYY-MM-DD HH:MM' местного времени
+
+    Смещение часового пояса и дата берутся из кэша, часы и минуты
+    считаются арифметикой - без datetime на каждую строку.
+    """
+    result = []
+    for ts in timestamps:
+        local = int(ts) + _utc_offset(int(ts) // _OFFSET_STEP)
+        day, seconds = divmod(local, 86400)
+        result.append(f"{_local_date(day)} {seconds // 3600:02d}:{seconds % 3600 // 60:02d}")
+    return result
+
+
+def to_local_time_str(ts: Union[int, str]) -> str:
+    """
+    Переводит время из БД (UTC) в местное: 'YYYY-MM-DD HH:MM'.
+    Принимает секунды Unix, а также строки вида 'YYYY-MM-DD HH:MM:SS'
+    или ISO 'YYYY-MM-DDTHH:MM:SS' (формат истории до миграции схемы).
+    """
+    if ts is None or ts == "":
+        return ""
+    if isinstance(ts, str):
+        try:
+            clean = ts.strip().replace("Z", "")
+            # fromisoformat поддерживает как ' ' так и 'T' между датой и временем
+            dt = datetime.fromisoformat(clean)
+        except Exception:
+            return ts[:16].replace('T', ' ')
+        # Считаем, что исходное время в БД — UTC без таймзоны
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        ts = int(dt.timestamp())
+    return format_local_times([ts])[0]
@@ -0,0 +1,29 @@
+"""
+Стабильное распределение пользователей по корзинам (шардам, воркерам)
+"""
+
+_MASK64 = (1 << 64) - 1
+
+
+def user_bucket(user_id: int, buckets: int) -> int:
+    """
+    Номер корзины для пользователя.
+    
+    ID Telegram перемешиваются финализатором splitmix64, чтобы корзины
+    заполнялись равномерно независимо от закономерностей в самих ID.
+    Результат не зависит от процесса и запуска (в отличие от hash()).
+    
+    Args:
+        user_id: ID пользователя Telegram
+        buckets: Количество корзин
+        
+    Returns:
+        Число от 0 до buckets - 1
+    """
+    if buckets <= 1:
+        return 0
+    x = user_id & _MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK64
+    x ^= x >> 31
+    return x % buckets
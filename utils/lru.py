@@ -0,0 +1,93 @@
+"""
+Ограниченный по размеру LRU-кэш с необязательным временем жизни записей
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[V]):
+    """
+    LRU-кэш с ограничением по количеству записей и TTL.
+    
+    Рассчитан на использование из одного event loop, поэтому
+    обходится без блокировок.
+    """
+    
+    def __init__(self, max_size: int, ttl: Optional[float] = None):
+        """
+        Args:
+            max_size: Максимальное количество записей
+            ttl: Время жизни записи в секундах (None - без ограничения)
+        """
+        self.max_size = max(1, max_size)
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key, touch=False) is not _MISSING
+    
+    def _lookup(self, key: Hashable, touch: bool) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            return _MISSING
+        expires_at, value = item
+        if expires_at and expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return _MISSING
+        if touch:
+            self._data.move_to_end(key)
+        return value
+    
+    def get(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        """Получение значения с учётом TTL (обновляет позицию в LRU)"""
+        value = self._lookup(key, touch=True)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+    
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None):
+        """Добавление значения; при переполнении вытесняется самая старая запись"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+    
+    def pop(self, key: Hashable, default: Optional[V] = None) -> Optional[V]:
+        """Удаление записи"""
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+    
+    def clear(self):
+        """Очистка кэша (счётчики сохраняются)"""
+        self._data.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий, промахов и вытеснений"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,56 @@
+"""
+Утилиты для нормализации текста запросов
+"""
+import re
+import unicodedata
+
+# Латинские буквы, визуально совпадающие с кириллическими (в нижнем регистре)
+_LATIN_TO_CYRILLIC = str.maketrans({
+    "a": "а", "b": "в", "c": "с", "e": "е", "h": "н", "k": "к", "m": "м",
+    "o": "о", "p": "р", "t": "т", "x": "х", "y": "у",
+})
+_CYRILLIC_TO_LATIN = str.maketrans({
+    cyr: lat for lat, cyr in (
+        ("a", "а"), ("b", "в"), ("c", "с"), ("e", "е"), ("h", "н"), ("k", "к"), ("m", "м"),
+        ("o", "о"), ("p", "р"), ("t", "т"), ("x", "х"), ("y", "у"),
+    )
+})
+
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+_CYRILLIC_RE = re.compile(r"[а-я]")
+_LATIN_RE = re.compile(r"[a-z]")
+
+
+def _fix_mixed_script(word: str) -> str:
+    """
+    Приведение слова со смешанными алфавитами к одному алфавиту.
+    Побеждает алфавит, букв которого в слове больше.
+    """
+    cyrillic = len(_CYRILLIC_RE.findall(word))
+    latin = len(_LATIN_RE.findall(word))
+    if not cyrillic or not latin:
+        return word
+    if cyrillic >= latin:
+        return word.translate(_LATIN_TO_CYRILLIC)
+    return word.translate(_CYRILLIC_TO_LATIN)
+
+
+def normalize_query(text: str) -> str:
+    """
+    Нормализация поискового запроса для использования в качестве ключа кэша.
+    
+    Приводит к нижнему регистру, убирает пунктуацию и лишние пробелы,
+    заменяет «ё» на «е» и исправляет слова, набранные вперемешку
+    латиницей и кириллицей («RPG с oткрытым мирoм» -> «rpg с открытым миром»).
+    
+    Args:
+        text: Исходный запрос пользователя
+        
+    Returns:
+        Нормализованная строка
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold().replace("ё", "е")
+    words = _NON_WORD_RE.sub(" ", text).split()
+    return " ".join(_fix_mixed_script(word) for word in words)
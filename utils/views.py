@@ -0,0 +1,244 @@
+"""
+Тексты сообщений бота: статические экраны и ответ с рекомендациями
+"""
+import html
+import math
+import re
+from typing import List, Optional
+
+from database.models import GameInfo
+from utils.formatters import escape_html
+
+# Ограничение Telegram на длину сообщения (в единицах UTF-16 после разбора разметки)
+MESSAGE_LIMIT = 4096
+
+# Сколько символов каждого текстового поля игры показывать. Ограничены все
+# поля из ответа нейросети или каталога, поэтому блок одной игры (около 2000
+# символов после разбора разметки) всегда меньше MESSAGE_LIMIT и сообщение
+# делится только между играми
+MAX_DESCRIPTION_LENGTH = 1000
+MAX_NAME_LENGTH = 200
+MAX_FIELD_LENGTH = 200
+MAX_RELEASED_LENGTH = 20
+
+SEPARATOR = "─" * 30
+
+WELCOME_TEXT = """
+👋 <b>Добро пожаловать в бота для поиска игр!</b>
+
+Я помогу вам найти идеальную игру по вашему описанию!
+Просто опишите, что вы хотите, и я подберу 3-5 подходящих игр.
+
+<b>Доступные команды:</b>
+🔍 /search - поиск игр по описанию
+📚 /history - история ваших запросов
+❓ /help - подробная справка
+ℹ️ /info - информация о проекте
+
+Используйте кнопки ниже для быстрого доступа:
+"""
+
+MAIN_MENU_TEXT = """
+👋 <b>Главное меню</b>
+
+Выберите действие из списка ниже:
+"""
+
+HELP_TEXT = """
+❓ <b>Подробная справка по использованию бота</b>
+
+<b>🔍 Поиск игр (/search)</b>
+Опишите игру, которую вы ищете. Например:
+• "Хочу RPG с открытым миром и красивой графикой"
+• "Стратегия про космос с элементами выживания"
+• "Шутер от первого лица с кооперативом"
+• "Игра как Skyrim, но про самураев"
+
+Бот проанализирует ваш запрос и подберет 3-5 подходящих игр.
+
+<b>📚 История запросов (/history)</b>
+Просмотр всех ваших предыдущих запросов. Вы можете очистить историю в любой момент.
+
+<b>ℹ️ О проекте (/info)</b>
+Информация о технологиях, использованных в боте, и авторах проекта.
+
+<b>💡 Советы для лучших результатов:</b>
+• Описывайте игру подробно (жанр, геймплей, атмосфера)
+• Можно упоминать похожие игры
+• Указывайте предпочтения по платформе
+• Пишите на русском или английском языке
+
+<b>⚙️ Как это работает:</b>
+1. Вы отправляете описание
+2. Нейросеть анализирует ваш запрос
+3. Бот ищет подходящие игры в базе RAWG
+4. Вы получаете список с подробной информацией
+
+Если у вас возникли проблемы, попробуйте переформулировать запрос или сделать его более конкретным.
+"""
+
+INFO_TEXT = """
+ℹ️ <b>Информация о проекте</b>
+
+<b>🎮 О боте:</b>
+Telegram-бот для поиска видеоигр по описанию с использованием искусственного интеллекта.
+
+<b>🛠 Технологический стек:</b>
+• <b>Python 3.10+</b> - язык программирования
+• <b>aiogram 3.x</b> - асинхронный фреймворк для Telegram Bot API
+• <b>OpenRouter API</b> - доступ к LLM моделям (DeepSeek)
+• <b>RAWG API</b> - крупнейшая база данных видеоигр
+• <b>SQLite3</b> - локальная база данных для истории
+• <b>aiohttp</b> - асинхронные HTTP-запросы
+
+<b>⚡ Возможности:</b>
+✅ Интеллектуальный поиск игр по описанию
+✅ Подробная информация о каждой игре
+✅ История поиска для каждого пользователя
+✅ Поддержка русского и английского языков
+✅ Интуитивный интерфейс с inline-кнопками
+
+<b>👨‍💻 Авторы:</b>
+• [Укажите имена и группу самостоятельно]
+
+<b>📅 Дата создания:</b>
+Ноябрь 2025
+
+<b>🔗 Полезные ссылки:</b>
+• Исходный код: [Добавьте ссылку на GitHub]
+• Документация RAWG: https://rawg.io/apidocs
+• OpenRouter: https://openrouter.ai/
+
+<b>📧 Обратная связь:</b>
+По всем вопросам и предложениям обращайтесь: [Ваш контакт]
+"""
+
+SEARCH_PROMPT_TEXT = """
+🔍 <b>Поиск игр по описанию</b>
+
+Опишите игру, которую вы ищете. Будьте максимально конкретны!
+
+<b>Примеры хороших запросов:</b>
+• "Ищу RPG с открытым миром, драконами и магией"
+• "Хочу шутер от первого лица про вторую мировую войну"
+• "Нужна стратегия про космос с элементами строительства базы"
+• "Игра как The Witcher, но про самураев в Японии"
+
+Просто отправьте сообщение с вашим описанием!
+Для отмены введите /cancel
+"""
+
+NO_RECOMMENDATIONS_TEXT = (
+    "😔 Не удалось получить рекомендации.\n\n"
+    "Возможные причины:\n"
+    "• Неправильный API ключ OpenRouter\n"
+    "• Недостаточно кредитов на балансе\n"
+    "• Проблемы с подключением\n\n"
+    "Проверьте настройки и попробуйте позже."
+)
+
+CONFIRM_CLEAR_TEXT = """
+⚠️ <b>Подтверждение действия</b>
+
+Вы уверены, что хотите очистить всю историю запросов?
+Это действие нельзя отменить.
+"""
+
+HISTORY_CLEARED_TEXT = """
+✅ <b>История успешно очищена!</b>
+
+Ваша история запросов была полностью удалена.
+"""
+
+RECOMMENDATIONS_HEADER = "🎮 <b>Рекомендации для вас:</b>\n\n"
+RECOMMENDATIONS_PENDING = "⏳ <i>Подбираю ещё игры...</i>"
+
+
+_TAG_RE = re.compile(r"<[^>]*>")
+
+
+def message_length(text: str) -> int:
+    """
+    Длина HTML-текста так, как её считает Telegram: после разбора разметки
+    (без тегов, &amp; и т.п. - один символ), в единицах UTF-16
+    """
+    visible = html.unescape(_TAG_RE.sub("", text))
+    return len(visible.encode("utf-16-le")) // 2
+
+
+def _clip(text: str, limit: int) -> str:
+    """Обрезка текста до экранирования (чтобы не разрезать &amp; и т.п.)"""
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+
+def _rating(value: float) -> Optional[float]:
+    """Рейтинг в пределах 0..5 (None - нечисловой или бесконечный)"""
+    try:
+        rating = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(rating):
+        return None
+    return min(max(rating, 0.0), 5.0)
+
+
+def render_game(game: GameInfo, index: int) -> str:
+    """Блок одной игры; все значения из ответа нейросети обрезаются и экранируются"""
+    parts = [f"<b>{index}. {escape_html(_clip(game.name, MAX_NAME_LENGTH))}</b>\n"]
+    rating = _rating(game.rating) if game.rating else None
+    if rating:
+        parts.append(f"🎮 Рейтинг: {rating:g}/5 {'⭐' * int(rating)}\n")
+    if game.released:
+        parts.append(f"📅 Год выпуска: {escape_html(_clip(str(game.released), MAX_RELEASED_LENGTH))}\n")
+    if game.genres:
+        parts.append(f"🎯 Жанры: {escape_html(_clip(game.genres, MAX_FIELD_LENGTH))}\n")
+    if game.platforms:
+        parts.append(f"💻 Платформы: {escape_html(_clip(game.platforms, MAX_FIELD_LENGTH))}\n")
+    if game.description:
+        parts.append(f"\n📝 <i>{escape_html(_clip(game.description, MAX_DESCRIPTION_LENGTH))}</i>\n")
+    parts.append(f"\n{SEPARATOR}\n\n")
+    return "".join(parts)
+
+
+def pack_blocks(blocks: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Объединение блоков в сообщения не длиннее limit.
+
+    Разметка каждого блока закрыта внутри него, поэтому сообщение режется
+    только на границах блоков и ни одна сущность не разрывается.
+    """
+    # Символ занимает не больше двух единиц UTF-16: обычный ответ заведомо
+    # влезает в одно сообщение, и длину каждого блока можно не считать
+    if sum(len(block) for block in blocks) * 2 <= limit:
+        return ["".join(blocks)]
+    messages: List[str] = []
+    current: List[str] = []
+    length = 0
+    for block in blocks:
+        size = message_length(block)
+        if current and length + size > limit:
+            messages.append("".join(current))
+            current, length = [], 0
+        current.append(block)
+        length += size
+    if current:
+        messages.append("".join(current))
+    return messages
+
+
+def render_recommendations(games: List[GameInfo], pending: bool = False) -> List[str]:
+    """
+    Ответ с рекомендациями
+
+    Args:
+        games: Рекомендованные игры
+        pending: Добавить строку «подбираю ещё игры» (потоковый режим)
+
+    Returns:
+        Тексты сообщений (обычно одно; больше - если ответ длиннее MESSAGE_LIMIT)
+    """
+    blocks = [RECOMMENDATIONS_HEADER]
+    blocks.extend(render_game(game, i) for i, game in enumerate(games, 1))
+    if pending:
+        blocks.append(RECOMMENDATIONS_PENDING)
+    return pack_blocks(blocks)